@@ -0,0 +1,96 @@
+"""
+Proteção das rotas administrativas
+
+As rotas /admin/* só respondem com o token configurado em ADMIN_TOKEN, enviado no
+cabeçalho X-Admin-Token. Pelo navegador, o token é informado uma vez no formulário
+de /admin/entrar (POST, para não parar em logs de acesso como um ?token= pararia)
+e a sessão fica marcada com um resumo do token: trocar o ADMIN_TOKEN derruba as
+sessões antigas. Sem ADMIN_TOKEN definido as rotas ficam fechadas, exceto em modo
+debug/teste.
+
+A marca da sessão só vale com uma SECRET_KEY própria: com a chave padrão, que está
+no código, qualquer um assinaria um cookie de sessão. Nesse caso só o cabeçalho é
+aceito e um aviso é registrado ao subir o app.
+"""
+
+import hashlib
+import hmac
+import logging
+import os
+from functools import wraps
+
+from flask import abort, current_app, flash, redirect, render_template, request, session, url_for
+
+logger = logging.getLogger('pedidos.admin')
+
+# Chave de sessão usada quando SECRET_KEY não é definida; pública, está no código
+CHAVE_PADRAO = 'sua_chave_secreta_aqui'
+
+
+def token_configurado():
+    return os.environ.get('ADMIN_TOKEN', '')
+
+
+def sessao_confiavel():
+    """Indica se cookies de sessão assinados pelo app podem provar o acesso admin"""
+    return current_app.secret_key not in (None, '', CHAVE_PADRAO)
+
+
+def _marca(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def acesso_admin():
+    """Retorna True se a requisição atual pode usar as rotas administrativas"""
+    esperado = token_configurado()
+    if not esperado:
+        return current_app.debug or current_app.testing
+
+    recebido = request.headers.get('X-Admin-Token', '')
+    if recebido and hmac.compare_digest(recebido, esperado):
+        return True
+    marca = session.get('admin')
+    return (sessao_confiavel() and isinstance(marca, str)
+            and hmac.compare_digest(marca, _marca(esperado)))
+
+
+def requer_admin(view):
+    """Decorador para rotas que exigem o token de administrador"""
+    @wraps(view)
+    def protegida(*args, **kwargs):
+        if not acesso_admin():
+            abort(403)
+        return view(*args, **kwargs)
+    return protegida
+
+
+def init_app(app):
+    """Registra /admin/entrar e /admin/sair e avisa sobre a SECRET_KEY padrão"""
+    if token_configurado() and app.secret_key in (None, '', CHAVE_PADRAO):
+        logger.warning('ADMIN_TOKEN definido com a SECRET_KEY padrão: o acesso admin pelo navegador fica '
+                       'desligado (só o cabeçalho X-Admin-Token vale). Defina SECRET_KEY.')
+
+    @app.route('/admin/entrar', methods=['GET', 'POST'])
+    def admin_entrar():
+        """Formulário do token de administrador para o navegador"""
+        destino = request.values.get('next', '')
+        if not (destino.startswith('/') and not destino.startswith('//')):
+            destino = url_for('painel.index')
+
+        if request.method == 'POST':
+            esperado = token_configurado()
+            recebido = request.form.get('token', '')
+            if not esperado or not hmac.compare_digest(recebido, esperado):
+                flash('Token inválido', 'error')
+            elif not sessao_confiavel():
+                flash('Defina SECRET_KEY no ambiente para entrar pelo navegador', 'error')
+            else:
+                session['admin'] = _marca(esperado)
+                return redirect(destino)
+
+        return render_template('admin_entrar.html', destino=destino)
+
+    @app.route('/admin/sair', methods=['POST'])
+    def admin_sair():
+        session.pop('admin', None)
+        return redirect(url_for('painel.index'))
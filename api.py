@@ -0,0 +1,497 @@
+"""
+API JSON versionada (/api/v1) para scripts do estoque
+
+Cobre as mesmas operações das páginas: CRUD de pedidos, criação de grupos,
+associar/desassociar pedidos, marcar enviado com código de rastreio e busca.
+As rotas /lote recebem listas com milhares de itens e as aplicam numa única
+transação: ou tudo é gravado, ou nada (a resposta lista os itens com erro).
+
+Leituras paginadas por cursor:
+    GET /api/v1/pedidos?limite=500&campos=id_pedido,grupo_id&cursor=<proximo_cursor>
+
+Autenticação: o mesmo token das rotas admin (cabeçalho X-Admin-Token, ver admin.py).
+"""
+
+import base64
+import json
+
+from flask import Blueprint, jsonify, request
+
+from admin import acesso_admin
+from repositorio import LIMITE_GRUPO
+
+MAX_ITENS_LOTE = 10000
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
+
+TIPOS_FRETE = ('FRETE PADRÃO', 'EXPRESSO')
+CAMPOS_PEDIDO = ('id_pedido', 'nome_cliente', 'produto', 'tamanho', 'tipo_frete', 'grupo_id', 'data_criacao')
+CAMPOS_GRUPO = ('id', 'nome', 'codigo_rastreio', 'enviado', 'data_criacao', 'total_pedidos')
+CAMPOS_OBRIGATORIOS = ('id_pedido', 'nome_cliente', 'produto', 'tamanho', 'tipo_frete')
+CAMPOS_EDITAVEIS = ('nome_cliente', 'produto', 'tamanho', 'tipo_frete')
+
+
+class ErroAPI(Exception):
+    """Erro devolvido ao cliente como JSON"""
+
+    def __init__(self, mensagem, status=400, itens=None):
+        super().__init__(mensagem)
+        self.status = status
+        self.itens = itens
+
+
+def _lista_json(valores):
+    # Uma lista inteira vira um único parâmetro (json_each), sem o limite de "?" do SQLite
+    return json.dumps(list(valores), ensure_ascii=False)
+
+
+def _corpo(chave):
+    """Lista `chave` do corpo JSON, validando o tamanho máximo de um lote"""
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict) or not isinstance(dados.get(chave), list):
+        raise ErroAPI(f'Corpo JSON deve conter a lista "{chave}"')
+    itens = dados[chave]
+    if not itens:
+        raise ErroAPI(f'A lista "{chave}" está vazia')
+    if len(itens) > MAX_ITENS_LOTE:
+        raise ErroAPI(f'No máximo {MAX_ITENS_LOTE} itens por chamada', 413)
+    return itens
+
+
+def _ids(chave):
+    """Lista de ids de pedido do corpo; cada id deve ser texto ou número"""
+    ids = _corpo(chave)
+    _falhar_se_erros([{'indice': i, 'erros': ['id_pedido deve ser texto ou número']}
+                      for i, valor in enumerate(ids) if not _texto(valor)])
+    return ids
+
+
+def _objeto():
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict):
+        raise ErroAPI('Corpo deve ser um objeto JSON')
+    return dados
+
+
+def _campos(permitidos):
+    """Campos pedidos em ?campos=a,b (todos por padrão)"""
+    texto = request.args.get('campos')
+    if not texto:
+        return list(permitidos)
+    campos = [c.strip() for c in texto.split(',') if c.strip()]
+    invalidos = [c for c in campos if c not in permitidos]
+    if invalidos:
+        raise ErroAPI(f'Campos desconhecidos: {", ".join(invalidos)}')
+    return campos
+
+
+def _limite():
+    try:
+        limite = int(request.args.get('limite', LIMITE_PADRAO))
+    except ValueError:
+        raise ErroAPI('limite deve ser um número')
+    return max(1, min(limite, LIMITE_MAXIMO))
+
+
+def _codificar_cursor(valor):
+    return base64.urlsafe_b64encode(str(valor).encode()).decode().rstrip('=')
+
+
+def _decodificar_cursor():
+    cursor = request.args.get('cursor')
+    if not cursor:
+        return 0
+    try:
+        return int(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+    except ValueError:
+        raise ErroAPI('cursor inválido')
+
+
+def _pagina(linhas, limite, campos):
+    """Monta a resposta paginada; as linhas vêm com uma a mais para saber se há próxima página"""
+    proximo = _codificar_cursor(linhas[limite - 1]['_cursor']) if len(linhas) > limite else None
+    return jsonify(dados=[{c: linha[c] for c in campos} for linha in linhas[:limite]],
+                   proximo_cursor=proximo)
+
+
+def _inteiro(valor):
+    # bool é subclasse de int no Python: true/false do JSON não valem como id
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
+def _texto(valor):
+    """Valor aceito num campo de texto: string ou número (ids numéricos vindos de scripts)"""
+    return isinstance(valor, (str, int, float)) and not isinstance(valor, bool)
+
+
+def _pedido(linha):
+    return {c: linha[c] for c in CAMPOS_PEDIDO}
+
+
+def _grupo(linha):
+    grupo = {c: linha[c] for c in CAMPOS_GRUPO}
+    grupo['enviado'] = bool(grupo['enviado'])
+    return grupo
+
+
+def _validar_pedido(item, parcial=False):
+    """Lista de erros de um pedido recebido (vazia quando válido)"""
+    if not isinstance(item, dict):
+        return ['item deve ser um objeto']
+    erros = []
+    obrigatorios = () if parcial else CAMPOS_OBRIGATORIOS
+    for campo in obrigatorios:
+        if not str(item.get(campo) or '').strip():
+            erros.append(f'{campo} é obrigatório')
+    for campo in CAMPOS_OBRIGATORIOS:
+        if item.get(campo) is not None and not _texto(item[campo]):
+            erros.append(f'{campo} deve ser texto')
+    if 'tipo_frete' in item and item['tipo_frete'] not in TIPOS_FRETE:
+        erros.append(f'tipo_frete deve ser um de: {", ".join(TIPOS_FRETE)}')
+    desconhecidos = set(item) - set(CAMPOS_OBRIGATORIOS)
+    if desconhecidos:
+        erros.append(f'campos não suportados: {", ".join(sorted(desconhecidos))}')
+    return erros
+
+
+def _falhar_se_erros(erros):
+    if erros:
+        raise ErroAPI(f'{len(erros)} item(ns) inválido(s); nada foi gravado', 422, erros)
+
+
+def _transacao(conn):
+    """Abre a transação de escrita já com o lock, para que validação e gravação vejam o mesmo estado"""
+    conn.execute('BEGIN IMMEDIATE')
+
+
+def criar_pedidos(conn, itens):
+    """Insere pedidos numa transação (todos ou nenhum)"""
+    erros = []
+    linhas = []
+    vistos = set()
+    for indice, item in enumerate(itens):
+        problemas = _validar_pedido(item)
+        if not problemas:
+            linha = tuple(str(item[c]).strip() for c in CAMPOS_OBRIGATORIOS)
+            if linha[0] in vistos:
+                problemas = ['id_pedido repetido no lote']
+            else:
+                vistos.add(linha[0])
+                linhas.append(linha)
+        if problemas:
+            erros.append({'indice': indice, 'erros': problemas})
+    _falhar_se_erros(erros)
+
+    _transacao(conn)
+    existentes = {linha[0] for linha in conn.execute(
+        'SELECT id_pedido FROM pedidos WHERE id_pedido IN (SELECT value FROM json_each(?))',
+        (_lista_json(vistos),))}
+    _falhar_se_erros([{'indice': i, 'erros': ['id_pedido já existe']}
+                      for i, linha in enumerate(linhas) if linha[0] in existentes])
+    conn.executemany('''
+        INSERT INTO pedidos (id_pedido, nome_cliente, produto, tamanho, tipo_frete)
+        VALUES (?, ?, ?, ?, ?)
+    ''', linhas)
+    conn.commit()
+    return len(linhas)
+
+
+def excluir_pedidos(conn, ids):
+    """Exclui pedidos (e seus dados completos importados); ids inexistentes são ignorados"""
+    _transacao(conn)
+    lista = _lista_json(str(i) for i in ids)
+    excluidos = conn.execute('DELETE FROM pedidos WHERE id_pedido IN (SELECT value FROM json_each(?))',
+                             (lista,)).rowcount
+    conn.execute('DELETE FROM pedidos_completos WHERE numero_pedido IN (SELECT value FROM json_each(?))', (lista,))
+    conn.commit()
+    return excluidos
+
+
+def atribuir_pedidos(conn, atribuicoes):
+    """Associa pedidos a grupos numa transação, respeitando o limite de pedidos por grupo"""
+    erros = []
+    destino = {}
+    for indice, item in enumerate(atribuicoes):
+        if (not isinstance(item, dict) or not item.get('id_pedido') or not _texto(item['id_pedido'])
+                or not _inteiro(item.get('grupo_id'))):
+            erros.append({'indice': indice, 'erros': ['informe id_pedido e grupo_id (inteiro)']})
+        else:
+            # Se o mesmo pedido aparecer mais de uma vez vale a última atribuição
+            destino[str(item['id_pedido'])] = (indice, item['grupo_id'])
+    _falhar_se_erros(erros)
+
+    _transacao(conn)
+    pedidos = {linha['id_pedido']: linha for linha in conn.execute(
+        'SELECT id_pedido, tipo_frete, grupo_id FROM pedidos WHERE id_pedido IN (SELECT value FROM json_each(?))',
+        (_lista_json(destino),))}
+    ocupacao = {linha['id']: linha['total'] for linha in conn.execute('''
+        SELECT g.id, COUNT(p.id) as total
+        FROM grupos g LEFT JOIN pedidos p ON p.grupo_id = g.id
+        WHERE g.id IN (SELECT value FROM json_each(?))
+        GROUP BY g.id
+    ''', (_lista_json({grupo_id for _, grupo_id in destino.values()}),))}
+
+    for id_pedido, (indice, grupo_id) in destino.items():
+        pedido = pedidos.get(id_pedido)
+        if pedido is None:
+            erros.append({'indice': indice, 'erros': ['pedido não encontrado']})
+        elif grupo_id not in ocupacao:
+            erros.append({'indice': indice, 'erros': ['grupo não encontrado']})
+        elif pedido['tipo_frete'] != 'FRETE PADRÃO':
+            erros.append({'indice': indice, 'erros': ['apenas pedidos com FRETE PADRÃO podem entrar em grupos']})
+        elif pedido['grupo_id'] != grupo_id:
+            if pedido['grupo_id'] in ocupacao:
+                ocupacao[pedido['grupo_id']] -= 1
+            ocupacao[grupo_id] += 1
+    for grupo_id, total in ocupacao.items():
+        if total > LIMITE_GRUPO:
+            erros.append({'grupo_id': grupo_id,
+                          'erros': [f'grupo ficaria com {total} pedidos (máximo {LIMITE_GRUPO})']})
+    _falhar_se_erros(erros)
+
+    conn.executemany('UPDATE pedidos SET grupo_id = ? WHERE id_pedido = ?',
+                     [(grupo_id, id_pedido) for id_pedido, (_, grupo_id) in destino.items()])
+    conn.commit()
+    return len(destino)
+
+
+def desatribuir_pedidos(conn, ids):
+    """Remove pedidos de seus grupos"""
+    _transacao(conn)
+    total = conn.execute('''
+        UPDATE pedidos SET grupo_id = NULL
+        WHERE grupo_id IS NOT NULL AND id_pedido IN (SELECT value FROM json_each(?))
+    ''', (_lista_json(str(i) for i in ids),)).rowcount
+    conn.commit()
+    return total
+
+
+def marcar_enviados(conn, envios):
+    """Marca grupos como enviados, gravando o código de rastreio de cada um"""
+    erros = []
+    for indice, item in enumerate(envios):
+        if (not isinstance(item, dict) or not _inteiro(item.get('grupo_id'))
+                or not str(item.get('codigo_rastreio') or '').strip()):
+            erros.append({'indice': indice, 'erros': ['informe grupo_id (inteiro) e codigo_rastreio']})
+    _falhar_se_erros(erros)
+
+    _transacao(conn)
+    ids = [item['grupo_id'] for item in envios]
+    existentes = {linha[0] for linha in conn.execute(
+        'SELECT id FROM grupos WHERE id IN (SELECT value FROM json_each(?))', (_lista_json(ids),))}
+    erros = [{'indice': i, 'erros': ['grupo não encontrado']}
+             for i, grupo_id in enumerate(ids) if grupo_id not in existentes]
+    _falhar_se_erros(erros)
+    conn.executemany('UPDATE grupos SET enviado = 1, codigo_rastreio = ? WHERE id = ?',
+                     [(str(item['codigo_rastreio']).strip(), item['grupo_id']) for item in envios])
+    conn.commit()
+    return len(envios)
+
+
+def init_app(app, obter_conexao):
+    """Registra o blueprint /api/v1"""
+    api = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+    @api.before_request
+    def autenticar():
+        if not acesso_admin():
+            raise ErroAPI('Acesso negado: envie o token no cabeçalho X-Admin-Token', 403)
+
+    @api.errorhandler(ErroAPI)
+    def erro_api(erro):
+        corpo = {'erro': str(erro)}
+        if erro.itens:
+            corpo['itens'] = erro.itens
+        return jsonify(corpo), erro.status
+
+    def executar(funcao, *args):
+        conn = obter_conexao()
+        try:
+            return funcao(conn, *args)
+        except Exception:
+            # Erro de validação no meio do lote também desfaz o que já foi feito
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    # Pedidos
+
+    @api.get('/pedidos')
+    def listar_pedidos():
+        """Lista pedidos com filtros opcionais (tipo_frete, grupo_id, sem_grupo, q)"""
+        campos = _campos(CAMPOS_PEDIDO)
+        limite = _limite()
+        filtros = ['id > ?']
+        parametros = [_decodificar_cursor()]
+        if request.args.get('tipo_frete'):
+            filtros.append('tipo_frete = ?')
+            parametros.append(request.args['tipo_frete'])
+        if request.args.get('grupo_id'):
+            grupo_id = request.args.get('grupo_id', type=int)
+            if grupo_id is None:
+                raise ErroAPI('grupo_id deve ser um número inteiro')
+            filtros.append('grupo_id = ?')
+            parametros.append(grupo_id)
+        if request.args.get('sem_grupo') == '1':
+            filtros.append('grupo_id IS NULL')
+        if request.args.get('q'):
+            filtros.append('(id_pedido = ? OR nome_cliente LIKE ? OR produto LIKE ?)')
+            termo = f"%{request.args['q']}%"
+            parametros += [request.args['q'], termo, termo]
+
+        def consultar(conn):
+            return conn.execute(f'''
+                SELECT id as _cursor, {', '.join(campos)} FROM pedidos
+                WHERE {' AND '.join(filtros)}
+                ORDER BY id LIMIT ?
+            ''', parametros + [limite + 1]).fetchall()
+        return _pagina(executar(consultar), limite, campos)
+
+    @api.get('/pedidos/<id_pedido>')
+    def obter_pedido(id_pedido):
+        linha = executar(lambda conn: conn.execute(
+            'SELECT * FROM pedidos WHERE id_pedido = ?', (id_pedido,)).fetchone())
+        if linha is None:
+            raise ErroAPI('Pedido não encontrado', 404)
+        return jsonify(_pedido(linha))
+
+    @api.post('/pedidos')
+    def criar_pedido():
+        item = _objeto()
+        executar(criar_pedidos, [item])
+        resposta = obter_pedido(str(item['id_pedido']).strip())
+        resposta.status_code = 201
+        return resposta
+
+    @api.post('/pedidos/lote')
+    def criar_pedidos_lote():
+        return jsonify(criados=executar(criar_pedidos, _corpo('pedidos'))), 201
+
+    @api.patch('/pedidos/<id_pedido>')
+    def editar_pedido(id_pedido):
+        item = _objeto()
+        erros = _validar_pedido(item, parcial=True)
+        if 'id_pedido' in item:
+            erros.append('id_pedido não pode ser alterado')
+        if erros:
+            raise ErroAPI('; '.join(erros), 422)
+        campos = [c for c in CAMPOS_EDITAVEIS if c in item]
+        if not campos:
+            raise ErroAPI('Nenhum campo para alterar')
+
+        # Só pedidos com FRETE PADRÃO ficam em grupos (como em atribuir_pedidos)
+        expresso = item.get('tipo_frete', 'FRETE PADRÃO') != 'FRETE PADRÃO'
+
+        def atualizar(conn):
+            cursor = conn.execute(
+                f"UPDATE pedidos SET {', '.join(f'{c} = ?' for c in campos)} "
+                f"WHERE id_pedido = ?{' AND grupo_id IS NULL' if expresso else ''}",
+                [str(item[c]).strip() for c in campos] + [id_pedido])
+            if not cursor.rowcount:
+                if conn.execute('SELECT 1 FROM pedidos WHERE id_pedido = ?', (id_pedido,)).fetchone() is None:
+                    raise ErroAPI('Pedido não encontrado', 404)
+                raise ErroAPI('pedido em grupo não pode mudar para EXPRESSO; tire-o do grupo antes', 422)
+            conn.commit()
+        executar(atualizar)
+        return obter_pedido(id_pedido)
+
+    @api.delete('/pedidos/<id_pedido>')
+    def excluir_pedido(id_pedido):
+        if not executar(excluir_pedidos, [id_pedido]):
+            raise ErroAPI('Pedido não encontrado', 404)
+        return '', 204
+
+    @api.post('/pedidos/lote/excluir')
+    def excluir_pedidos_lote():
+        return jsonify(excluidos=executar(excluir_pedidos, _ids('ids')))
+
+    # Grupos
+
+    @api.get('/grupos')
+    def listar_grupos():
+        """Lista grupos (filtro opcional enviado=0/1)"""
+        campos = _campos(CAMPOS_GRUPO)
+        limite = _limite()
+        filtros = ['g.id > ?']
+        parametros = [_decodificar_cursor()]
+        if request.args.get('enviado') in ('0', '1'):
+            filtros.append('g.enviado = ?')
+            parametros.append(int(request.args['enviado']))
+
+        def consultar(conn):
+            return conn.execute(f'''
+                SELECT g.id as _cursor, g.*, COUNT(p.id) as total_pedidos
+                FROM grupos g LEFT JOIN pedidos p ON p.grupo_id = g.id
+                WHERE {' AND '.join(filtros)}
+                GROUP BY g.id ORDER BY g.id LIMIT ?
+            ''', parametros + [limite + 1]).fetchall()
+        linhas = [dict(linha, enviado=bool(linha['enviado'])) for linha in executar(consultar)]
+        return _pagina(linhas, limite, campos)
+
+    @api.get('/grupos/<int:grupo_id>')
+    def obter_grupo(grupo_id):
+        def consultar(conn):
+            grupo = conn.execute('''
+                SELECT g.*, COUNT(p.id) as total_pedidos
+                FROM grupos g LEFT JOIN pedidos p ON p.grupo_id = g.id
+                WHERE g.id = ? GROUP BY g.id
+            ''', (grupo_id,)).fetchone()
+            pedidos = conn.execute('SELECT * FROM pedidos WHERE grupo_id = ? ORDER BY data_criacao',
+                                   (grupo_id,)).fetchall()
+            return grupo, pedidos
+        grupo, pedidos = executar(consultar)
+        if grupo is None:
+            raise ErroAPI('Grupo não encontrado', 404)
+        return jsonify(dict(_grupo(grupo), pedidos=[_pedido(p) for p in pedidos]))
+
+    @api.post('/grupos')
+    def criar_grupo():
+        nome = str(_objeto().get('nome') or '').strip()
+        if not nome:
+            raise ErroAPI('nome é obrigatório', 422)
+
+        def inserir(conn):
+            grupo_id = conn.execute('INSERT INTO grupos (nome) VALUES (?)', (nome,)).lastrowid
+            conn.commit()
+            return grupo_id
+        resposta = obter_grupo(executar(inserir))
+        resposta.status_code = 201
+        return resposta
+
+    @api.post('/grupos/<int:grupo_id>/pedidos')
+    def atribuir(grupo_id):
+        ids = _corpo('pedidos')
+        executar(atribuir_pedidos, [{'id_pedido': id_pedido, 'grupo_id': grupo_id} for id_pedido in ids])
+        return obter_grupo(grupo_id)
+
+    @api.delete('/grupos/<int:grupo_id>/pedidos/<id_pedido>')
+    def desatribuir(grupo_id, id_pedido):
+        def remover(conn):
+            total = conn.execute('UPDATE pedidos SET grupo_id = NULL WHERE id_pedido = ? AND grupo_id = ?',
+                                 (id_pedido, grupo_id)).rowcount
+            conn.commit()
+            return total
+        if not executar(remover):
+            raise ErroAPI('Pedido não está neste grupo', 404)
+        return '', 204
+
+    @api.post('/grupos/<int:grupo_id>/enviar')
+    def enviar(grupo_id):
+        codigo = _objeto().get('codigo_rastreio')
+        executar(marcar_enviados, [{'grupo_id': grupo_id, 'codigo_rastreio': codigo}])
+        return obter_grupo(grupo_id)
+
+    @api.post('/grupos/lote/atribuir')
+    def atribuir_lote():
+        return jsonify(atribuidos=executar(atribuir_pedidos, _corpo('atribuicoes')))
+
+    @api.post('/grupos/lote/desatribuir')
+    def desatribuir_lote():
+        return jsonify(desatribuidos=executar(desatribuir_pedidos, _ids('pedidos')))
+
+    @api.post('/grupos/lote/enviar')
+    def enviar_lote():
+        return jsonify(enviados=executar(marcar_enviados, _corpo('envios')))
+
+    app.register_blueprint(api)
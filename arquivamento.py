@@ -0,0 +1,240 @@
+"""
+Arquivamento dos grupos enviados antigos
+
+grupos, pedidos e pedidos_completos só crescem, e o dashboard, a verificação de
+capacidade dos grupos e as listagens percorrem essas tabelas inteiras. O
+arquivamento move os grupos enviados há mais de ARQUIVO_DIAS dias, com seus pedidos
+e as linhas de pedidos_completos, para tabelas *_arquivo no mesmo banco; as tabelas
+do dia a dia ficam só com os dados ativos.
+
+    grupos.enviado_em   preenchido por trigger quando o grupo é marcado como enviado
+                        (grupos antigos, sem a data, usam data_criacao)
+    *_arquivo           mesmas colunas da tabela de origem, mais arquivado_em
+    busca_pedidos       views UNION ALL ativo + arquivo, usadas pela busca por id,
+    grupos_todos        pelos detalhes do pedido e pelo histórico de rastreamento
+    pedidos_completos_todos
+
+A movimentação é feita em lotes de LOTE grupos, cada um numa transação curta, para
+não segurar a escrita do banco. Pedidos arquivados não voltam numa reimportação.
+
+    python arquivamento.py --banco pedidos.db --dias 60
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from flask import jsonify, request
+
+import manutencao
+import sincronizacao
+from admin import requer_admin
+
+logger = logging.getLogger('pedidos.arquivamento')
+
+DIAS = int(os.environ.get('ARQUIVO_DIAS', '60'))
+LOTE = 500
+
+TABELAS = (('grupos', 'grupos_arquivo'),
+           ('pedidos', 'pedidos_arquivo'),
+           ('pedidos_completos', 'pedidos_completos_arquivo'))
+CHAVE_ULTIMO = 'arquivamento_ultimo'
+
+
+def _colunas(conn, tabela):
+    return [linha[1] for linha in conn.execute(f'PRAGMA table_info({tabela})')]
+
+
+def _espelhar(cursor, tabela, arquivo):
+    """Cria (ou completa) a tabela de arquivo com as colunas da tabela de origem"""
+    colunas = [(linha[1], linha[2], linha[5]) for linha in cursor.execute(f'PRAGMA table_info({tabela})')]
+    definicoes = [f'{nome} {tipo} PRIMARY KEY' if chave else f'{nome} {tipo}' for nome, tipo, chave in colunas]
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS {arquivo} '
+                   f'({", ".join(definicoes)}, arquivado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP)')
+    existentes = set(_colunas(cursor, arquivo))
+    for nome, tipo, _ in colunas:
+        if nome not in existentes:
+            cursor.execute(f'ALTER TABLE {arquivo} ADD COLUMN {nome} {tipo}')
+
+
+def _criar_view(cursor, nome, sql):
+    """Recria a view só quando a definição mudou (colunas novas nas tabelas)"""
+    sql = f'CREATE VIEW {nome} AS {sql}'
+    atual = cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = ?", (nome,)).fetchone()
+    if atual and atual[0] == sql:
+        return
+    cursor.execute(f'DROP VIEW IF EXISTS {nome}')
+    cursor.execute(sql)
+
+
+def criar_tabelas(cursor):
+    """Cria a data de envio, as tabelas de arquivo e as views de busca (chamado pelo init_db)"""
+    try:
+        cursor.execute('ALTER TABLE grupos ADD COLUMN enviado_em TIMESTAMP')
+    except sqlite3.OperationalError:
+        pass
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS grupos_enviado_em
+        AFTER UPDATE OF enviado ON grupos
+        WHEN NEW.enviado IS NOT OLD.enviado
+        BEGIN
+            UPDATE grupos SET enviado_em = CASE WHEN NEW.enviado THEN CURRENT_TIMESTAMP END
+            WHERE id = NEW.id;
+        END
+    ''')
+
+    for tabela, arquivo in TABELAS:
+        _espelhar(cursor, tabela, arquivo)
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_pedidos_arquivo_id_pedido ON pedidos_arquivo (id_pedido)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pedidos_arquivo_grupo ON pedidos_arquivo (grupo_id)')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_pedidos_completos_arquivo_numero '
+                   'ON pedidos_completos_arquivo (numero_pedido)')
+
+    grupos = ', '.join(_colunas(cursor, 'grupos'))
+    _criar_view(cursor, 'grupos_todos', f'''
+        SELECT {grupos}, 0 AS arquivado FROM grupos
+        UNION ALL
+        SELECT {grupos}, 1 AS arquivado FROM grupos_arquivo''')
+
+    pedidos = _colunas(cursor, 'pedidos')
+    _criar_view(cursor, 'busca_pedidos', f'''
+        SELECT {', '.join(f'p.{c}' for c in pedidos)}, g.nome AS nome_grupo, g.enviado AS grupo_enviado,
+               0 AS arquivado
+        FROM pedidos p LEFT JOIN grupos g ON p.grupo_id = g.id
+        UNION ALL
+        SELECT {', '.join(f'p.{c}' for c in pedidos)}, g.nome, g.enviado, 1
+        FROM pedidos_arquivo p LEFT JOIN grupos_arquivo g ON p.grupo_id = g.id''')
+
+    completos = ', '.join(_colunas(cursor, 'pedidos_completos'))
+    _criar_view(cursor, 'pedidos_completos_todos', f'''
+        SELECT {completos}, 0 AS arquivado FROM pedidos_completos
+        UNION ALL
+        SELECT {completos}, 1 AS arquivado FROM pedidos_completos_arquivo''')
+
+
+def candidatos(conn, dias=None):
+    """Quantidade de grupos que seriam arquivados agora"""
+    return conn.execute('''
+        SELECT COUNT(*) FROM grupos
+        WHERE enviado AND COALESCE(enviado_em, data_criacao) < datetime('now', ?)
+    ''', (f'-{DIAS if dias is None else int(dias)} days',)).fetchone()[0]
+
+
+def arquivar(conn, dias=None, lote=LOTE):
+    """Move os grupos enviados há mais de `dias` dias para o arquivo; retorna o resumo"""
+    dias = DIAS if dias is None else int(dias)
+    inicio = time.perf_counter()
+    resumo = {'dias': dias, 'lotes': 0, 'grupos': 0, 'pedidos': 0, 'pedidos_completos': 0}
+    colunas = {tabela: ', '.join(_colunas(conn, tabela)) for tabela, _ in TABELAS}
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS arquivar_grupos (id INTEGER PRIMARY KEY)')
+
+    while True:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM temp.arquivar_grupos')
+            quantidade = conn.execute('''
+                INSERT INTO temp.arquivar_grupos (id)
+                SELECT id FROM grupos
+                WHERE enviado AND COALESCE(enviado_em, data_criacao) < datetime('now', ?)
+                ORDER BY id LIMIT ?
+            ''', (f'-{dias} days', lote)).rowcount
+            if not quantidade:
+                conn.rollback()
+                break
+
+            selecao = 'SELECT id FROM temp.arquivar_grupos'
+            pedidos_do_lote = f'SELECT id_pedido FROM pedidos WHERE grupo_id IN ({selecao})'
+            conn.execute(f'INSERT INTO grupos_arquivo ({colunas["grupos"]}) '
+                         f'SELECT {colunas["grupos"]} FROM grupos WHERE id IN ({selecao})')
+            completos = conn.execute(
+                f'INSERT INTO pedidos_completos_arquivo ({colunas["pedidos_completos"]}) '
+                f'SELECT {colunas["pedidos_completos"]} FROM pedidos_completos '
+                f'WHERE numero_pedido IN ({pedidos_do_lote})').rowcount
+            pedidos = conn.execute(
+                f'INSERT INTO pedidos_arquivo ({colunas["pedidos"]}) '
+                f'SELECT {colunas["pedidos"]} FROM pedidos WHERE grupo_id IN ({selecao})').rowcount
+
+            conn.execute(f'DELETE FROM pedidos_completos WHERE numero_pedido IN ({pedidos_do_lote})')
+            conn.execute(f'DELETE FROM pedidos WHERE grupo_id IN ({selecao})')
+            conn.execute(f'DELETE FROM grupos WHERE id IN ({selecao})')
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+        resumo['lotes'] += 1
+        resumo['grupos'] += quantidade
+        resumo['pedidos'] += pedidos
+        resumo['pedidos_completos'] += completos
+        if quantidade < lote:
+            break
+
+    resumo['tempo'] = round(time.perf_counter() - inicio, 3)
+    sincronizacao.gravar_estado(conn, CHAVE_ULTIMO, json.dumps(resumo))
+    conn.commit()
+    logger.info('Arquivamento: %d grupos, %d pedidos em %.2fs', resumo['grupos'], resumo['pedidos'],
+                resumo['tempo'], extra={'evento': 'arquivamento', 'resumo': resumo})
+    return resumo
+
+
+# Um arquivamento por vez em cada processo
+_em_andamento = threading.Lock()
+
+
+def init_app(app, obter_conexao):
+    """Registra /admin/arquivamento (GET mostra o estado, POST arquiva)"""
+
+    @app.route('/admin/arquivamento', methods=['GET', 'POST'])
+    @requer_admin
+    def arquivamento_admin():
+        """Tamanho do arquivo e grupos elegíveis; POST arquiva agora (?dias= opcional)"""
+        conn = obter_conexao()
+        try:
+            if request.method == 'POST':
+                if not _em_andamento.acquire(blocking=False):
+                    return jsonify({'erro': 'Arquivamento já em andamento'}), 409
+                try:
+                    resumo = arquivar(conn, request.args.get('dias', type=int))
+                finally:
+                    _em_andamento.release()
+                manutencao.agendar(obter_conexao)
+                return jsonify(resumo)
+
+            ultimo = sincronizacao.ler_estado(conn, CHAVE_ULTIMO)
+            linha = conn.execute('''
+                SELECT (SELECT COUNT(*) FROM grupos_arquivo) AS grupos,
+                       (SELECT COUNT(*) FROM pedidos_arquivo) AS pedidos,
+                       (SELECT COUNT(*) FROM pedidos_completos_arquivo) AS pedidos_completos
+            ''').fetchone()
+            return jsonify({'dias': DIAS, 'elegiveis': candidatos(conn), 'arquivo': dict(linha),
+                            'ultimo': json.loads(ultimo) if ultimo else None})
+        finally:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Arquiva os grupos enviados antigos')
+    parser.add_argument('--banco', default='pedidos.db', help='Banco do app (já inicializado)')
+    parser.add_argument('--dias', type=int, default=DIAS, help='Idade mínima do envio, em dias')
+    parser.add_argument('--lote', type=int, default=LOTE, help='Grupos por transação')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    conn = sqlite3.connect(args.banco, timeout=30)
+    conn.row_factory = sqlite3.Row
+    criar_tabelas(conn.cursor())
+    sincronizacao.criar_estado(conn.cursor())
+    conn.commit()
+    try:
+        resumo = arquivar(conn, args.dias, args.lote)
+    finally:
+        conn.close()
+    print(json.dumps(resumo, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
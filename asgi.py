@@ -0,0 +1,12 @@
+"""
+Ponto de entrada ASGI: uvicorn asgi:app ou GUNICORN_WORKER=uvicorn gunicorn -c gunicorn.conf.py asgi:app
+
+O mesmo app do app.py atrás do adaptador de assincrono.py: uploads e o stream do
+/eventos esperam no laço de eventos, sem prender threads.
+"""
+
+import assincrono
+from gerenciador import create_app
+
+app_wsgi = create_app()
+app = assincrono.Adaptador(app_wsgi, tamanho_maximo=app_wsgi.config['MAX_CONTENT_LENGTH'])
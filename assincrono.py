@@ -0,0 +1,212 @@
+"""
+Modo ASGI: uploads lentos e o stream do /eventos sem prender threads
+
+    uvicorn asgi:app
+    GUNICORN_WORKER=uvicorn gunicorn -c gunicorn.conf.py asgi:app
+
+O app Flask continua o mesmo (WSGI); o Adaptador fica na frente dele, no laço de
+eventos do worker:
+
+- o corpo da requisição chega pelo laço e vai para um arquivo temporário (em
+  memória até ASGI_CORPO_EM_MEMORIA bytes, depois em disco). O Flask só é chamado
+  com o corpo completo: um CSV enviado devagar pelo celular não ocupa thread
+  enquanto chega, e o prazo da requisição (prazos.py) só começa depois dele.
+  Corpo maior que o MAX_CONTENT_LENGTH do app é recusado (413) sem ser guardado;
+- rotas, SQLite e templates rodam num pool de ASGI_THREADS threads por processo;
+- respostas em stream são lidas pedaço a pedaço no pool. Um pedaço Pausa(segundos)
+  — o /eventos entre duas leituras do log — é esperado no laço, sem thread, e
+  termina antes se o navegador desconectar.
+
+Cada requisição tem o seu contextvars.Context, usado em todas as chamadas ao pool:
+a loja e a instrumentação da requisição continuam valendo de um pedaço do stream
+para o outro, mesmo que cada um rode numa thread diferente.
+
+Sem dependências: o uvicorn (pip install uvicorn) só é preciso para servir.
+"""
+
+import asyncio
+import contextvars
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+THREADS = int(os.environ.get('ASGI_THREADS', '8'))
+CORPO_EM_MEMORIA = int(os.environ.get('ASGI_CORPO_EM_MEMORIA', str(1024 * 1024)))
+
+# Marca no environ das requisições que vieram pelo adaptador
+CHAVE_ENVIRON = 'pedidos.asgi'
+
+
+class Pausa:
+    """Pedaço de stream que pede ao adaptador uma espera sem ocupar thread"""
+    __slots__ = ('segundos',)
+
+    def __init__(self, segundos):
+        self.segundos = segundos
+
+
+def em_asgi(environ):
+    """Indica se a requisição está sendo servida pelo Adaptador (aceita Pausa)"""
+    return environ.get(CHAVE_ENVIRON, False)
+
+
+def _proximo(iterador):
+    return next(iterador, None)
+
+
+class Adaptador:
+    """Aplicação ASGI que serve um app WSGI com corpo em arquivo e pool de threads"""
+
+    def __init__(self, wsgi_app, threads=THREADS, tamanho_maximo=None):
+        self.wsgi_app = wsgi_app
+        self.threads = threads
+        self.tamanho_maximo = tamanho_maximo
+        self._pool = None
+
+    @property
+    def pool(self):
+        # Criado no primeiro uso: com preload_app o adaptador nasce no mestre do
+        # gunicorn, e threads não atravessam o fork
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.threads, thread_name_prefix='asgi')
+        return self._pool
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'websocket':
+            await receive()
+            await send({'type': 'websocket.close'})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            mensagem = await receive()
+            if mensagem['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensagem['type'] == 'lifespan.shutdown':
+                if self._pool is not None:
+                    await asyncio.to_thread(self._pool.shutdown)
+                    self._pool = None
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _recusar(self, send):
+        await send({'type': 'http.response.start', 'status': 413,
+                    'headers': [(b'content-type', b'text/plain; charset=utf-8'), (b'connection', b'close')]})
+        await send({'type': 'http.response.body', 'body': 'Corpo da requisição grande demais'.encode()})
+
+    async def _http(self, scope, receive, send):
+        if self.tamanho_maximo is not None:
+            declarado = dict(scope['headers']).get(b'content-length', b'0')
+            if declarado.isdigit() and int(declarado) > self.tamanho_maximo:
+                await self._recusar(send)
+                return
+        corpo = tempfile.SpooledTemporaryFile(max_size=CORPO_EM_MEMORIA)
+        try:
+            tamanho = 0
+            while True:
+                mensagem = await receive()
+                if mensagem['type'] == 'http.disconnect':
+                    return
+                pedaco = mensagem.get('body', b'')
+                if pedaco:
+                    tamanho += len(pedaco)
+                    if self.tamanho_maximo is not None and tamanho > self.tamanho_maximo:
+                        await self._recusar(send)
+                        return
+                    corpo.write(pedaco)
+                if not mensagem.get('more_body'):
+                    break
+            corpo.seek(0)
+            await self._responder(self._environ(scope, corpo, tamanho), receive, send)
+        finally:
+            corpo.close()
+
+    def _environ(self, scope, corpo, tamanho):
+        raiz = scope.get('root_path', '')
+        caminho = scope['path']
+        if raiz and caminho.startswith(raiz):
+            caminho = caminho[len(raiz):]
+        servidor = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': raiz.encode('utf-8').decode('latin-1'),
+            'PATH_INFO': caminho.encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': servidor[0],
+            'SERVER_PORT': str(servidor[1] or 80),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'CONTENT_LENGTH': str(tamanho),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': corpo,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+            CHAVE_ENVIRON: True,
+        }
+        if scope.get('client'):
+            environ['REMOTE_ADDR'] = scope['client'][0]
+        for nome, valor in scope['headers']:
+            nome = nome.decode('latin-1').upper().replace('-', '_')
+            valor = valor.decode('latin-1')
+            if nome == 'CONTENT_LENGTH':
+                continue  # vale o tamanho do corpo recebido
+            chave = nome if nome == 'CONTENT_TYPE' else f'HTTP_{nome}'
+            environ[chave] = f'{environ[chave]},{valor}' if chave in environ else valor
+        return environ
+
+    async def _responder(self, environ, receive, send):
+        loop = asyncio.get_running_loop()
+        contexto = contextvars.copy_context()
+        inicio = {}
+
+        def no_pool(funcao, *args):
+            return loop.run_in_executor(self.pool, contexto.run, funcao, *args)
+
+        def start_response(status, cabecalhos, exc_info=None):
+            if exc_info and inicio.get('enviado'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            inicio['status'] = int(status.split(' ', 1)[0])
+            inicio['cabecalhos'] = [(n.lower().encode('latin-1'), v.encode('latin-1')) for n, v in cabecalhos]
+            return lambda dados: None
+
+        async def enviar_inicio():
+            if not inicio.get('enviado'):
+                inicio['enviado'] = True
+                await send({'type': 'http.response.start', 'status': inicio['status'],
+                            'headers': inicio['cabecalhos']})
+
+        desconectado = asyncio.Event()
+
+        async def vigiar():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            desconectado.set()
+
+        resultado = await no_pool(self.wsgi_app, environ, start_response)
+        vigia = asyncio.create_task(vigiar())
+        try:
+            iterador = iter(resultado)
+            while not desconectado.is_set():
+                pedaco = await no_pool(_proximo, iterador)
+                if pedaco is None:
+                    break
+                await enviar_inicio()
+                if isinstance(pedaco, Pausa):
+                    try:
+                        await asyncio.wait_for(desconectado.wait(), pedaco.segundos)
+                    except asyncio.TimeoutError:
+                        pass
+                elif pedaco:
+                    await send({'type': 'http.response.body', 'body': pedaco, 'more_body': True})
+            await enviar_inicio()
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            vigia.cancel()
+            if hasattr(resultado, 'close'):
+                await no_pool(resultado.close)
@@ -0,0 +1,282 @@
+"""
+Backups a quente do banco com a API de backup do SQLite
+
+Copiar pedidos.db com o app no ar pode pegar o arquivo no meio de uma importação,
+e copiar segurando um lock trava os operadores durante a cópia inteira. Aqui a
+cópia é feita em passos de BACKUP_PAGINAS páginas com uma pausa entre eles; o lock
+de leitura só dura um passo e as gravações continuam entre um e outro.
+
+Se outra conexão grava no meio da cópia o SQLite recomeça do início (é assim que a
+cópia sai consistente). Cada recomeço multiplica o tamanho do passo, de modo que
+mesmo com o banco movimentado o backup termina — no pior caso num passo único.
+
+Depois da cópia, PRAGMA integrity_check roda sobre o arquivo copiado; só então ele é
+comprimido (gzip) em BACKUP_DIR. Ficam os BACKUP_MANTER mais recentes.
+
+    python backup.py --banco pedidos.db
+    python backup.py --verificar backups/pedidos-20250601-030000.db.gz
+    python backup.py --banco pedidos.db --continuo 21600
+
+Para restaurar: pare o app, descompacte o backup (gunzip) no lugar de pedidos.db e
+suba de novo. A cópia sai do modo WAL e o init_db volta a ligá-lo.
+"""
+
+import argparse
+import contextvars
+import gzip
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from flask import abort, jsonify, request, send_from_directory
+
+import lojas
+import sincronizacao
+from admin import requer_admin
+
+logger = logging.getLogger('pedidos.backup')
+
+DIRETORIO = os.environ.get('BACKUP_DIR', 'backups')
+MANTER = int(os.environ.get('BACKUP_MANTER', '14'))
+PAGINAS = int(os.environ.get('BACKUP_PAGINAS', '256'))
+PAUSA = float(os.environ.get('BACKUP_PAUSA', '0.02'))
+
+# Recomeços tolerados antes de copiar tudo num passo só
+MAX_RECOMECOS = 4
+PREFIXO = 'pedidos-'
+SUFIXO = '.db.gz'
+CHAVE_ULTIMO = 'backup_ultimo'
+
+
+class ErroBackup(Exception):
+    """Cópia que não passou na verificação de integridade"""
+
+
+class _Recomecou(Exception):
+    pass
+
+
+def copiar(origem, destino, paginas=None, pausa=None):
+    """Copia o banco `origem` (conexão) para o arquivo `destino` em passos; retorna as estatísticas"""
+    paginas = paginas or PAGINAS
+    pausa = PAUSA if pausa is None else pausa
+    estatisticas = {'passos': 0, 'recomecos': 0, 'paginas': 0}
+
+    while True:
+        anterior = [None]
+
+        def progresso(status, restantes, total):
+            estatisticas['passos'] += 1
+            estatisticas['paginas'] = total
+            if anterior[0] is not None and restantes > anterior[0]:
+                raise _Recomecou()
+            anterior[0] = restantes
+            if restantes and pausa:
+                time.sleep(pausa)
+
+        conn = sqlite3.connect(destino)
+        try:
+            origem.backup(conn, pages=paginas, progress=progresso)
+            # A cópia herda o modo WAL; sem ele, abrir o arquivo não cria -wal e -shm ao lado
+            conn.execute('PRAGMA journal_mode = DELETE')
+            return estatisticas
+        except _Recomecou:
+            # Alguém gravou no meio: passos maiores, até copiar tudo de uma vez
+            estatisticas['recomecos'] += 1
+            paginas = -1 if estatisticas['recomecos'] >= MAX_RECOMECOS else paginas * 4
+        finally:
+            conn.close()
+
+
+def integridade(caminho):
+    """Resultado do PRAGMA integrity_check ('ok' quando o arquivo está íntegro)"""
+    conn = sqlite3.connect(f'file:{caminho}?mode=ro', uri=True)
+    try:
+        return '; '.join(linha[0] for linha in conn.execute('PRAGMA integrity_check'))
+    except sqlite3.DatabaseError as e:
+        return str(e)
+    finally:
+        conn.close()
+
+
+def _remover(caminho):
+    """Apaga o banco temporário e o -wal e o -shm que a abertura possa ter criado"""
+    for arquivo in (caminho, caminho + '-wal', caminho + '-shm'):
+        try:
+            os.remove(arquivo)
+        except FileNotFoundError:
+            pass
+
+
+def _diretorio():
+    # Cada loja (ver lojas.py) guarda os backups numa subpasta com o seu nome
+    loja = lojas.atual()
+    return os.path.join(DIRETORIO, loja) if loja else DIRETORIO
+
+
+def listar(diretorio=None):
+    """Backups do diretório, do mais recente ao mais antigo"""
+    diretorio = diretorio or DIRETORIO
+    if not os.path.isdir(diretorio):
+        return []
+    nomes = sorted((n for n in os.listdir(diretorio) if n.startswith(PREFIXO) and n.endswith(SUFIXO)),
+                   reverse=True)
+    return [{'arquivo': nome, 'bytes': os.path.getsize(os.path.join(diretorio, nome))} for nome in nomes]
+
+
+def criar(origem, diretorio=None, manter=None, paginas=None, pausa=None):
+    """Faz, verifica, comprime e rotaciona um backup do banco `origem` (conexão); retorna o resumo"""
+    diretorio = diretorio or DIRETORIO
+    manter = MANTER if manter is None else manter
+    os.makedirs(diretorio, exist_ok=True)
+    inicio = time.perf_counter()
+    nome = f'{PREFIXO}{datetime.now().strftime("%Y%m%d-%H%M%S")}{SUFIXO}'
+
+    descritor, copia = tempfile.mkstemp(suffix='.db', dir=diretorio)
+    os.close(descritor)
+    try:
+        resumo = copiar(origem, copia, paginas, pausa)
+        resumo['tempo_copia'] = round(time.perf_counter() - inicio, 3)
+
+        resultado = integridade(copia)
+        if resultado != 'ok':
+            raise ErroBackup(f'Cópia com problema de integridade: {resultado}')
+
+        temporario = os.path.join(diretorio, nome + '.tmp')
+        with open(copia, 'rb') as entrada, gzip.open(temporario, 'wb', compresslevel=6) as saida:
+            shutil.copyfileobj(entrada, saida, 1024 * 1024)
+        os.replace(temporario, os.path.join(diretorio, nome))
+        resumo['bytes_banco'] = os.path.getsize(copia)
+    finally:
+        _remover(copia)
+
+    removidos = [b['arquivo'] for b in listar(diretorio)[max(manter, 1):]]
+    for antigo in removidos:
+        os.remove(os.path.join(diretorio, antigo))
+
+    resumo.update({'arquivo': nome, 'bytes': os.path.getsize(os.path.join(diretorio, nome)),
+                   'integridade': 'ok', 'removidos': removidos, 'tempo': round(time.perf_counter() - inicio, 3)})
+    logger.info('Backup %s: %d bytes em %.2fs (%d recomeços)', nome, resumo['bytes'], resumo['tempo'],
+                resumo['recomecos'], extra={'evento': 'backup', 'resumo': resumo})
+    return resumo
+
+
+def verificar(arquivo):
+    """Restaura o backup num arquivo temporário e confere a integridade e as contagens"""
+    inicio = time.perf_counter()
+    descritor, restaurado = tempfile.mkstemp(suffix='.db')
+    os.close(descritor)
+    try:
+        with gzip.open(arquivo, 'rb') as entrada, open(restaurado, 'wb') as saida:
+            shutil.copyfileobj(entrada, saida, 1024 * 1024)
+        resultado = integridade(restaurado)
+        contagens = {}
+        if resultado == 'ok':
+            conn = sqlite3.connect(f'file:{restaurado}?mode=ro', uri=True)
+            try:
+                for tabela in ('pedidos', 'grupos', 'pedidos_completos'):
+                    contagens[tabela] = conn.execute(f'SELECT COUNT(*) FROM {tabela}').fetchone()[0]
+            finally:
+                conn.close()
+    finally:
+        # Backups antigos ainda estão em modo WAL
+        _remover(restaurado)
+    return {'arquivo': os.path.basename(arquivo), 'integridade': resultado, 'contagens': contagens,
+            'tempo': round(time.perf_counter() - inicio, 3)}
+
+
+# Um backup por vez em cada processo
+_em_andamento = threading.Lock()
+
+
+def init_app(app, obter_conexao):
+    """Registra /admin/backup (GET lista, POST cria em segundo plano) e o download"""
+
+    def backup_em_segundo_plano():
+        conn = obter_conexao()
+        try:
+            resumo = criar(conn, _diretorio())
+            sincronizacao.gravar_estado(conn, CHAVE_ULTIMO, json.dumps(resumo))
+        except Exception as e:
+            logger.exception('Erro no backup')
+            sincronizacao.gravar_estado(conn, CHAVE_ULTIMO, json.dumps({'erro': str(e)}))
+        finally:
+            conn.commit()
+            conn.close()
+            _em_andamento.release()
+
+    @app.route('/admin/backup', methods=['GET', 'POST'])
+    @requer_admin
+    def backup_admin():
+        """Backups existentes e o resultado do último; POST dispara um novo"""
+        if request.method == 'POST':
+            if not _em_andamento.acquire(blocking=False):
+                return jsonify({'erro': 'Backup já em andamento'}), 409
+            threading.Thread(target=contextvars.copy_context().run, args=(backup_em_segundo_plano,),
+                             name='backup', daemon=True).start()
+            return jsonify({'iniciado': True}), 202
+
+        conn = obter_conexao()
+        try:
+            ultimo = sincronizacao.ler_estado(conn, CHAVE_ULTIMO)
+        finally:
+            conn.close()
+        return jsonify({'diretorio': _diretorio(), 'manter': MANTER, 'em_andamento': _em_andamento.locked(),
+                        'backups': listar(_diretorio()), 'ultimo': json.loads(ultimo) if ultimo else None})
+
+    @app.route('/admin/backup/<nome>')
+    @requer_admin
+    def baixar_backup(nome):
+        """Download de um backup (para guardar fora do servidor)"""
+        if nome not in {b['arquivo'] for b in listar(_diretorio())}:
+            abort(404)
+        return send_from_directory(os.path.abspath(_diretorio()), nome, as_attachment=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backup a quente do banco de pedidos')
+    parser.add_argument('--banco', default='pedidos.db')
+    parser.add_argument('--destino', default=DIRETORIO, help='Diretório dos backups')
+    parser.add_argument('--manter', type=int, default=MANTER, help='Quantos backups guardar')
+    parser.add_argument('--paginas', type=int, default=PAGINAS, help='Páginas copiadas por passo')
+    parser.add_argument('--pausa', type=float, default=PAUSA, help='Segundos entre os passos')
+    parser.add_argument('--verificar', metavar='ARQUIVO', help='Só confere um backup existente')
+    parser.add_argument('--continuo', type=int, metavar='SEGUNDOS',
+                        help='Repete a cada SEGUNDOS em vez de rodar uma vez')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if args.verificar:
+        resultado = verificar(args.verificar)
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+        if resultado['integridade'] != 'ok':
+            parser.exit(1)
+        return
+
+    conn = sqlite3.connect(args.banco, timeout=30)
+    try:
+        while True:
+            try:
+                print(json.dumps(criar(conn, args.destino, args.manter, args.paginas, args.pausa),
+                                 ensure_ascii=False))
+            except ErroBackup as e:
+                logger.error('%s', e)
+                if not args.continuo:
+                    parser.exit(1)
+            if not args.continuo:
+                break
+            time.sleep(args.continuo)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
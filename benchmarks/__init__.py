@@ -0,0 +1 @@
+"""Ferramentas de geração de dados sintéticos e benchmarks de escala"""
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Suíte de benchmarks de escala do fluxo de pedidos
+
+Para cada escala gera um CSV e um banco sintéticos (ver benchmarks/gerador.py) e
+mede importação de CSV, dashboard, /todos_pedidos, /pedidos_disponiveis, busca,
+ações em lote e exportação. Os resultados são gravados em JSON para comparação
+entre execuções.
+
+Com --banco-url os mesmos cenários rodam contra um PostgreSQL (ver repositorio.py):
+o banco sintético é gerado em SQLite e copiado com repositorio.migrar. O banco
+informado é apagado a cada escala; use um banco só para o benchmark.
+
+Exemplos:
+    python -m benchmarks.benchmark --escalas 1000,10000,100000
+    python -m benchmarks.benchmark --escalas 1000 --comparar benchmarks/resultados/base.json
+    python -m benchmarks.benchmark --escalas 10000 --banco-url postgresql://localhost/pedidos_bench
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import repositorio
+from benchmarks import gerador
+from gerenciador import create_app
+
+DIRETORIO_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados')
+
+
+def _medir(funcao, repeticoes):
+    """Executa `funcao` várias vezes e retorna as estatísticas de tempo da resposta"""
+    tempos = []
+    resposta = None
+    for i in range(repeticoes):
+        inicio = time.perf_counter()
+        resposta = funcao(i)
+        tempos.append(time.perf_counter() - inicio)
+    return {
+        'tempo_min': min(tempos),
+        'tempo_mediana': statistics.median(tempos),
+        'tempo_max': max(tempos),
+        'repeticoes': repeticoes,
+        'status': resposta.status_code,
+        'bytes': len(resposta.get_data()),
+    }
+
+
+def benchmark_importacao(escala, diretorio, banco_url=None):
+    """Gera um CSV com `escala` pedidos e mede o POST em /importar_csv num banco vazio"""
+    caminho_csv = os.path.join(diretorio, f'vendas_{escala}.csv')
+    _, linhas, itens = gerador.escrever_csv(caminho_csv, escala)
+
+    # O CSV das escalas maiores passa do limite de upload padrão
+    app = create_app({'DATABASE': os.path.join(diretorio, f'importacao_{escala}.db'), 'DATABASE_URL': banco_url,
+                      'MAX_CONTENT_LENGTH': None})
+    repo = app.extensions['repo']
+    if not repo.sqlite:
+        repo.limpar()
+    cliente = app.test_client()
+
+    inicio = time.perf_counter()
+    with open(caminho_csv, 'rb') as f:
+        resposta = cliente.post('/importar_csv', data={'arquivo': (f, 'vendas.csv')},
+                                content_type='multipart/form-data')
+    tempo = time.perf_counter() - inicio
+
+    importados = repo.estatisticas_pedidos()['total_pedidos']
+    return {
+        'cenario': 'importar_csv',
+        'tempo_min': tempo,
+        'tempo_mediana': tempo,
+        'tempo_max': tempo,
+        'repeticoes': 1,
+        'status': resposta.status_code,
+        'linhas_csv': linhas,
+        'itens_esperados': itens,
+        'itens_importados': importados,
+        'linhas_por_segundo': linhas / tempo if tempo else None,
+    }
+
+
+def benchmark_leitura(escala, diretorio, repeticoes, banco_url=None):
+    """Popula um banco com `escala` pedidos e mede as páginas e ações principais"""
+    caminho_db = os.path.join(diretorio, f'leitura_{escala}.db')
+    gerador.popular_banco(caminho_db, escala)
+
+    conn = sqlite3.connect(caminho_db)
+    livres = [r[0] for r in conn.execute('''
+        SELECT id_pedido FROM pedidos
+        WHERE grupo_id IS NULL AND tipo_frete = 'FRETE PADRÃO'
+        ORDER BY id LIMIT ?
+    ''', (repeticoes * 10,))]
+    meio = conn.execute('SELECT id_pedido FROM pedidos WHERE id = ?',
+                        (max(1, escala // 2),)).fetchone()[0]
+    cursor = conn.execute("INSERT INTO grupos (nome) VALUES ('Grupo benchmark')")
+    grupo_destino = cursor.lastrowid
+    conn.commit()
+    conn.close()
+
+    app = create_app({'DATABASE': caminho_db, 'DATABASE_URL': banco_url})
+    repo = app.extensions['repo']
+    if not repo.sqlite:
+        repo.limpar()
+        repositorio.migrar(caminho_db, repo)
+    cliente = app.test_client()
+
+    def lote(i):
+        return livres[i * 5:(i + 1) * 5]
+
+    def acao(nome, selecionados, **extra):
+        dados = {'acao': nome, 'pedidos_selecionados': selecionados}
+        dados.update(extra)
+        return cliente.post('/acoes_lote', data=dados)
+
+    cenarios = [
+        ('dashboard', lambda i: cliente.get('/')),
+        ('todos_pedidos', lambda i: cliente.get('/todos_pedidos')),
+        ('pedidos_disponiveis', lambda i: cliente.get('/pedidos_disponiveis')),
+        ('buscar_pedido', lambda i: cliente.post('/buscar_pedido', data={'id_pedido': meio})),
+        ('acoes_lote_mover_grupo',
+         lambda i: acao('mover_grupo', lote(i), grupo_destino=grupo_destino)),
+        ('acoes_lote_remover_grupos', lambda i: acao('remover_grupos', lote(i))),
+        ('acoes_lote_excluir', lambda i: acao('excluir', lote(i))),
+        ('exportar_csv', lambda i: cliente.get('/exportar_csv')),
+    ]
+
+    resultados = []
+    for nome, funcao in cenarios:
+        resultado = _medir(funcao, repeticoes)
+        resultado['cenario'] = nome
+        resultados.append(resultado)
+        print(f"   {nome:<28} {resultado['tempo_mediana'] * 1000:10.1f} ms  (HTTP {resultado['status']})")
+    return resultados
+
+
+def comparar(atual, caminho_base, tolerancia):
+    """Compara as medianas com uma execução anterior; retorna os cenários que pioraram"""
+    with open(caminho_base, encoding='utf-8') as f:
+        base = json.load(f)
+    referencia = {(r['escala'], r['cenario']): r for r in base['resultados']}
+
+    regressoes = []
+    print(f"\n📈 Comparação com {caminho_base} (tolerância {tolerancia:.2f}x):")
+    for r in atual['resultados']:
+        anterior = referencia.get((r['escala'], r['cenario']))
+        if not anterior or not anterior['tempo_mediana']:
+            continue
+        razao = r['tempo_mediana'] / anterior['tempo_mediana']
+        marcador = '❌' if razao > tolerancia else '✅'
+        print(f"   {marcador} {r['escala']:>9} {r['cenario']:<28} {razao:6.2f}x")
+        if razao > tolerancia:
+            regressoes.append((r['escala'], r['cenario'], razao))
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks de escala do gerenciador de pedidos')
+    parser.add_argument('--escalas', default='1000,10000',
+                        help='Quantidades de pedidos separadas por vírgula (ex.: 1000,100000,1000000)')
+    parser.add_argument('--repeticoes', type=int, default=5, help='Repetições por cenário de leitura')
+    parser.add_argument('--banco-url', help='PostgreSQL para rodar os cenários (o conteúdo é apagado)')
+    parser.add_argument('--sem-importacao', action='store_true', help='Não medir a importação de CSV')
+    parser.add_argument('--saida', help='Arquivo JSON de resultados (padrão: benchmarks/resultados/)')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior para detectar regressões')
+    parser.add_argument('--tolerancia', type=float, default=1.25,
+                        help='Razão máxima aceitável entre a mediana atual e a anterior')
+    args = parser.parse_args()
+
+    escalas = [int(e) for e in args.escalas.split(',') if e.strip()]
+
+    execucao = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'banco': repositorio.criar(args.banco_url).nome,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'plataforma': platform.platform(),
+        'resultados': [],
+    }
+
+    with tempfile.TemporaryDirectory(prefix='benchmark_pedidos_') as diretorio:
+        for escala in escalas:
+            print(f"\n📊 Escala: {escala} pedidos")
+            resultados = []
+            if not args.sem_importacao:
+                r = benchmark_importacao(escala, diretorio, args.banco_url)
+                print(f"   {'importar_csv':<28} {r['tempo_mediana'] * 1000:10.1f} ms  "
+                      f"({r['itens_importados']}/{r['itens_esperados']} itens)")
+                resultados.append(r)
+            resultados.extend(benchmark_leitura(escala, diretorio, args.repeticoes, args.banco_url))
+            for r in resultados:
+                r['escala'] = escala
+            execucao['resultados'].extend(resultados)
+
+    saida = args.saida
+    if not saida:
+        os.makedirs(DIRETORIO_RESULTADOS, exist_ok=True)
+        saida = os.path.join(DIRETORIO_RESULTADOS, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump(execucao, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultados gravados em {saida}")
+
+    if args.comparar:
+        regressoes = comparar(execucao, args.comparar, args.tolerancia)
+        if regressoes:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Teste de carga das configurações do gunicorn
+
+Sobe o app com cada configuração, num banco sintético (ver benchmarks/gerador.py),
+e dispara clientes concorrentes com a mistura de páginas e ações do dia a dia
+(dashboard, listas, busca, ações em lote). Ao mesmo tempo um cliente envia um CSV
+devagar para /importar_csv, como um upload numa conexão ruim, e --streams
+dashboards ficam com o /eventos aberto. Mede vazão, latências, erros, o tempo do
+upload, os eventos recebidos pelos streams e a memória (PSS) do mestre + workers.
+
+Configurações:
+    padrao       gunicorn app:app sem config (1 worker sync, sem preload)
+    sync         gunicorn.conf.py com GUNICORN_WORKER=sync
+    gthread      gunicorn.conf.py (padrão do projeto)
+    sem_preload  gthread sem preload_app (para ver a memória compartilhada)
+    asgi         gunicorn.conf.py com GUNICORN_WORKER=uvicorn, servindo asgi:app
+
+Exemplos:
+    python -m benchmarks.carga
+    python -m benchmarks.carga --pedidos 20000 --clientes 32 --duracao 30 --configs sync,gthread
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from benchmarks import gerador
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGS = {
+    'padrao': {'config': None, 'ambiente': {}},
+    'sync': {'config': 'gunicorn.conf.py', 'ambiente': {'GUNICORN_WORKER': 'sync'}},
+    'gthread': {'config': 'gunicorn.conf.py', 'ambiente': {}},
+    'sem_preload': {'config': 'gunicorn.conf.py', 'ambiente': {'GUNICORN_PRELOAD': '0'}},
+    'asgi': {'config': 'gunicorn.conf.py', 'ambiente': {'GUNICORN_WORKER': 'uvicorn'}, 'app': 'asgi:app'},
+}
+
+# (peso, método, caminho, corpo)
+MISTURA = [
+    (30, 'GET', '/', None),
+    (20, 'GET', '/todos_pedidos', None),
+    (20, 'GET', '/pedidos_disponiveis', None),
+    (20, 'POST', '/buscar_pedido', 'busca'),
+    (10, 'POST', '/acoes_lote', 'lote'),
+]
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _pss_mb(pid):
+    """Memória proporcional (PSS) do processo e dos filhos, em MB (só Linux)"""
+    total = 0
+    pids = [pid]
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            pids += [int(p) for p in f.read().split()]
+        for p in pids:
+            with open(f'/proc/{p}/smaps_rollup') as f:
+                for linha in f:
+                    if linha.startswith('Pss:'):
+                        total += int(linha.split()[1])
+    except OSError:
+        return None
+    return round(total / 1024, 1)
+
+
+def _subir(nome, caminho_db, diretorio, porta, extra):
+    """Inicia o gunicorn com a configuração `nome` e espera o /health/live"""
+    config = CONFIGS[nome]
+    ambiente = dict(os.environ, DATABASE=caminho_db, PORT=str(porta), LOG_NIVEL='WARNING',
+                    METRICAS_DIR=os.path.join(diretorio, f'metricas_{nome}'), **config['ambiente'])
+    ambiente.update(extra)
+    if config['config']:
+        argumentos = ['-c', config['config']]
+    else:
+        # Sem -c o gunicorn leria o gunicorn.conf.py do diretório
+        vazio = os.path.join(diretorio, 'vazio.py')
+        open(vazio, 'w').close()
+        argumentos = ['-c', vazio, '--bind', f'127.0.0.1:{porta}']
+    processo = subprocess.Popen([sys.executable, '-m', 'gunicorn', *argumentos, config.get('app', 'app:app')],
+                                cwd=RAIZ, env=ambiente,
+                                stdout=subprocess.DEVNULL, stderr=open(os.path.join(diretorio, f'{nome}.log'), 'w'))
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', porta, timeout=2)
+            conn.request('GET', '/health/live')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return processo
+        except OSError:
+            time.sleep(0.2)
+    processo.terminate()
+    raise RuntimeError(f'gunicorn ({nome}) não respondeu; ver {diretorio}/{nome}.log')
+
+
+def _cliente(porta, fim, ids, grupo, resultados, semente):
+    """Repete requisições da MISTURA até `fim`, numa conexão keep-alive"""
+    rnd = random.Random(semente)
+    pesos = [m[0] for m in MISTURA]
+    conn = http.client.HTTPConnection('127.0.0.1', porta, timeout=120)
+    while time.monotonic() < fim:
+        _, metodo, caminho, corpo = rnd.choices(MISTURA, pesos)[0]
+        cabecalhos = {}
+        dados = None
+        if corpo == 'busca':
+            dados = f'id_pedido={rnd.choice(ids)}'
+        elif corpo == 'lote':
+            selecionados = '&'.join(f'pedidos_selecionados={i}' for i in rnd.sample(ids, 3))
+            acao = rnd.choice(['remover_grupos', f'mover_grupo&grupo_destino={grupo}'])
+            dados = f'acao={acao}&{selecionados}'
+        if dados is not None:
+            cabecalhos['Content-Type'] = 'application/x-www-form-urlencoded'
+        inicio = time.perf_counter()
+        try:
+            conn.request(metodo, caminho, body=dados, headers=cabecalhos)
+            resposta = conn.getresponse()
+            resposta.read()
+            status = resposta.status
+        except (OSError, http.client.HTTPException):
+            status = 0
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', porta, timeout=120)
+        resultados.append((time.perf_counter() - inicio, status))
+    conn.close()
+
+
+def _stream(porta, fim, contagem):
+    """Mantém o /eventos aberto até `fim`, contando os eventos recebidos"""
+    try:
+        conn = http.client.HTTPConnection('127.0.0.1', porta, timeout=5)
+        conn.request('GET', '/eventos', headers={'Accept': 'text/event-stream'})
+        resposta = conn.getresponse()
+        while time.monotonic() < fim:
+            try:
+                linha = resposta.fp.readline()
+            except socket.timeout:
+                continue
+            if not linha:
+                break
+            if linha.startswith(b'event:'):
+                contagem.append(1)
+        conn.close()
+    except (OSError, http.client.HTTPException):
+        pass
+
+
+def _upload_lento(porta, caminho_csv, duracao, resultado):
+    """Envia o CSV para /importar_csv em pedaços espalhados por `duracao` segundos"""
+    fronteira = uuid.uuid4().hex
+    with open(caminho_csv, 'rb') as f:
+        conteudo = f.read()
+    corpo = (f'--{fronteira}\r\nContent-Disposition: form-data; name="arquivo"; filename="vendas.csv"\r\n'
+             f'Content-Type: text/csv\r\n\r\n').encode() + conteudo + f'\r\n--{fronteira}--\r\n'.encode()
+    pedacos = 20
+    tamanho = len(corpo) // pedacos + 1
+    inicio = time.perf_counter()
+    try:
+        conn = http.client.HTTPConnection('127.0.0.1', porta, timeout=600)
+        conn.putrequest('POST', '/importar_csv')
+        conn.putheader('Content-Type', f'multipart/form-data; boundary={fronteira}')
+        conn.putheader('Content-Length', str(len(corpo)))
+        conn.endheaders()
+        for i in range(pedacos):
+            conn.send(corpo[i * tamanho:(i + 1) * tamanho])
+            time.sleep(duracao / pedacos)
+        resposta = conn.getresponse()
+        resposta.read()
+        resultado['status'] = resposta.status
+        conn.close()
+    except (OSError, http.client.HTTPException) as e:
+        resultado['status'] = f'erro: {e}'
+    resultado['tempo'] = round(time.perf_counter() - inicio, 2)
+
+
+def medir(nome, caminho_base, caminho_csv, diretorio, clientes, duracao, ids, grupo, extra=None, streams=0):
+    caminho_db = os.path.join(diretorio, f'{nome}.db')
+    shutil.copy(caminho_base, caminho_db)
+    porta = _porta_livre()
+    processo = _subir(nome, caminho_db, diretorio, porta, extra or {})
+    try:
+        # Aquecimento: caches de fragmentos e importações dos workers
+        _cliente(porta, time.monotonic() + 2, ids, grupo, [], 0)
+
+        resultados = []
+        upload = {}
+        eventos = []
+        fim = time.monotonic() + duracao
+        abertos = [threading.Thread(target=_stream, args=(porta, fim, eventos)) for _ in range(streams)]
+        for t in abertos:
+            t.start()
+        threads = [threading.Thread(target=_cliente, args=(porta, fim, ids, grupo, resultados, i + 1))
+                   for i in range(clientes)]
+        threads.append(threading.Thread(target=_upload_lento, args=(porta, caminho_csv, duracao / 2, upload)))
+        inicio = time.perf_counter()
+        for t in threads:
+            t.start()
+        time.sleep(duracao / 2)
+        memoria = _pss_mb(processo.pid)
+        for t in threads + abertos:
+            t.join()
+        total = time.perf_counter() - inicio
+    finally:
+        processo.terminate()
+        processo.wait(30)
+
+    tempos = sorted(t for t, _ in resultados)
+    erros = sum(1 for _, s in resultados if s == 0 or s >= 500)
+
+    def percentil(p):
+        return round(tempos[min(len(tempos) - 1, int(len(tempos) * p))] * 1000, 1) if tempos else None
+
+    return {
+        'config': nome,
+        'requisicoes': len(resultados),
+        'por_segundo': round(len(resultados) / total, 1),
+        'p50_ms': round(statistics.median(tempos) * 1000, 1) if tempos else None,
+        'p95_ms': percentil(0.95),
+        'p99_ms': percentil(0.99),
+        'max_ms': round(tempos[-1] * 1000, 1) if tempos else None,
+        'erros': erros,
+        'upload_status': upload.get('status'),
+        'upload_s': upload.get('tempo'),
+        'eventos': len(eventos),
+        'pss_mb': memoria,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga das configurações do gunicorn')
+    parser.add_argument('--pedidos', type=int, default=1000, help='Pedidos no banco sintético')
+    parser.add_argument('--csv', type=int, default=2000, help='Pedidos no CSV do upload lento')
+    parser.add_argument('--clientes', type=int, default=16, help='Clientes simultâneos')
+    parser.add_argument('--duracao', type=float, default=20, help='Segundos de carga por configuração')
+    parser.add_argument('--streams', type=int, default=0, help='Conexões /eventos abertas durante a carga')
+    parser.add_argument('--configs', default=','.join(CONFIGS), help='Configurações a comparar')
+    parser.add_argument('--ambiente', action='append', default=[], metavar='VAR=VALOR',
+                        help='Variável repassada a todas as configurações (ex.: WEB_CONCURRENCY=4)')
+    parser.add_argument('--saida', help='Arquivo JSON com os resultados')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='carga_pedidos_') as diretorio:
+        caminho_base = os.path.join(diretorio, 'base.db')
+        gerador.popular_banco(caminho_base, args.pedidos)
+        caminho_csv = os.path.join(diretorio, 'vendas.csv')
+        gerador.escrever_csv(caminho_csv, args.csv, semente=7)
+
+        conn = sqlite3.connect(caminho_base)
+        ids = [r[0] for r in conn.execute("SELECT id_pedido FROM pedidos WHERE tipo_frete = 'FRETE PADRÃO'")]
+        grupo = conn.execute("INSERT INTO grupos (nome) VALUES ('Grupo carga')").lastrowid
+        conn.commit()
+        conn.close()
+
+        extra = dict(item.split('=', 1) for item in args.ambiente)
+        resultados = []
+        print(f"{'config':<12} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>9} {'erros':>6} "
+              f"{'upload':>12} {'eventos':>8} {'PSS MB':>8}")
+        for nome in args.configs.split(','):
+            r = medir(nome.strip(), caminho_base, caminho_csv, diretorio, args.clientes, args.duracao, ids, grupo,
+                      extra, args.streams)
+            resultados.append(r)
+            print(f"{r['config']:<12} {r['por_segundo']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} "
+                  f"{r['max_ms']:>9} {r['erros']:>6} {str(r['upload_status']) + ' ' + str(r['upload_s']) + 's':>12} "
+                  f"{r['eventos']:>8} {r['pss_mb']:>8}")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump({'cpus': os.cpu_count(), 'argumentos': vars(args), 'resultados': resultados}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Gerador de dados sintéticos no formato de exportação da Nuvemshop
+
+Produz arquivos CSV (separador ';', codificação ISO-8859-1, pedidos com vários
+itens em linhas de continuação) e bancos SQLite já populados, em qualquer escala.
+
+Exemplos:
+    python -m benchmarks.gerador csv vendas_100k.csv --pedidos 100000
+    python -m benchmarks.gerador banco pedidos_1m.db --pedidos 1000000
+"""
+
+import argparse
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+# Cabeçalho idêntico ao da exportação real (45 colunas)
+COLUNAS_NUVEMSHOP = [
+    'Número do Pedido', 'E-mail', 'Data', 'Status do Pedido',
+    'Status do Pagamento', 'Status do Envio', 'Moeda', 'Subtotal',
+    'Desconto', 'Valor do Frete', 'Total', 'Nome do comprador',
+    'CPF / CNPJ', 'Telefone', 'Nome para a entrega', 'Telefone para a entrega',
+    'Endereço', 'Número', 'Complemento', 'Bairro', 'Cidade',
+    'Código postal', 'Estado', 'País', 'Forma de Entrega',
+    'Forma de Pagamento', 'Cupom de Desconto', 'Anotações do Comprador',
+    'Anotações do Vendedor', 'Data de pagamento', 'Data de envío',
+    'Nome do Produto', 'Valor do Produto', 'Quantidade Comprada',
+    'SKU', 'Canal', 'Código de rastreio do envio',
+    'Identificador da transação no meio de pagamento', 'Identificador do pedido',
+    'Produto Fisico', 'Pessoa que registrou a venda', 'Local de venda',
+    'Vendedor', 'Data e hora do cancelamento', 'Motivo do cancelamento'
+]
+
+NOMES = ['João', 'Maria', 'José', 'Ana', 'Antônio', 'Júlia', 'Vinícius', 'Letícia',
+         'Sebastião', 'Conceição', 'Luís', 'Inês', 'Thiago', 'Camila', 'Gabriel',
+         'Lúcia', 'André', 'Mônica', 'Caio', 'Fátima', 'Otávio', 'Débora']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Conceição', 'Gonçalves',
+              'Araújo', 'Ribeiro', 'Simões', 'Magalhães', 'Falcão', 'Brandão', 'Paixão']
+CIDADES = [('São Paulo', 'São Paulo'), ('Chã de Alegria', 'Pernambuco'),
+           ('São Leopoldo', 'Rio Grande do Sul'), ('Goiânia', 'Goiás'),
+           ('Belém', 'Pará'), ('Florianópolis', 'Santa Catarina'),
+           ('Maceió', 'Alagoas'), ('Sinop', 'Mato Grosso'), ('Niterói', 'Rio de Janeiro')]
+RUAS = ['Rua José de Alencar', 'Avenida Paulista', 'Rua Josefa Maria de Santana',
+        'Travessa São João', 'Rua Otávio Pereira Lima', 'Avenida Getúlio Vargas']
+BAIRROS = ['Centro', 'Vila Buarque', 'Jardim América', 'Morro do Espelho', 'Boa Vista']
+TIMES = ['Brasil 2024', 'Real Madrid I 25/26', 'Barcelona retrô 2014/15', 'Grêmio II 25/26',
+         'São Paulo kit infantil 2024/25', 'Corinthians 2024 all black', 'Milan retro 06/07',
+         'Atlético de Madrid II 25/26', 'PSG Paris Saint-Germain 2025/26', 'Palmeiras Edição especial']
+TAMANHOS = ['PP', 'P', 'M', 'G', 'GG', 'XG', 'XXG']
+PERSONALIZACAO = ['Sem personalização', 'COM PERSONALIZAÇÃO']
+FRETES_PADRAO = ['Custo e prazo de entrega padrão', 'Frete padrão', 'Frete Internacional']
+FRETES_EXPRESSO = ['Frete Expresso', 'Sedex Expresso']
+STATUS_ENVIO = ['Não está embalado', 'Pronto para enviar', 'Enviado']
+STATUS_PAGAMENTO = ['Confirmado', 'Pendente', 'Recusado']
+
+
+def _quotar(valor):
+    """Aplica as aspas do jeito que a Nuvemshop exporta (só quando há espaço ou separador)"""
+    valor = str(valor)
+    if any(c in valor for c in ' ;",'):
+        return '"' + valor.replace('"', '""') + '"'
+    return valor
+
+
+def gerar_pedidos(total, semente=42, proporcao_expresso=0.2, max_itens=4, inicio=1):
+    """Gera `total` pedidos sintéticos como dicionários com a lista de itens"""
+    rnd = random.Random(semente)
+    data_base = datetime(2024, 1, 1)
+
+    for n in range(inicio, inicio + total):
+        nome = f"{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}"
+        cidade, estado = rnd.choice(CIDADES)
+        expresso = rnd.random() < proporcao_expresso
+        # Maioria dos pedidos tem um item, alguns têm vários
+        quantidade_itens = 1 if rnd.random() < 0.75 else rnd.randint(2, max_itens)
+        itens = []
+        for _ in range(quantidade_itens):
+            tamanho = rnd.choice(TAMANHOS)
+            produto = f"Camisa {rnd.choice(TIMES)} ({tamanho}, {rnd.choice(PERSONALIZACAO)})"
+            itens.append((produto, tamanho, rnd.choice([159.9, 179.9, 189.9, 219.9])))
+
+        subtotal = round(sum(i[2] for i in itens), 2)
+        desconto = round(subtotal * rnd.choice([0, 0, 0.05, 0.1]), 2)
+        frete = round(rnd.uniform(15, 45), 2) if expresso else 0.0
+        data = data_base + timedelta(minutes=n * 7 + rnd.randint(0, 6))
+
+        yield {
+            'numero_pedido': str(n),
+            'email': f"cliente{n}@exemplo.com.br",
+            'data': data.strftime('%d/%m/%Y %H:%M:%S'),
+            'status_pagamento': rnd.choice(STATUS_PAGAMENTO),
+            'status_envio': rnd.choice(STATUS_ENVIO),
+            'subtotal': subtotal,
+            'desconto': desconto,
+            'valor_frete': frete,
+            'total': round(subtotal - desconto + frete, 2),
+            'nome': nome,
+            'cpf': f"{rnd.randint(0, 99999999999):011d}",
+            'telefone': f"+55{rnd.randint(11, 99)}9{rnd.randint(10000000, 99999999)}",
+            'endereco': rnd.choice(RUAS),
+            'numero': str(rnd.randint(1, 9999)),
+            'complemento': rnd.choice(['', '', 'AP 703', 'Última casa à direita']),
+            'bairro': rnd.choice(BAIRROS),
+            'cidade': cidade,
+            'cep': f"{rnd.randint(1000000, 99999999):08d}",
+            'estado': estado,
+            'forma_entrega': rnd.choice(FRETES_EXPRESSO if expresso else FRETES_PADRAO),
+            'data_pagamento': data.strftime('%d/%m/%Y'),
+            'tipo_frete': 'EXPRESSO' if expresso else 'FRETE PADRÃO',
+            'itens': itens,
+        }
+
+
+def _linhas_csv(pedido):
+    """Converte um pedido nas linhas da exportação (primeira completa, demais de continuação)"""
+    produto, _, valor = pedido['itens'][0]
+    primeira = [
+        pedido['numero_pedido'], pedido['email'], pedido['data'], 'Aberto',
+        pedido['status_pagamento'], pedido['status_envio'], 'BRL', pedido['subtotal'],
+        f"{pedido['desconto']:.2f}", pedido['valor_frete'], pedido['total'], pedido['nome'],
+        pedido['cpf'], pedido['telefone'], pedido['nome'], pedido['telefone'],
+        pedido['endereco'], pedido['numero'], pedido['complemento'], pedido['bairro'],
+        pedido['cidade'], pedido['cep'], pedido['estado'], 'Brasil', pedido['forma_entrega'],
+        'Nuvem Pago', '', '', '', pedido['data_pagamento'], '',
+        produto, valor, 1, '', 'Mobile', '=""', '', pedido['numero_pedido'],
+        'Sim', '', '', '', '', ''
+    ]
+    yield primeira
+    for produto, _, valor in pedido['itens'][1:]:
+        continuacao = [''] * len(COLUNAS_NUVEMSHOP)
+        continuacao[0] = pedido['numero_pedido']
+        continuacao[1] = pedido['email']
+        continuacao[31] = produto
+        continuacao[32] = valor
+        continuacao[33] = 1
+        continuacao[39] = 'Sim'
+        yield continuacao
+
+
+def escrever_csv(caminho, total, semente=42, proporcao_expresso=0.2, encoding='iso-8859-1'):
+    """Escreve um CSV no formato Nuvemshop e retorna (pedidos, linhas, itens)"""
+    linhas = 0
+    itens = 0
+    with open(caminho, 'w', encoding=encoding, newline='') as f:
+        f.write(';'.join(_quotar(c) for c in COLUNAS_NUVEMSHOP) + '\n')
+        for pedido in gerar_pedidos(total, semente, proporcao_expresso):
+            itens += len(pedido['itens'])
+            for linha in _linhas_csv(pedido):
+                f.write(';'.join(_quotar(v) for v in linha) + '\n')
+                linhas += 1
+    return total, linhas, itens
+
+
+def popular_banco(caminho, total, semente=42, proporcao_expresso=0.2,
+                  proporcao_agrupada=0.6, proporcao_enviada=0.5):
+    """Cria um banco SQLite com o schema da aplicação e `total` pedidos já organizados em grupos"""
+    from gerenciador import banco
+    banco.init_db(caminho)
+
+    rnd = random.Random(semente + 1)
+    conn = sqlite3.connect(caminho)
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA journal_mode = MEMORY')
+
+    pedidos = []
+    completos = []
+    padrao = []
+    total_itens = 0
+    data_base = datetime(2024, 1, 1)
+    for pedido in gerar_pedidos(total, semente, proporcao_expresso):
+        criacao = (data_base + timedelta(minutes=int(pedido['numero_pedido']) * 7)).strftime('%Y-%m-%d %H:%M:%S')
+        total_itens += len(pedido['itens'])
+        for i, (produto, tamanho, valor) in enumerate(pedido['itens']):
+            id_produto = f"{pedido['numero_pedido']}_{i+1}" if i > 0 else pedido['numero_pedido']
+            pedidos.append((id_produto, pedido['nome'], produto, tamanho, pedido['tipo_frete'], criacao))
+            completos.append((id_produto, pedido['email'], pedido['data'], 'Aberto',
+                              pedido['status_pagamento'], pedido['status_envio'], 'BRL',
+                              pedido['subtotal'], pedido['desconto'], pedido['valor_frete'],
+                              pedido['total'], pedido['nome'], pedido['cidade'], pedido['estado'],
+                              pedido['forma_entrega'], produto, valor))
+            if pedido['tipo_frete'] == 'FRETE PADRÃO':
+                padrao.append(id_produto)
+
+        if len(pedidos) >= 50000:
+            _gravar_lote(conn, pedidos, completos)
+            pedidos, completos = [], []
+    _gravar_lote(conn, pedidos, completos)
+
+    # Agrupar parte dos pedidos padrão em grupos de até 5
+    agrupar = padrao[:int(len(padrao) * proporcao_agrupada)]
+    atribuicoes = []
+    for inicio in range(0, len(agrupar), 5):
+        numero = inicio // 5 + 1
+        enviado = 1 if rnd.random() < proporcao_enviada else 0
+        rastreio = f"BR{rnd.randint(100000000, 999999999)}BR" if enviado else None
+        cursor = conn.execute('INSERT INTO grupos (nome, codigo_rastreio, enviado) VALUES (?, ?, ?)',
+                              (f'Grupo {numero}', rastreio, enviado))
+        atribuicoes.extend((cursor.lastrowid, id_pedido) for id_pedido in agrupar[inicio:inicio + 5])
+    conn.executemany('UPDATE pedidos SET grupo_id = ? WHERE id_pedido = ?', atribuicoes)
+
+    conn.commit()
+    conn.close()
+    return {'pedidos': total, 'itens': total_itens, 'grupos': (len(agrupar) + 4) // 5}
+
+
+def _gravar_lote(conn, pedidos, completos):
+    conn.executemany('''
+        INSERT INTO pedidos (id_pedido, nome_cliente, produto, tamanho, tipo_frete, data_criacao)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', pedidos)
+    conn.executemany('''
+        INSERT INTO pedidos_completos (
+            numero_pedido, email, data_pedido, status_pedido, status_pagamento, status_envio,
+            moeda, subtotal, desconto, valor_frete, total, nome_comprador, cidade, estado,
+            forma_entrega, nome_produto, valor_produto
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', completos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera dados sintéticos de pedidos da Nuvemshop')
+    parser.add_argument('tipo', choices=['csv', 'banco'], help='Gerar arquivo CSV ou banco SQLite')
+    parser.add_argument('destino', help='Caminho do arquivo a ser criado')
+    parser.add_argument('--pedidos', type=int, default=1000, help='Quantidade de pedidos')
+    parser.add_argument('--semente', type=int, default=42, help='Semente do gerador aleatório')
+    parser.add_argument('--expresso', type=float, default=0.2, help='Proporção de pedidos EXPRESSO')
+    args = parser.parse_args()
+
+    if args.tipo == 'csv':
+        pedidos, linhas, itens = escrever_csv(args.destino, args.pedidos, args.semente, args.expresso)
+        print(f"✅ CSV gerado: {args.destino} ({pedidos} pedidos, {itens} itens, {linhas} linhas)")
+    else:
+        resumo = popular_banco(args.destino, args.pedidos, args.semente, args.expresso)
+        print(f"✅ Banco gerado: {args.destino} ({resumo['pedidos']} pedidos, {resumo['grupos']} grupos)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+API de pedidos da Nuvemshop falsa, para testar a sincronização sem rede
+
+Serve GET /v1/<loja>/orders e /v1/<loja>/orders/<id> com o mesmo contrato usado
+por sincronizacao.py e webhooks.py:
+paginação por page/per_page (máx. 200), filtros updated_at_min/updated_at_max,
+cabeçalhos X-Total-Count e Link, 404 além da última página, autenticação pelo
+cabeçalho "Authentication: bearer <token>" e limite de taxa em balde furado
+(X-Rate-Limit-Limit/Remaining/Reset e 429 quando o balde enche).
+
+Os pedidos vêm de um arquivo de fixture (lista JSON no formato da API, ver
+benchmarks/fixtures/nuvemshop_pedidos.json) ou são gerados pelo gerador em
+qualquer escala. Para exercitar a sincronização incremental:
+
+    POST /controle/alterar?quantidade=N   altera N pedidos (status e updated_at)
+    POST /controle/novos?quantidade=N     cria N pedidos novos
+
+Exemplos:
+    python -m benchmarks.nuvemshop_falsa --fixture benchmarks/fixtures/nuvemshop_pedidos.json
+    python -m benchmarks.nuvemshop_falsa --pedidos 30000 --taxa 20 --falhas 0.02
+
+    NUVEMSHOP_API_URL=http://127.0.0.1:8765/v1 NUVEMSHOP_LOJA_ID=1 NUVEMSHOP_TOKEN=teste \\
+        python sincronizacao.py --banco pedidos.db
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from benchmarks import gerador
+
+POR_PAGINA_MAXIMO = 200
+STATUS_PAGAMENTO = {'Confirmado': 'paid', 'Pendente': 'pending', 'Recusado': 'voided'}
+STATUS_ENVIO = {'Não está embalado': 'unpacked', 'Pronto para enviar': 'packed', 'Enviado': 'fulfilled'}
+
+
+def _iso(momento):
+    return momento.strftime('%Y-%m-%dT%H:%M:%S+0000')
+
+
+def pedido_api(pedido, identificador, momento):
+    """Converte um pedido do gerador no JSON devolvido pela API"""
+    data = datetime.strptime(pedido['data'], '%d/%m/%Y %H:%M:%S').replace(tzinfo=timezone.utc)
+    return {
+        'id': identificador,
+        'number': int(pedido['numero_pedido']),
+        'contact_email': pedido['email'],
+        'contact_name': pedido['nome'],
+        'contact_phone': pedido['telefone'],
+        'contact_identification': pedido['cpf'],
+        'created_at': _iso(data),
+        'updated_at': _iso(momento),
+        'status': 'open',
+        'payment_status': STATUS_PAGAMENTO[pedido['status_pagamento']],
+        'shipping_status': STATUS_ENVIO[pedido['status_envio']],
+        'currency': 'BRL',
+        'subtotal': f"{pedido['subtotal']:.2f}",
+        'discount': f"{pedido['desconto']:.2f}",
+        'shipping_cost_customer': f"{pedido['valor_frete']:.2f}",
+        'total': f"{pedido['total']:.2f}",
+        'customer': {'name': pedido['nome'], 'email': pedido['email'],
+                     'identification': pedido['cpf'], 'phone': pedido['telefone']},
+        'shipping_address': {
+            'name': pedido['nome'], 'phone': pedido['telefone'], 'address': pedido['endereco'],
+            'number': pedido['numero'], 'floor': pedido['complemento'], 'locality': pedido['bairro'],
+            'city': pedido['cidade'], 'zipcode': pedido['cep'], 'province': pedido['estado'],
+            'country': 'BR',
+        },
+        'shipping_option': pedido['forma_entrega'],
+        'gateway_name': 'Nuvem Pago',
+        'payment_details': {'method': 'credit_card'},
+        'coupon': [],
+        'note': '',
+        'owner_note': '',
+        'paid_at': _iso(data),
+        'shipped_at': None,
+        'products': [{'name': nome, 'price': f'{valor:.2f}', 'quantity': 1}
+                     for nome, _, valor in pedido['itens']],
+    }
+
+
+class Loja:
+    """Pedidos em memória, ordenados por id, com alterações simuladas"""
+
+    def __init__(self, pedidos):
+        self.pedidos = sorted(pedidos, key=lambda p: p['id'])
+        self.por_id = {p['id']: p for p in self.pedidos}
+        self._lock = threading.Lock()
+        self._rnd = random.Random(7)
+
+    @classmethod
+    def sintetica(cls, total, semente=42):
+        inicio = datetime.now(timezone.utc) - timedelta(days=30)
+        passo = timedelta(days=29) / max(total, 1)
+        return cls(pedido_api(p, 100000 + n, inicio + passo * n)
+                   for n, p in enumerate(gerador.gerar_pedidos(total, semente)))
+
+    @classmethod
+    def de_fixture(cls, caminho):
+        with open(caminho, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def filtrar(self, minimo=None, maximo=None):
+        # Todas as datas estão em UTC no mesmo formato: a comparação de texto basta
+        minimo = _iso(minimo.astimezone(timezone.utc)) if minimo else ''
+        maximo = _iso(maximo.astimezone(timezone.utc)) if maximo else '~'
+        with self._lock:
+            return [p for p in self.pedidos if minimo <= p['updated_at'] <= maximo]
+
+    def alterar(self, quantidade):
+        """Muda o status de `quantidade` pedidos e atualiza o updated_at"""
+        agora = _iso(datetime.now(timezone.utc))
+        with self._lock:
+            escolhidos = self._rnd.sample(self.pedidos, min(quantidade, len(self.pedidos)))
+            for pedido in escolhidos:
+                pedido['shipping_status'] = 'fulfilled'
+                pedido['shipped_at'] = agora
+                pedido['owner_note'] = f'Alterado em {agora}'
+                pedido['updated_at'] = agora
+        return [p['number'] for p in escolhidos]
+
+    def obter(self, identificador):
+        with self._lock:
+            return self.por_id.get(identificador)
+
+    def novos(self, quantidade):
+        agora = datetime.now(timezone.utc)
+        with self._lock:
+            ultimo_numero = max((p['number'] for p in self.pedidos), default=0)
+            ultimo_id = max((p['id'] for p in self.pedidos), default=100000)
+            criados = [pedido_api(p, ultimo_id + i + 1, agora) for i, p in enumerate(
+                gerador.gerar_pedidos(quantidade, semente=ultimo_numero, inicio=ultimo_numero + 1))]
+            self.pedidos.extend(criados)
+            self.por_id.update((p['id'], p) for p in criados)
+        return [p['number'] for p in criados]
+
+
+class BaldeFurado:
+    """Limite de taxa da API: `capacidade` requisições, esvaziando `taxa` por segundo"""
+
+    def __init__(self, capacidade=40, taxa=2.0):
+        self.capacidade = capacidade
+        self.taxa = taxa
+        self.nivel = 0.0
+        self._momento = time.monotonic()
+        self._lock = threading.Lock()
+
+    def entrar(self):
+        """Retorna (aceita, restantes, ms até esvaziar)"""
+        with self._lock:
+            agora = time.monotonic()
+            self.nivel = max(0.0, self.nivel - (agora - self._momento) * self.taxa)
+            self._momento = agora
+            aceita = self.nivel + 1 <= self.capacidade
+            if aceita:
+                self.nivel += 1
+            restantes = int(self.capacidade - self.nivel)
+            return aceita, restantes, int(self.nivel / self.taxa * 1000)
+
+
+class ServidorFalso(ThreadingHTTPServer):
+    daemon_threads = True
+    # O padrão (5) descarta conexões quando o cliente abre dezenas ao mesmo tempo
+    request_queue_size = 256
+
+    def __init__(self, endereco, loja, token='teste', balde=None, falhas=0.0):
+        super().__init__(endereco, Manipulador)
+        self.loja = loja
+        self.token = token
+        self.balde = balde or BaldeFurado()
+        self.falhas = falhas
+        self.requisicoes = 0
+        self.recusadas = 0
+
+    @property
+    def url(self):
+        return f'http://{self.server_address[0]}:{self.server_address[1]}/v1'
+
+    def iniciar(self):
+        """Atende numa thread em segundo plano (uso em testes); retorna a URL base"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.url
+
+
+class Manipulador(BaseHTTPRequestHandler):
+    server_version = 'NuvemshopFalsa/1.0'
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, status, dados, cabecalhos=()):
+        corpo = json.dumps(dados, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        for nome, valor in cabecalhos:
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        quantidade = int(parse_qs(url.query).get('quantidade', ['1'])[0])
+        if url.path == '/controle/alterar':
+            self._responder(200, {'alterados': self.server.loja.alterar(quantidade)})
+        elif url.path == '/controle/novos':
+            self._responder(200, {'criados': self.server.loja.novos(quantidade)})
+        else:
+            self._responder(404, {'code': 404, 'message': 'Not Found'})
+
+    def do_GET(self):
+        servidor = self.server
+        servidor.requisicoes += 1
+        url = urlsplit(self.path)
+        partes = url.path.strip('/').split('/')
+        if len(partes) not in (3, 4) or partes[0] != 'v1' or partes[2] != 'orders':
+            return self._responder(404, {'code': 404, 'message': 'Not Found'})
+        if self.headers.get('Authentication') != f'bearer {servidor.token}':
+            return self._responder(401, {'code': 401, 'message': 'Unauthorized'})
+
+        aceita, restantes, reset = servidor.balde.entrar()
+        limite = [('X-Rate-Limit-Limit', str(servidor.balde.capacidade)),
+                  ('X-Rate-Limit-Remaining', str(restantes)), ('X-Rate-Limit-Reset', str(reset))]
+        if not aceita:
+            servidor.recusadas += 1
+            return self._responder(429, {'code': 429, 'message': 'Too Many Requests'}, limite)
+        if servidor.falhas and random.random() < servidor.falhas:
+            return self._responder(503, {'code': 503, 'message': 'Service Unavailable'}, limite)
+
+        if len(partes) == 4:
+            pedido = servidor.loja.obter(int(partes[3])) if partes[3].isdigit() else None
+            if pedido is None:
+                return self._responder(404, {'code': 404, 'message': 'Not Found'}, limite)
+            return self._responder(200, pedido, limite)
+
+        parametros = {k: v[0] for k, v in parse_qs(url.query).items()}
+        try:
+            pagina = int(parametros.get('page', 1))
+            por_pagina = min(int(parametros.get('per_page', 30)), POR_PAGINA_MAXIMO)
+            minimo = parametros.get('updated_at_min')
+            maximo = parametros.get('updated_at_max')
+            pedidos = servidor.loja.filtrar(datetime.fromisoformat(minimo) if minimo else None,
+                                            datetime.fromisoformat(maximo) if maximo else None)
+        except ValueError as e:
+            return self._responder(422, {'code': 422, 'message': 'Unprocessable Entity',
+                                         'description': str(e)}, limite)
+
+        ultima = max(1, -(-len(pedidos) // por_pagina))
+        if pagina > ultima or pagina < 1:
+            return self._responder(404, {'code': 404, 'message': 'Not Found',
+                                         'description': f'Last page is {ultima}'}, limite)
+
+        def link(numero, rel):
+            consulta = urlencode(dict(parametros, page=numero))
+            return f'<{servidor.url}/{partes[1]}/orders?{consulta}>; rel="{rel}"'
+        links = [link(pagina + 1, 'next')] if pagina < ultima else []
+        links.append(link(ultima, 'last'))
+
+        inicio = (pagina - 1) * por_pagina
+        self._responder(200, pedidos[inicio:inicio + por_pagina],
+                        limite + [('X-Total-Count', str(len(pedidos))), ('Link', ', '.join(links))])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API de pedidos da Nuvemshop falsa, para testes locais')
+    origem = parser.add_mutually_exclusive_group()
+    origem.add_argument('--fixture', help='Arquivo JSON com a lista de pedidos no formato da API')
+    origem.add_argument('--pedidos', type=int, default=1000, help='Gerar esta quantidade de pedidos')
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--token', default='teste')
+    parser.add_argument('--capacidade', type=int, default=40, help='Tamanho do balde do limite de taxa')
+    parser.add_argument('--taxa', type=float, default=2.0, help='Requisições por segundo liberadas')
+    parser.add_argument('--falhas', type=float, default=0.0, help='Proporção de respostas 503')
+    args = parser.parse_args()
+
+    loja = Loja.de_fixture(args.fixture) if args.fixture else Loja.sintetica(args.pedidos)
+    servidor = ServidorFalso(('127.0.0.1', args.porta), loja, args.token,
+                             BaldeFurado(args.capacidade, args.taxa), args.falhas)
+    print(f'{len(loja.pedidos)} pedidos em {servidor.url}/<loja>/orders')
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
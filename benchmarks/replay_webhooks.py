@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Reenvio de webhooks da Nuvemshop para testar /webhooks/nuvemshop localmente
+
+Envia eventos assinados com HMAC-SHA256 (como a Nuvemshop faz) numa taxa fixa e
+com várias conexões simultâneas, e mede o tempo de confirmação de cada um. Os
+eventos vêm de um arquivo JSONL ({"store_id", "event", "id"} por linha, o mesmo
+corpo que a Nuvemshop envia) ou são sorteados sobre um intervalo de ids de pedido
+— por padrão os da loja sintética de benchmarks/nuvemshop_falsa.py, com vários
+eventos para o mesmo pedido, como numa promoção.
+
+Exemplos:
+    python -m benchmarks.replay_webhooks --url http://127.0.0.1:5000/webhooks/nuvemshop \\
+        --segredo teste --eventos 5000 --taxa 500
+    python -m benchmarks.replay_webhooks --arquivo eventos.jsonl --segredo teste
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+EVENTOS_PEDIDO = ['order/created', 'order/updated', 'order/paid', 'order/packed',
+                  'order/fulfilled', 'order/cancelled']
+
+
+def sortear_eventos(total, ids, loja_id='1', semente=42):
+    """Gera `total` eventos concentrados em poucos pedidos (criado, pago, embalado...)"""
+    rnd = random.Random(semente)
+    quentes = rnd.sample(ids, max(1, len(ids) // 10))
+    for _ in range(total):
+        recurso = rnd.choice(quentes) if rnd.random() < 0.6 else rnd.choice(ids)
+        yield {'store_id': int(loja_id), 'event': rnd.choice(EVENTOS_PEDIDO), 'id': recurso}
+
+
+def ler_eventos(caminho):
+    with open(caminho, encoding='utf-8') as f:
+        for linha in f:
+            if linha.strip():
+                yield json.loads(linha)
+
+
+def assinar(corpo, segredo):
+    return hmac.new(segredo.encode('utf-8'), corpo, hashlib.sha256).hexdigest()
+
+
+def reenviar(url, eventos, segredo, taxa=200.0, concorrencia=16, assinatura_errada=False):
+    """Envia os eventos e retorna as estatísticas de confirmação"""
+    tempos = []
+    status = {}
+    lock = threading.Lock()
+
+    def enviar(evento):
+        corpo = json.dumps(evento).encode('utf-8')
+        assinatura = assinar(corpo, segredo + 'x' if assinatura_errada else segredo)
+        requisicao = urllib.request.Request(url, data=corpo, method='POST', headers={
+            'Content-Type': 'application/json', 'X-Linkedstore-Hmac-Sha256': assinatura})
+        inicio = time.perf_counter()
+        try:
+            with urllib.request.urlopen(requisicao, timeout=30) as resposta:
+                codigo = resposta.status
+        except urllib.error.HTTPError as e:
+            codigo = e.code
+        except OSError:
+            codigo = 'erro de rede'
+        with lock:
+            tempos.append(time.perf_counter() - inicio)
+            status[codigo] = status.get(codigo, 0) + 1
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(concorrencia) as executor:
+        for n, evento in enumerate(eventos):
+            # Mantém a taxa pedida: o evento n sai em n/taxa segundos
+            atraso = inicio + n / taxa - time.perf_counter()
+            if atraso > 0:
+                time.sleep(atraso)
+            executor.submit(enviar, evento)
+    duracao = time.perf_counter() - inicio
+
+    tempos.sort()
+    return {
+        'eventos': len(tempos),
+        'duracao': round(duracao, 2),
+        'eventos_por_segundo': round(len(tempos) / duracao, 1) if duracao else None,
+        'status': status,
+        'confirmacao_mediana_ms': round(statistics.median(tempos) * 1000, 2) if tempos else None,
+        'confirmacao_p99_ms': round(tempos[int(len(tempos) * 0.99) - 1] * 1000, 2) if tempos else None,
+        'confirmacao_max_ms': round(tempos[-1] * 1000, 2) if tempos else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reenvia webhooks assinados para o app')
+    parser.add_argument('--url', default='http://127.0.0.1:5000/webhooks/nuvemshop')
+    parser.add_argument('--segredo', required=True, help='Mesmo valor de NUVEMSHOP_APP_SECRET')
+    parser.add_argument('--arquivo', help='JSONL com os eventos a reenviar')
+    parser.add_argument('--eventos', type=int, default=1000, help='Eventos sorteados (sem --arquivo)')
+    parser.add_argument('--ids', default='100000-100999', help='Intervalo de ids de pedido sorteados')
+    parser.add_argument('--loja', default='1')
+    parser.add_argument('--taxa', type=float, default=200.0, help='Eventos por segundo')
+    parser.add_argument('--concorrencia', type=int, default=16)
+    args = parser.parse_args()
+
+    if args.arquivo:
+        eventos = list(ler_eventos(args.arquivo))
+    else:
+        primeiro, ultimo = (int(x) for x in args.ids.split('-'))
+        eventos = list(sortear_eventos(args.eventos, list(range(primeiro, ultimo + 1)), args.loja))
+    resultado = reenviar(args.url, eventos, args.segredo, args.taxa, args.concorrencia)
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+API de rastreamento falsa, para testar rastreamento.py sem rede
+
+Responde GET /track/json?codigo=XX no formato do Link & Track: {"codigo",
+"quantidade", "eventos": [{"data", "hora", "local", "status"}]}, do evento mais
+recente para o mais antigo. Os eventos de cada código são determinísticos (sorteados
+a partir do próprio código) e vão aparecendo com o tempo: um novo a cada --passo
+segundos desde que o servidor subiu, até "Objeto entregue ao destinatário".
+
+Para exercitar o cliente: --latencia (ms por resposta), --falhas (proporção de 503)
+e --limite (requisições por segundo; acima disso responde 429 com Retry-After).
+Mantém as conexões abertas (HTTP/1.1), como uma API real.
+
+Exemplo:
+    python -m benchmarks.transportadora_falsa --porta 8766 --passo 5 --falhas 0.05
+    RASTREIO_API_URL=http://127.0.0.1:8766/track/json python rastreamento.py --banco pedidos.db
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+ETAPAS = [
+    ('Objeto postado', 'Agência dos Correios - São Paulo/SP'),
+    ('Objeto em trânsito - por favor aguarde', 'Unidade de Tratamento - São Paulo/SP'),
+    ('Objeto em trânsito - por favor aguarde', 'Unidade de Tratamento - {cidade}'),
+    ('Objeto saiu para entrega ao destinatário', 'Unidade de Distribuição - {cidade}'),
+    ('Objeto entregue ao destinatário', '{cidade}'),
+]
+CIDADES = ['Recife/PE', 'Porto Alegre/RS', 'Goiânia/GO', 'Belém/PA', 'Florianópolis/SC', 'Niterói/RJ']
+
+
+def eventos_do_codigo(codigo, etapas_visiveis):
+    """Eventos do código até a etapa atual, do mais recente ao mais antigo"""
+    rnd = random.Random(codigo)
+    cidade = rnd.choice(CIDADES)
+    # Alguns códigos "travam" no meio do caminho e nunca são entregues
+    total = len(ETAPAS) if rnd.random() < 0.8 else rnd.randint(1, len(ETAPAS) - 1)
+    momento = datetime(2025, 6, 1, 8) + timedelta(hours=rnd.randint(0, 240))
+    eventos = []
+    for status, local in ETAPAS[:min(total, etapas_visiveis)]:
+        momento += timedelta(hours=rnd.randint(6, 40), minutes=rnd.randint(0, 59))
+        eventos.append({'data': momento.strftime('%d/%m/%Y'), 'hora': momento.strftime('%H:%M'),
+                        'local': local.format(cidade=cidade), 'status': status, 'subStatus': []})
+    eventos.reverse()
+    return eventos
+
+
+class ServidorFalso(ThreadingHTTPServer):
+    daemon_threads = True
+    # O padrão (5) descarta conexões quando o cliente abre dezenas ao mesmo tempo
+    request_queue_size = 256
+
+    def __init__(self, endereco, passo=60.0, latencia=0.0, falhas=0.0, limite=0):
+        super().__init__(endereco, Manipulador)
+        self.passo = passo
+        self.latencia = latencia
+        self.falhas = falhas
+        self.limite = limite
+        self.inicio = time.monotonic()
+        self.requisicoes = 0
+        self.conexoes = 0
+        self._lock = threading.Lock()
+        self._janela = (0, 0)
+
+    @property
+    def url(self):
+        return f'http://{self.server_address[0]}:{self.server_address[1]}/track/json'
+
+    def iniciar(self):
+        """Atende numa thread em segundo plano (uso em testes); retorna a URL"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.url
+
+    def handle_error(self, requisicao, endereco):
+        # Cliente que desistiu da resposta (timeout) não é erro do servidor
+        pass
+
+    def etapas_visiveis(self):
+        return 1 + int((time.monotonic() - self.inicio) / self.passo)
+
+    def dentro_do_limite(self):
+        """Janela fixa de um segundo"""
+        if not self.limite:
+            return True
+        with self._lock:
+            segundo, quantidade = self._janela
+            agora = int(time.monotonic())
+            if agora != segundo:
+                segundo, quantidade = agora, 0
+            self._janela = (segundo, quantidade + 1)
+            return quantidade < self.limite
+
+
+class Manipulador(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'TransportadoraFalsa/1.0'
+
+    def log_message(self, formato, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.conexoes += 1
+
+    def _responder(self, status, dados, cabecalhos=()):
+        corpo = json.dumps(dados, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        for nome, valor in cabecalhos:
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        servidor = self.server
+        servidor.requisicoes += 1
+        url = urlsplit(self.path)
+        if url.path != '/track/json':
+            return self._responder(404, {'erro': 'Não encontrado'})
+        if not servidor.dentro_do_limite():
+            return self._responder(429, {'erro': 'Limite de requisições'}, [('Retry-After', '1')])
+        if servidor.latencia:
+            time.sleep(servidor.latencia)
+        if servidor.falhas and random.random() < servidor.falhas:
+            return self._responder(503, {'erro': 'Serviço indisponível'})
+
+        codigo = parse_qs(url.query).get('codigo', [''])[0].upper()
+        eventos = eventos_do_codigo(codigo, servidor.etapas_visiveis()) if codigo else []
+        self._responder(200, {'codigo': codigo, 'servico': 'PAC', 'quantidade': len(eventos),
+                              'eventos': eventos})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API de rastreamento falsa, para testes locais')
+    parser.add_argument('--porta', type=int, default=8766)
+    parser.add_argument('--passo', type=float, default=60.0, help='Segundos entre novos eventos')
+    parser.add_argument('--latencia', type=float, default=50.0, help='Milissegundos por resposta')
+    parser.add_argument('--falhas', type=float, default=0.0, help='Proporção de respostas 503')
+    parser.add_argument('--limite', type=int, default=0, help='Requisições por segundo (0 = sem limite)')
+    args = parser.parse_args()
+
+    servidor = ServidorFalso(('127.0.0.1', args.porta), args.passo, args.latencia / 1000,
+                             args.falhas, args.limite)
+    print(f'Rastreamento em {servidor.url}?codigo=<código>')
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
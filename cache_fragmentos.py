@@ -0,0 +1,211 @@
+"""
+Cache de fragmentos HTML já renderizados (cartões de grupo e tabelas de pedidos)
+
+As chaves sempre carregam uma versão dos dados, então nunca é preciso apagar nada:
+quando um grupo muda, sua versão muda e o cartão antigo simplesmente deixa de ser
+pedido (e sai do LRU com o tempo).
+
+    cartão de grupo    grupo:<id>:<versão do grupo>
+    tabela de pedidos  tabela:<nome>:<página/filtro>:<versão dos dados>
+
+A versão de cada grupo fica na tabela versao_grupos, mantida por triggers: muda
+quando um pedido entra, sai ou é alterado no grupo, ou quando o próprio grupo
+(nome, rastreio, enviado) é alterado. A versão geral vem de cache_http.
+
+Camadas:
+    memória  LRU limitado por processo (FRAGMENTOS_MAX_ITENS, padrão 2000)
+    disco    opcional, compartilhado pelos workers do gunicorn: defina FRAGMENTOS_DIR
+
+FRAGMENTOS_CACHE=0 desliga o cache (tudo é renderizado a cada requisição).
+"""
+
+import glob
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from flask import current_app, g, render_template, request
+from markupsafe import Markup
+
+import cache_http
+
+ATIVO = os.environ.get('FRAGMENTOS_CACHE', '1') != '0'
+MAX_ITENS = int(os.environ.get('FRAGMENTOS_MAX_ITENS', '2000'))
+FRAGMENTOS_DIR = os.environ.get('FRAGMENTOS_DIR', '')
+MAX_ARQUIVOS = int(os.environ.get('FRAGMENTOS_MAX_ARQUIVOS', '20000'))
+
+# A limpeza do disco roda a cada tantas gravações, não a cada uma
+INTERVALO_LIMPEZA = 500
+
+contadores = {'acertos_memoria': 0, 'acertos_disco': 0, 'falhas': 0}
+
+
+def criar_versionamento_grupos(cursor):
+    """Cria a tabela de versões por grupo e seus triggers (chamado pelo init_db)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS versao_grupos (
+            grupo_id INTEGER PRIMARY KEY,
+            versao INTEGER NOT NULL
+        )
+    ''')
+
+    def incrementar(expressao):
+        # Upsert: cria a linha do grupo na primeira alteração
+        return f'''
+            INSERT INTO versao_grupos (grupo_id, versao)
+            SELECT {expressao}, 1 WHERE {expressao} IS NOT NULL
+            ON CONFLICT (grupo_id) DO UPDATE SET versao = versao + 1;
+        '''
+
+    gatilhos = {
+        'versao_grupos_pedido_insert': ('AFTER INSERT ON pedidos', incrementar('NEW.grupo_id')),
+        'versao_grupos_pedido_update': ('AFTER UPDATE ON pedidos',
+                                        incrementar('OLD.grupo_id') + incrementar('NEW.grupo_id')),
+        'versao_grupos_pedido_delete': ('AFTER DELETE ON pedidos', incrementar('OLD.grupo_id')),
+        'versao_grupos_grupo_update': ('AFTER UPDATE ON grupos', incrementar('NEW.id')),
+        # A linha é mantida após o DELETE para que um id reaproveitado não herde versões antigas
+        'versao_grupos_grupo_delete': ('AFTER DELETE ON grupos', incrementar('OLD.id')),
+    }
+    for nome, (evento, corpo) in gatilhos.items():
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {nome} {evento} BEGIN {corpo} END')
+
+
+class CacheLRU:
+    """Dicionário limitado que descarta o item usado há mais tempo"""
+
+    def __init__(self, maximo=MAX_ITENS):
+        self.maximo = maximo
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            valor = self._itens.get(chave)
+            if valor is not None:
+                self._itens.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.maximo:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+
+class CacheDisco:
+    """Um arquivo por fragmento; a gravação é atômica, então workers podem ler ao mesmo tempo"""
+
+    def __init__(self, pasta, maximo=MAX_ARQUIVOS):
+        self.pasta = pasta
+        self.maximo = maximo
+        self._gravacoes = 0
+
+    def _caminho(self, chave):
+        return os.path.join(self.pasta, hashlib.sha1(chave.encode('utf-8')).hexdigest() + '.html')
+
+    def obter(self, chave):
+        try:
+            with open(self._caminho(chave), encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def guardar(self, chave, valor):
+        caminho = self._caminho(chave)
+        temporario = f'{caminho}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(self.pasta, exist_ok=True)
+            with open(temporario, 'w', encoding='utf-8') as f:
+                f.write(valor)
+            os.replace(temporario, caminho)
+        except OSError:
+            # O disco é só uma otimização; falhar aqui não pode derrubar a página
+            return
+        self._gravacoes += 1
+        if self._gravacoes % INTERVALO_LIMPEZA == 0:
+            self.limpar_antigos()
+
+    def limpar_antigos(self):
+        """Remove os arquivos menos recentes além do limite"""
+        arquivos = []
+        for caminho in glob.glob(os.path.join(self.pasta, '*.html')):
+            try:
+                arquivos.append((os.path.getmtime(caminho), caminho))
+            except OSError:
+                continue
+        arquivos.sort()
+        for _, caminho in arquivos[:-self.maximo]:
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+
+
+memoria = CacheLRU()
+disco = CacheDisco(FRAGMENTOS_DIR) if FRAGMENTOS_DIR else None
+
+
+def _chave_completa(chave):
+    # A versão dos templates entra na chave: um deploy novo não reaproveita HTML antigo.
+    # A loja também: ids e versões se repetem entre os bancos das lojas, e os links do
+    # fragmento levam o prefixo /loja/<nome> quando ela vem no caminho (ver lojas.py)
+    return (f"{current_app.extensions['cache_fragmentos']['versao_templates']}|"
+            f"{g.get('loja') or ''}|{request.script_root}|{chave}")
+
+
+def obter(chave):
+    """Retorna o fragmento guardado (Markup) ou None"""
+    if not ATIVO:
+        return None
+    chave = _chave_completa(chave)
+    valor = memoria.obter(chave)
+    if valor is not None:
+        contadores['acertos_memoria'] += 1
+        return valor
+    if disco is not None:
+        texto = disco.obter(chave)
+        if texto is not None:
+            contadores['acertos_disco'] += 1
+            valor = Markup(texto)
+            memoria.guardar(chave, valor)
+            return valor
+    contadores['falhas'] += 1
+    return None
+
+
+def guardar(chave, html):
+    """Guarda o fragmento nas duas camadas e o retorna como Markup"""
+    valor = Markup(html)
+    if ATIVO:
+        chave = _chave_completa(chave)
+        memoria.guardar(chave, valor)
+        if disco is not None:
+            disco.guardar(chave, str(valor))
+    return valor
+
+
+def renderizar(chave, template, **contexto):
+    """Renderiza o template do fragmento e o guarda sob a chave"""
+    return guardar(chave, render_template(template, **contexto))
+
+
+def chave_grupo(grupo_id, versao):
+    return f'grupo:{grupo_id}:{versao or 0}'
+
+
+def chave_tabela(nome, filtro, versao):
+    return f'tabela:{nome}:{filtro}:{versao}'
+
+
+def init_app(app):
+    """Registra a versão dos templates usada nas chaves"""
+    app.extensions['cache_fragmentos'] = {'versao_templates': cache_http.versao_templates(app)}
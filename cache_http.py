@@ -0,0 +1,100 @@
+"""
+Cache HTTP com ETags derivadas de um contador de versão do banco
+
+Triggers nas tabelas de dados incrementam `versao_dados.versao` a cada INSERT,
+UPDATE ou DELETE. As páginas de leitura decoradas com @com_etag calculam a ETag a
+partir desse número (mais a URL e a versão dos templates): se o navegador já tem a
+página da mesma versão, a resposta é um 304 sem corpo, ao custo de uma consulta
+de uma linha — sem os joins nem a renderização do Jinja.
+"""
+
+import hashlib
+import os
+import sqlite3
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+
+TABELAS_VERSIONADAS = ('pedidos', 'grupos', 'pedidos_completos')
+
+
+def criar_versionamento(cursor, tabelas=TABELAS_VERSIONADAS):
+    """Cria a tabela do contador e os triggers (chamado pelo init_db)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS versao_dados (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            versao INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO versao_dados (id, versao) VALUES (1, 0)')
+    for tabela in tabelas:
+        for operacao in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS versao_{tabela}_{operacao.lower()}
+                AFTER {operacao} ON {tabela}
+                BEGIN
+                    UPDATE versao_dados SET versao = versao + 1 WHERE id = 1;
+                END
+            ''')
+
+
+def versao_dados(conn):
+    """Retorna o número de alterações já feitas nos dados"""
+    linha = conn.execute('SELECT versao FROM versao_dados WHERE id = 1').fetchone()
+    return linha[0] if linha else 0
+
+
+def versao_templates(app):
+    """Identifica a versão dos templates, para que um deploy invalide as ETags antigas"""
+    versao = os.environ.get('APP_VERSAO')
+    if versao:
+        return versao
+    pasta = os.path.join(app.root_path, app.template_folder or 'templates')
+    try:
+        return str(max(os.path.getmtime(os.path.join(pasta, f)) for f in os.listdir(pasta)))
+    except (OSError, ValueError):
+        return ''
+
+
+def com_etag(view):
+    """Responde 304 quando a página pedida já está atualizada no navegador
+
+    Páginas com mensagens flash pendentes são sempre renderizadas, senão a mensagem
+    ficaria presa na sessão sem ser exibida.
+    """
+    @wraps(view)
+    def envolvida(*args, **kwargs):
+        config = current_app.extensions.get('cache_http')
+        if config is None or request.method != 'GET' or session.get('_flashes'):
+            return view(*args, **kwargs)
+
+        conn = config['obter_conexao']()
+        try:
+            versao = versao_dados(conn)
+        except sqlite3.OperationalError:
+            # Banco ainda sem a tabela de versão (init_db não rodou): sem cache
+            return view(*args, **kwargs)
+        finally:
+            conn.close()
+        # Loja e prefixo entram na chave: cada loja tem o seu banco e o seu contador (ver lojas.py)
+        chave = f"{config['versao_templates']}|{g.get('loja') or ''}|{request.script_root}{request.full_path}".encode('utf-8')
+        etag = f"v{versao}-{hashlib.sha1(chave).hexdigest()[:16]}"
+
+        if etag in request.if_none_match:
+            resposta = current_app.response_class(status=304)
+        else:
+            resposta = make_response(view(*args, **kwargs))
+            if resposta.status_code != 200:
+                return resposta
+        resposta.set_etag(etag)
+        resposta.headers['Cache-Control'] = 'no-cache'
+        return resposta
+    return envolvida
+
+
+def init_app(app, obter_conexao):
+    """Configura a conexão usada para ler o contador de versão"""
+    app.extensions['cache_http'] = {
+        'obter_conexao': obter_conexao,
+        'versao_templates': versao_templates(app),
+    }
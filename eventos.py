@@ -0,0 +1,193 @@
+"""
+Atualizações ao vivo do dashboard via Server-Sent Events
+
+Triggers em pedidos e grupos registram cada alteração na tabela log_alteracoes.
+O endpoint /eventos lê esse log a partir do último id visto pelo navegador e envia
+os cartões de grupo e os pedidos expresso que mudaram, já renderizados; o JavaScript
+do dashboard só troca os elementos correspondentes. Como o log está no banco, uma
+alteração feita por qualquer worker do gunicorn chega a todos os dashboards abertos.
+
+Cada conexão SSE ocupa uma thread enquanto está aberta: use workers gthread (ou
+mais workers) e deixe DURACAO_MAXIMA curta — o navegador reconecta sozinho,
+continuando do último evento recebido (cabeçalho Last-Event-ID). No modo ASGI
+(assincrono.py) a espera entre leituras do log não ocupa thread: só cada leitura
+passa pelo pool.
+
+EVENTOS_SSE=0 desliga o endpoint (o dashboard volta a funcionar só com recarga).
+"""
+
+import json
+import os
+import time
+
+from flask import Response, request, stream_with_context
+
+from assincrono import Pausa, em_asgi
+
+ATIVO = os.environ.get('EVENTOS_SSE', '1') != '0'
+
+# Intervalo entre leituras do log e tempo máximo de uma conexão
+INTERVALO = float(os.environ.get('EVENTOS_INTERVALO', '1.0'))
+DURACAO_MAXIMA = float(os.environ.get('EVENTOS_DURACAO_MAXIMA', '300'))
+INTERVALO_PING = 15.0
+
+# O log guarda só as alterações mais recentes (poda feita pelo próprio trigger)
+MAX_LOG = 10000
+# Acima disso é mais barato o navegador recarregar a página inteira
+MAX_ITENS_DELTA = 200
+
+
+def criar_log_alteracoes(cursor):
+    """Cria a tabela do log e os triggers que a alimentam (chamado pelo init_db)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS log_alteracoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            entidade TEXT NOT NULL,
+            operacao TEXT NOT NULL,
+            chave TEXT NOT NULL,
+            chave_anterior TEXT,
+            grupo_id INTEGER,
+            grupo_anterior INTEGER,
+            momento TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    registros = {
+        'pedidos': {
+            'INSERT': "'pedido', 'insert', NEW.id_pedido, NULL, NEW.grupo_id, NULL",
+            'UPDATE': "'pedido', 'update', NEW.id_pedido, OLD.id_pedido, NEW.grupo_id, OLD.grupo_id",
+            'DELETE': "'pedido', 'delete', OLD.id_pedido, NULL, OLD.grupo_id, NULL",
+        },
+        'grupos': {
+            'INSERT': "'grupo', 'insert', NEW.id, NULL, NEW.id, NULL",
+            'UPDATE': "'grupo', 'update', NEW.id, NULL, NEW.id, NULL",
+            'DELETE': "'grupo', 'delete', OLD.id, NULL, OLD.id, NULL",
+        },
+    }
+    for tabela, operacoes in registros.items():
+        for operacao, valores in operacoes.items():
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS log_{tabela}_{operacao.lower()}
+                AFTER {operacao} ON {tabela}
+                BEGIN
+                    INSERT INTO log_alteracoes (entidade, operacao, chave, chave_anterior, grupo_id, grupo_anterior)
+                    VALUES ({valores});
+                END
+            ''')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS log_alteracoes_poda
+        AFTER INSERT ON log_alteracoes
+        WHEN NEW.id % 1000 = 0
+        BEGIN
+            DELETE FROM log_alteracoes WHERE id <= NEW.id - {MAX_LOG};
+        END
+    ''')
+
+
+def ultimo_evento(conn):
+    """Id da alteração mais recente (0 com o log vazio)"""
+    return conn.execute('SELECT COALESCE(MAX(id), 0) FROM log_alteracoes').fetchone()[0]
+
+
+def ler_alteracoes(conn, desde):
+    """Agrupa as alterações posteriores a `desde`
+
+    Retorna (último id lido, ids de grupos afetados, ids de pedidos afetados) ou None
+    quando `desde` é mais antigo que o log guardado (o navegador deve recarregar).
+    """
+    primeiro = conn.execute('SELECT MIN(id) FROM log_alteracoes').fetchone()[0]
+    if primeiro is not None and desde < primeiro - 1:
+        return None
+
+    ultimo = desde
+    grupos = set()
+    pedidos = set()
+    for linha in conn.execute('''
+        SELECT id, entidade, chave, chave_anterior, grupo_id, grupo_anterior
+        FROM log_alteracoes WHERE id > ? ORDER BY id
+    ''', (desde,)):
+        ultimo = linha['id']
+        for grupo_id in (linha['grupo_id'], linha['grupo_anterior']):
+            if grupo_id is not None:
+                grupos.add(grupo_id)
+        if linha['entidade'] == 'pedido':
+            pedidos.add(linha['chave'])
+            if linha['chave_anterior'] is not None:
+                pedidos.add(linha['chave_anterior'])
+    return ultimo, grupos, pedidos
+
+
+def formatar_evento(nome, dados, id_evento=None):
+    """Monta um evento no formato text/event-stream"""
+    linhas = []
+    if id_evento is not None:
+        linhas.append(f'id: {id_evento}')
+    linhas.append(f'event: {nome}')
+    linhas.append('data: ' + json.dumps(dados, ensure_ascii=False))
+    return '\n'.join(linhas) + '\n\n'
+
+
+def quer_json():
+    """Indica se o cliente pediu JSON (fetch do dashboard) em vez de HTML"""
+    return request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+
+
+def init_app(app, obter_conexao, montar_delta):
+    """Registra o endpoint /eventos
+
+    `montar_delta(grupos, pedidos)` recebe os ids alterados e devolve o
+    dicionário enviado ao navegador (fragmentos HTML e contadores).
+    """
+    if not ATIVO:
+        return
+
+    @app.route('/eventos')
+    def eventos():
+        """Stream SSE com as alterações de grupos e pedidos"""
+        desde = request.headers.get('Last-Event-ID') or request.args.get('desde')
+        try:
+            desde = int(desde)
+        except (TypeError, ValueError):
+            desde = None
+        assincrono = em_asgi(request.environ)
+
+        def ler(funcao, *args):
+            # Conexão por leitura: no modo ASGI cada pedaço do stream pode rodar
+            # numa thread diferente do pool
+            conn = obter_conexao()
+            try:
+                return funcao(conn, *args)
+            finally:
+                conn.close()
+
+        def gerar():
+            posicao = desde if desde is not None else ler(ultimo_evento)
+            yield 'retry: 3000\n\n'
+            inicio = ultimo_envio = time.monotonic()
+            while time.monotonic() - inicio < DURACAO_MAXIMA:
+                alteracoes = ler(ler_alteracoes, posicao)
+                if alteracoes is None:
+                    yield formatar_evento('recarregar', {}, ler(ultimo_evento))
+                    return
+                ultimo, grupos, pedidos = alteracoes
+                if ultimo != posicao:
+                    posicao = ultimo
+                    if len(grupos) + len(pedidos) > MAX_ITENS_DELTA:
+                        yield formatar_evento('recarregar', {}, posicao)
+                    else:
+                        yield formatar_evento('delta', montar_delta(grupos, pedidos), posicao)
+                    ultimo_envio = time.monotonic()
+                elif time.monotonic() - ultimo_envio > INTERVALO_PING:
+                    # Comentário SSE: mantém proxies e o Render sem derrubar a conexão
+                    yield ': ping\n\n'
+                    ultimo_envio = time.monotonic()
+                if assincrono:
+                    yield Pausa(INTERVALO)
+                else:
+                    time.sleep(INTERVALO)
+
+        resposta = Response(stream_with_context(gerar()), mimetype='text/event-stream')
+        resposta.headers['Cache-Control'] = 'no-cache'
+        resposta.headers['X-Accel-Buffering'] = 'no'
+        return resposta
@@ -0,0 +1,142 @@
+"""
+Gerenciador de pedidos: fábrica da aplicação Flask
+
+create_app(config) monta o app sobre a camada de dados (repositorio.py) e registra
+os módulos. Dashboard, pedidos e grupos sempre sobem; os demais entram conforme
+MODULOS (padrão: todos):
+
+    importar       importação de CSV e pedidos importados
+    exportar       /exportar_csv
+    administracao  limpeza dos dados, arquivamento, manutenção e backup
+    eventos        dashboard ao vivo (/eventos)
+    api            API JSON /api/v1
+    sincronizacao  pedidos direto da API da Nuvemshop
+    webhooks       /webhooks/nuvemshop
+    rastreamento   acompanhamento de entrega dos grupos enviados
+
+Módulo fora da lista não registra rotas nem sobe threads; os módulos de rotas, a
+API e os webhooks nem chegam a ser importados. O pipeline de importação
+(importacao.py) é sempre carregado pela camada de dados, mas o pandas só é
+importado se estiver instalado:
+
+    MODULOS=importar,exportar gunicorn app:app
+
+Configuração (chaves do `config` ou variáveis de ambiente): DATABASE (arquivo
+SQLite, padrão pedidos.db), DATABASE_URL (PostgreSQL), MODULOS, SECRET_KEY e
+MAX_CONTENT_LENGTH (tamanho máximo do corpo; UPLOAD_MAXIMO_MB, padrão 50).
+"""
+
+import importlib
+import logging
+import os
+from functools import partial
+
+from flask import Flask
+
+import admin
+import cache_fragmentos
+import cache_http
+import eventos
+import instrumentacao
+import lojas
+import monitoramento
+import perfilamento
+import prazos
+import repositorio
+from gerenciador import banco, grupos, painel, pedidos
+from logs import configurar_logging
+
+logger = logging.getLogger('pedidos.app')
+
+# Templates e arquivos estáticos ficam na raiz do projeto
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULOS = ('importar', 'exportar', 'administracao', 'eventos', 'api', 'sincronizacao', 'webhooks',
+           'rastreamento')
+# Integrações que leem o arquivo SQLite direto (log de alterações, fila, tabelas próprias)
+SO_SQLITE = ('eventos', 'api', 'sincronizacao', 'webhooks', 'rastreamento')
+
+
+def _modulos_do_ambiente():
+    valor = os.environ.get('MODULOS')
+    if valor is None:
+        return MODULOS
+    return tuple(m.strip() for m in valor.split(',') if m.strip())
+
+
+def create_app(config=None):
+    """Cria o app; `config` sobrepõe as configurações padrão e as do ambiente"""
+    configurar_logging()
+
+    app = Flask(__name__, root_path=RAIZ)
+    app.config.from_mapping(
+        SECRET_KEY=os.environ.get('SECRET_KEY', admin.CHAVE_PADRAO),  # Necessário para flash messages
+        DATABASE=os.environ.get('DATABASE', 'pedidos.db'),
+        DATABASE_URL=os.environ.get('DATABASE_URL'),
+        MODULOS=_modulos_do_ambiente(),
+        MAX_CONTENT_LENGTH=int(os.environ.get('UPLOAD_MAXIMO_MB', '50')) * 1024 * 1024,
+    )
+    app.config.update(config or {})
+
+    modulos = set(app.config['MODULOS'])
+    desconhecidos = modulos.difference(MODULOS)
+    if desconhecidos:
+        raise ValueError(f'Módulos desconhecidos em MODULOS: {", ".join(sorted(desconhecidos))}')
+
+    admin.init_app(app)
+    instrumentacao.init_app(app)
+    perfilamento.init_app(app)
+    # Uploads têm prazo maior. O stream do /eventos e os trabalhos do admin que rodam
+    # na própria requisição (sincronização com a Nuvemshop, VACUUM, arquivamento) não
+    # têm prazo: interrompidos no meio, recomeçariam do zero a cada tentativa
+    prazos.init_app(app, {'importar.importar_csv': prazos.PRAZO_UPLOAD,
+                          'importar.confirmar_importacao': prazos.PRAZO_UPLOAD,
+                          'grupos.rastreio_em_lote': prazos.PRAZO_UPLOAD,
+                          'eventos': None,
+                          'sincronizacao': None,
+                          'manutencao_admin': None,
+                          'arquivamento_admin': None})
+
+    caminho = app.config['DATABASE']
+
+    def criar_esquema(caminho_banco=None):
+        banco.init_db(caminho_banco or caminho)
+
+    # Backend de armazenamento: SQLite (padrão) ou PostgreSQL com DATABASE_URL (ver repositorio.py)
+    repo = repositorio.criar(app.config['DATABASE_URL'], banco.conexoes(caminho), criar_esquema)
+    repo.criar_esquema()
+    app.extensions['repo'] = repo
+
+    # Um banco SQLite por loja com LOJAS=... (ver lojas.py)
+    if repo.sqlite:
+        lojas.init_app(app, banco.init_db)
+    elif lojas.ATIVO:
+        logger.warning('LOJAS é ignorado com DATABASE_URL: um banco por loja só existe no SQLite')
+
+    if not repo.sqlite and modulos.intersection(SO_SQLITE):
+        logger.info('Com PostgreSQL ficam desligados: %s', ', '.join(sorted(modulos.intersection(SO_SQLITE))))
+        modulos.difference_update(SO_SQLITE)
+
+    monitoramento.init_app(app, repo.conectar, lambda: caminho if repo.sqlite else None)
+    cache_http.init_app(app, repo.conectar)
+    cache_fragmentos.init_app(app)
+
+    ao_vivo = 'eventos' in modulos and eventos.ATIVO
+    painel.init_app(app, repo, ao_vivo)
+    pedidos.init_app(app, repo)
+    grupos.init_app(app, repo)
+
+    for nome in ('importar', 'exportar', 'administracao'):
+        if nome in modulos:
+            importlib.import_module(f'gerenciador.{nome}').init_app(app, repo)
+
+    if 'eventos' in modulos:
+        eventos.init_app(app, repo.conectar, partial(painel.montar_delta, repo))
+    for nome in ('api', 'sincronizacao', 'webhooks', 'rastreamento'):
+        if nome in modulos:
+            importlib.import_module(nome).init_app(app, repo.conectar)
+
+    app.config['MODULOS'] = tuple(sorted(modulos))
+    app.jinja_env.globals['modulos'] = modulos
+    app.jinja_env.globals['rastreamento_ativo'] = 'rastreamento' in modulos
+    return app
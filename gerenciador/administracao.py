@@ -0,0 +1,34 @@
+"""
+Administração: limpeza dos dados e as rotas /admin de arquivamento, manutenção e backup
+"""
+
+from flask import Blueprint, flash, redirect, url_for
+
+import arquivamento
+import backup
+import manutencao
+
+
+def init_app(app, repo):
+    """Registra /limpar_todos_dados e, no SQLite, arquivamento, manutenção e backup"""
+    rotas = Blueprint('administracao', __name__)
+
+    @rotas.route('/limpar_todos_dados')
+    def limpar_todos_dados():
+        """Limpar todos os dados do banco (pedidos e grupos)"""
+        try:
+            # No SQLite troca o conteúdo por um banco novo (contadores de id recomeçam do zero)
+            repo.limpar()
+            flash('Todos os dados foram excluídos com sucesso!', 'success')
+        except Exception as e:
+            flash(f'Erro ao limpar dados: {str(e)}', 'error')
+
+        return redirect(url_for('painel.index'))
+
+    app.register_blueprint(rotas)
+
+    # Dependem do arquivo SQLite (VACUUM, API de backup, tabelas de arquivo)
+    if repo.sqlite:
+        arquivamento.init_app(app, repo.conectar)
+        manutencao.init_app(app, repo.conectar)
+        backup.init_app(app, repo.conectar)
@@ -0,0 +1,147 @@
+"""
+Esquema do banco SQLite e conexões
+
+init_db cria (ou completa) as tabelas num arquivo; conexoes(caminho) devolve a
+função de conexão usada pelo repositório, que já considera a loja da requisição
+(ver lojas.py).
+"""
+
+import logging
+import sqlite3
+
+import arquivamento
+import cache_fragmentos
+import cache_http
+import eventos
+import instrumentacao
+import lojas
+import previa
+import rastreamento
+import sincronizacao
+
+logger = logging.getLogger('pedidos.banco')
+
+
+def init_db(caminho):
+    """Inicializa o banco de dados com as tabelas necessárias"""
+    conn = sqlite3.connect(caminho)
+    cursor = conn.cursor()
+
+    # Só tem efeito em banco novo: espaço liberado pode ser devolvido sem VACUUM completo
+    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+
+    # WAL: leituras não esperam gravações (várias threads por worker no gunicorn gthread)
+    if cursor.execute('PRAGMA journal_mode').fetchone()[0] != 'wal':
+        cursor.execute('PRAGMA journal_mode = WAL')
+
+    # Tabela de pedidos
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pedidos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_pedido TEXT UNIQUE NOT NULL,
+            nome_cliente TEXT NOT NULL,
+            produto TEXT NOT NULL,
+            tamanho TEXT NOT NULL,
+            tipo_frete TEXT NOT NULL,
+            grupo_id INTEGER,
+            data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (grupo_id) REFERENCES grupos (id)
+        )
+    ''')
+
+    # Tabela de grupos
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS grupos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            codigo_rastreio TEXT,
+            enviado BOOLEAN DEFAULT 0,
+            data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Tabela para dados completos dos pedidos importados
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pedidos_completos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            numero_pedido TEXT UNIQUE NOT NULL,
+            email TEXT,
+            data_pedido TEXT,
+            status_pedido TEXT,
+            status_pagamento TEXT,
+            status_envio TEXT,
+            moeda TEXT,
+            subtotal REAL,
+            desconto REAL,
+            valor_frete REAL,
+            total REAL,
+            nome_comprador TEXT,
+            cpf_cnpj TEXT,
+            telefone TEXT,
+            nome_entrega TEXT,
+            telefone_entrega TEXT,
+            endereco TEXT,
+            numero TEXT,
+            complemento TEXT,
+            bairro TEXT,
+            cidade TEXT,
+            codigo_postal TEXT,
+            estado TEXT,
+            pais TEXT,
+            forma_entrega TEXT,
+            forma_pagamento TEXT,
+            cupom_desconto TEXT,
+            anotacoes_comprador TEXT,
+            anotacoes_vendedor TEXT,
+            data_pagamento TEXT,
+            data_envio TEXT,
+            nome_produto TEXT,
+            valor_produto REAL,
+            data_importacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Adicionar coluna codigo_rastreio se não existir
+    try:
+        cursor.execute('ALTER TABLE grupos ADD COLUMN codigo_rastreio TEXT')
+        logger.info("Coluna codigo_rastreio adicionada à tabela grupos")
+    except sqlite3.OperationalError:
+        logger.debug("Coluna codigo_rastreio já existe na tabela grupos")
+
+    # Data de envio, tabelas de arquivo e views de busca sobre ativo + arquivo
+    arquivamento.criar_tabelas(cursor)
+
+    # Contador de versão dos dados (ETags das páginas de leitura)
+    cache_http.criar_versionamento(cursor)
+
+    # Versão por grupo (cache dos cartões do dashboard)
+    cache_fragmentos.criar_versionamento_grupos(cursor)
+
+    # Log de alterações lido pelo /eventos (dashboard ao vivo)
+    eventos.criar_log_alteracoes(cursor)
+
+    # Marca d'água da sincronização com a API da Nuvemshop
+    sincronizacao.criar_estado(cursor)
+
+    # Situação e histórico de entrega dos grupos enviados
+    rastreamento.criar_tabelas(cursor)
+
+    # Itens preparados pela prévia da importação
+    previa.criar_tabelas(cursor)
+
+    conn.commit()
+    conn.close()
+
+
+def conexoes(caminho):
+    """Função que abre uma conexão com o banco `caminho` (ou com o da loja da requisição)"""
+
+    def get_db_connection():
+        loja = lojas.atual()
+        if loja:
+            return lojas.conectar(loja)
+        conn = instrumentacao.conectar(caminho)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    return get_db_connection
@@ -0,0 +1,69 @@
+"""
+Exportação dos pedidos em CSV
+"""
+
+import csv
+import io
+from datetime import datetime
+
+from flask import Blueprint, send_file
+
+
+def init_app(app, repo):
+    """Registra /exportar_csv"""
+    rotas = Blueprint('exportar', __name__)
+
+    @rotas.route('/exportar_csv')
+    def exportar_csv():
+        """Exportar dados para CSV"""
+        # Buscar todos os dados
+        pedidos = repo.pedidos_para_exportar()
+
+        # Criar arquivo CSV
+        output = io.StringIO()
+        writer = csv.writer(output)
+
+        # Cabeçalho
+        writer.writerow(['TIPO', 'ID_PEDIDO', 'CLIENTE', 'PRODUTO', 'TAMANHO', 'FRETE', 'GRUPO', 'ENVIADO', 'DATA'])
+
+        # Pedidos em grupos
+        for pedido in pedidos:
+            if pedido['grupo_id']:
+                enviado = "SIM" if pedido['grupo_enviado'] else "NÃO"
+                writer.writerow([
+                    'GRUPO',
+                    pedido['id_pedido'],
+                    pedido['nome_cliente'],
+                    pedido['produto'],
+                    pedido['tamanho'],
+                    pedido['tipo_frete'],
+                    pedido['nome_grupo'] or '',
+                    enviado,
+                    pedido['data_criacao']
+                ])
+
+        # Pedidos expresso
+        for pedido in pedidos:
+            if pedido['tipo_frete'] == 'EXPRESSO':
+                writer.writerow([
+                    'EXPRESSO',
+                    pedido['id_pedido'],
+                    pedido['nome_cliente'],
+                    pedido['produto'],
+                    pedido['tamanho'],
+                    pedido['tipo_frete'],
+                    '',
+                    'N/A',
+                    pedido['data_criacao']
+                ])
+
+        output.seek(0)
+
+        return send_file(
+            io.BytesIO(output.getvalue().encode('utf-8')),
+            mimetype='text/csv',
+            as_attachment=True,
+            download_name=f'pedidos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+        )
+
+    app.register_blueprint(rotas)
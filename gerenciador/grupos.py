@@ -0,0 +1,189 @@
+"""
+Grupos de envio: criação, pedidos do grupo, envio e códigos de rastreio
+"""
+
+import logging
+
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+
+import rastreio_lote
+import repositorio
+from gerenciador.painel import erro_acao, responder_acao
+
+logger = logging.getLogger('pedidos.grupos')
+
+
+def init_app(app, repo):
+    """Registra as rotas de grupos"""
+    rotas = Blueprint('grupos', __name__)
+
+    @rotas.route('/grupo/novo', methods=['GET', 'POST'])
+    def novo_grupo():
+        """Criar novo grupo"""
+        if request.method == 'POST':
+            repo.criar_grupo(request.form['nome'])
+
+            return redirect(url_for('painel.index'))
+
+        return render_template('novo_grupo.html')
+
+    @rotas.route('/grupo/<int:grupo_id>/adicionar_pedido', methods=['GET', 'POST'])
+    def adicionar_pedido_grupo(grupo_id):
+        """Adicionar pedido a um grupo"""
+        if request.method == 'POST':
+            pedido_id = request.form['pedido_id']
+
+            # Verificar se o grupo tem menos de 5 pedidos
+            if repo.contar_pedidos_grupo(grupo_id) >= repositorio.LIMITE_GRUPO:
+                return erro_acao("Grupo já tem 5 pedidos!", 400)
+
+            # Verificar se o pedido existe e é do tipo padrão
+            pedido = repo.obter_pedido(pedido_id)
+            if not pedido:
+                return erro_acao("Pedido não encontrado!", 404)
+
+            if pedido['tipo_frete'] != 'FRETE PADRÃO':
+                return erro_acao("Apenas pedidos com FRETE PADRÃO podem ser adicionados a grupos!", 400)
+
+            # Adicionar pedido ao grupo
+            repo.atribuir_grupo(pedido_id, grupo_id)
+
+            return responder_acao(repo, grupos=[grupo_id, pedido['grupo_id']] if pedido['grupo_id'] else [grupo_id])
+
+        # Buscar pedidos disponíveis (sem grupo e com frete padrão)
+        pedidos_disponiveis = repo.pedidos_padrao_livres()
+        grupo = repo.obter_grupo(grupo_id)
+
+        return render_template('adicionar_pedido_grupo.html',
+                               grupo=grupo,
+                               pedidos_disponiveis=pedidos_disponiveis)
+
+    @rotas.route('/grupo/<int:grupo_id>/remover_pedido/<pedido_id>')
+    def remover_pedido_grupo(grupo_id, pedido_id):
+        """Remover pedido de um grupo"""
+        repo.atribuir_grupo(pedido_id, None)
+        return responder_acao(repo, grupos=[grupo_id])
+
+    @rotas.route('/grupo/<int:grupo_id>/marcar_enviado', methods=['GET', 'POST'])
+    def marcar_grupo_enviado(grupo_id):
+        """Marcar grupo como enviado com código de rastreio"""
+        try:
+            # Verificar se o grupo existe
+            grupo = repo.obter_grupo(grupo_id)
+            if not grupo:
+                return responder_acao(repo, 'Grupo não encontrado', 'error', status=404)
+
+            if request.method == 'POST':
+                codigo_rastreio = request.form.get('codigo_rastreio', '').strip()
+
+                try:
+                    # Marcar como enviado e salvar código de rastreio
+                    repo.marcar_enviado(grupo_id, codigo_rastreio)
+                    mensagem, categoria = f'Grupo "{grupo["nome"]}" marcado como enviado! Código de rastreio: {codigo_rastreio}', 'success'
+                except Exception as e:
+                    mensagem, categoria = f'Erro ao marcar grupo como enviado: {str(e)}', 'error'
+
+                return responder_acao(repo, mensagem, categoria, grupos=[grupo_id])
+
+            return render_template('marcar_enviado_rastreio.html', grupo=grupo)
+        except Exception as e:
+            flash(f'Erro interno: {str(e)}', 'error')
+            return redirect(url_for('painel.index'))
+
+    @rotas.route('/grupo/<int:grupo_id>/marcar_nao_enviado')
+    def marcar_grupo_nao_enviado(grupo_id):
+        """Marcar grupo como não enviado"""
+        # Verificar se o grupo existe
+        grupo = repo.obter_grupo(grupo_id)
+        if not grupo:
+            flash('Grupo não encontrado', 'error')
+            return redirect(url_for('painel.index'))
+
+        try:
+            # Marcar como não enviado e limpar código de rastreio
+            repo.marcar_pendente(grupo_id)
+            flash(f'Grupo "{grupo["nome"]}" marcado como pendente!', 'success')
+        except Exception as e:
+            flash(f'Erro ao marcar grupo como pendente: {str(e)}', 'error')
+
+        return redirect(url_for('painel.index'))
+
+    @rotas.route('/grupos/rastreio_lote', methods=['GET', 'POST'])
+    def rastreio_em_lote():
+        """Cadastrar os códigos de rastreio de vários grupos de uma vez"""
+        texto = ''
+        parcial = False
+        resultados = None
+
+        if request.method == 'POST':
+            texto = request.form.get('texto', '')
+            parcial = request.form.get('parcial') == '1'
+            arquivo = request.files.get('arquivo')
+            if arquivo and arquivo.filename:
+                texto = rastreio_lote.decodificar(arquivo.read())
+
+            try:
+                registros = rastreio_lote.ler_linhas(texto)
+            except rastreio_lote.ErroRastreioLote as e:
+                flash(str(e), 'error')
+                return render_template('rastreio_lote.html', texto=texto, parcial=parcial, resultados=None)
+
+            try:
+                with repo.transacao(exclusiva=True) as conn:
+                    resultados, atualizados = rastreio_lote.aplicar(conn, registros, parcial)
+            except Exception as e:
+                logger.exception('Erro ao gravar rastreios em lote')
+                flash(f'Erro ao gravar códigos de rastreio: {str(e)}', 'error')
+                return render_template('rastreio_lote.html', texto=texto, parcial=parcial, resultados=None)
+
+            erros = sum(1 for r in resultados if r['status'] == 'erro')
+            if atualizados:
+                flash(f'{atualizados} grupo(s) marcado(s) como enviado(s).' + (f' {erros} linha(s) com erro.' if erros else ''), 'success')
+            elif erros:
+                flash(f'{erros} linha(s) com erro. Nada foi gravado.', 'error')
+            else:
+                flash('Nenhum grupo para atualizar.', 'warning')
+
+        return render_template('rastreio_lote.html', texto=texto, parcial=parcial, resultados=resultados)
+
+    @rotas.route('/grupo/<int:grupo_id>/excluir')
+    def excluir_grupo(grupo_id):
+        """Excluir um grupo e todos os seus pedidos"""
+        # Verificar se o grupo existe
+        grupo = repo.obter_grupo(grupo_id)
+        if not grupo:
+            flash('Grupo não encontrado', 'error')
+            return redirect(url_for('painel.index'))
+
+        try:
+            # Os pedidos são mantidos, apenas desassociados
+            repo.excluir_grupo(grupo_id)
+            flash(f'Grupo "{grupo["nome"]}" excluído com sucesso! Os pedidos foram mantidos.', 'success')
+        except Exception as e:
+            flash(f'Erro ao excluir grupo: {str(e)}', 'error')
+
+        return redirect(url_for('painel.index'))
+
+    @rotas.route('/grupo/<int:grupo_id>/editar_rastreio', methods=['GET', 'POST'])
+    def editar_rastreio_grupo(grupo_id):
+        """Editar código de rastreio de um grupo"""
+        # Verificar se o grupo existe
+        grupo = repo.obter_grupo(grupo_id)
+        if not grupo:
+            flash('Grupo não encontrado', 'error')
+            return redirect(url_for('painel.index'))
+
+        if request.method == 'POST':
+            codigo_rastreio = request.form.get('codigo_rastreio', '').strip()
+
+            try:
+                repo.atualizar_rastreio(grupo_id, codigo_rastreio)
+                flash(f'Código de rastreio do grupo "{grupo["nome"]}" atualizado com sucesso!', 'success')
+            except Exception as e:
+                flash(f'Erro ao atualizar código de rastreio: {str(e)}', 'error')
+
+            return redirect(url_for('painel.index'))
+
+        return render_template('editar_rastreio_grupo.html', grupo=grupo)
+
+    app.register_blueprint(rotas)
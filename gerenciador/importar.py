@@ -0,0 +1,154 @@
+"""
+Importação do CSV da Nuvemshop e consulta dos pedidos importados
+"""
+
+import contextlib
+import logging
+
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
+from werkzeug.exceptions import RequestEntityTooLarge
+
+import cache_http
+import importacao
+import monitoramento
+import perfilamento
+from gerenciador.painel import agendar_manutencao
+
+logger = logging.getLogger('pedidos.importar')
+
+EXTENSOES = ('.csv', '.csv.gz', '.gz', '.zip', '.xlsx')
+
+
+def _limite_mb():
+    limite = current_app.config.get('MAX_CONTENT_LENGTH')
+    return limite // (1024 * 1024) if limite else None
+
+
+def _perfilado(nome, **detalhes):
+    """Perfil da importação quando PERFILAR_IMPORTACOES=1 (ver perfilamento.py)"""
+    if perfilamento.IMPORTACOES:
+        return perfilamento.perfilar(nome, detalhes=detalhes)
+    return contextlib.nullcontext()
+
+
+def init_app(app, repo):
+    """Registra a importação de CSV e as páginas de pedidos importados"""
+    rotas = Blueprint('importar', __name__)
+
+    def _concluida(resumo):
+        monitoramento.registrar_importacao(resumo['linhas'], resumo['tempos']['total'], resumo['erros'])
+        agendar_manutencao(repo)
+
+        flash(f'Importação concluída! {resumo["importados"]} pedidos importados, {resumo["duplicados"]} duplicados, {resumo["erros"]} erros.', 'success')
+        return redirect(url_for('painel.index'))
+
+    @rotas.route('/importar_csv', methods=['GET', 'POST'])
+    def importar_csv():
+        """Importar pedidos de arquivo CSV"""
+        if request.method == 'POST':
+            if 'arquivo' not in request.files:
+                flash('Nenhum arquivo selecionado', 'error')
+                return redirect(request.url)
+
+            arquivo = request.files['arquivo']
+            if arquivo.filename == '':
+                flash('Nenhum arquivo selecionado', 'error')
+                return redirect(request.url)
+
+            if arquivo and arquivo.filename.lower().endswith(EXTENSOES):
+                try:
+                    # O Werkzeug já guardou o upload num arquivo temporário; a importação lê dele
+                    if request.form.get('acao') == 'previa':
+                        with _perfilado('importacao_previa', arquivo=arquivo.filename):
+                            token = repo.preparar_importacao(arquivo.stream, arquivo.filename)
+                        return redirect(url_for('importar.previa_importacao', token=token))
+                    with _perfilado('importacao', arquivo=arquivo.filename):
+                        resumo = repo.importar(arquivo.stream, arquivo.filename)
+                except importacao.ErroImportacao as e:
+                    flash(str(e), 'error')
+                    return redirect(request.url)
+                except Exception as e:
+                    logger.exception('Erro ao processar arquivo %s', arquivo.filename)
+                    flash(f'Erro ao processar arquivo: {str(e)}', 'error')
+                    return redirect(request.url)
+
+                return _concluida(resumo)
+            else:
+                flash('Arquivo deve ser CSV (ou CSV compactado em .gz ou .zip) ou planilha .xlsx', 'error')
+                return redirect(request.url)
+
+        return render_template('importar_csv.html', limite_mb=_limite_mb())
+
+    @rotas.route('/importar_csv/previa/<token>')
+    def previa_importacao(token):
+        """O que a importação faria: novos, duplicados, alterados e arquivados"""
+        dados = repo.previa_importacao(token)
+        if dados is None:
+            flash('Prévia não encontrada ou expirada. Envie o arquivo novamente.', 'error')
+            return redirect(url_for('importar.importar_csv'))
+
+        return render_template('importar_previa.html', previa=dados)
+
+    @rotas.route('/importar_csv/previa/<token>/confirmar', methods=['POST'])
+    def confirmar_importacao(token):
+        """Grava os itens da prévia, sem ler o arquivo de novo"""
+        try:
+            with _perfilado('importacao_confirmar', token=token):
+                resumo = repo.confirmar_importacao(token)
+        except Exception as e:
+            logger.exception('Erro ao confirmar a prévia %s', token)
+            flash(f'Erro ao importar: {str(e)}', 'error')
+            return redirect(url_for('importar.previa_importacao', token=token))
+
+        if resumo is None:
+            flash('Prévia não encontrada ou expirada. Envie o arquivo novamente.', 'error')
+            return redirect(url_for('importar.importar_csv'))
+        return _concluida(resumo)
+
+    @rotas.route('/importar_csv/previa/<token>/descartar', methods=['POST'])
+    def descartar_importacao(token):
+        repo.descartar_importacao(token)
+        flash('Prévia descartada', 'success')
+        return redirect(url_for('importar.importar_csv'))
+
+    @rotas.errorhandler(RequestEntityTooLarge)
+    def arquivo_grande(erro):
+        flash(f'Arquivo maior que o limite de {_limite_mb()} MB. Envie o CSV compactado (.gz ou .zip).', 'error')
+        return redirect(request.url)
+
+    @rotas.route('/pedidos_importados')
+    @cache_http.com_etag
+    def pedidos_importados():
+        """Visualizar pedidos importados do CSV"""
+        pedidos = repo.listar_importados()
+
+        return render_template('pedidos_importados.html', pedidos=pedidos)
+
+    @rotas.route('/pedido/<pedido_id>/detalhes')
+    def detalhes_pedido(pedido_id):
+        """Ver detalhes completos de um pedido importado"""
+        pedido = repo.obter_importado(pedido_id, arquivados=True)
+
+        if not pedido:
+            flash('Pedido não encontrado', 'error')
+            return redirect(url_for('importar.pedidos_importados'))
+
+        return render_template('detalhes_pedido.html', pedido=pedido)
+
+    @rotas.route('/pedidos_importados/<pedido_id>/excluir')
+    def excluir_pedido_importado(pedido_id):
+        """Excluir um pedido importado (tanto da tabela completa quanto da simplificada)"""
+        # Verificar se o pedido existe na tabela de pedidos completos
+        if not repo.obter_importado(pedido_id):
+            flash('Pedido não encontrado', 'error')
+            return redirect(url_for('importar.pedidos_importados'))
+
+        try:
+            repo.excluir_pedidos([pedido_id])
+            flash(f'Pedido {pedido_id} excluído com sucesso!', 'success')
+        except Exception as e:
+            flash(f'Erro ao excluir pedido: {str(e)}', 'error')
+
+        return redirect(url_for('importar.pedidos_importados'))
+
+    app.register_blueprint(rotas)
@@ -0,0 +1,110 @@
+"""
+Dashboard (/) e as respostas das ações que o atualizam
+
+As ações de pedidos e grupos respondem com responder_acao: o dashboard pede JSON e
+recebe só os fragmentos alterados (montar_delta); os formulários recebem flash +
+redirect. O /eventos usa o mesmo montar_delta para o dashboard ao vivo.
+"""
+
+from flask import Blueprint, flash, jsonify, redirect, render_template, url_for
+
+import cache_fragmentos
+import cache_http
+import eventos
+import manutencao
+
+
+def renderizar_cartoes(repo, grupos):
+    """Cartões HTML dos grupos; só os alterados desde a última renderização são remontados"""
+    cartoes = {}
+    pendentes = []
+    for grupo in grupos:
+        cartoes[grupo['id']] = cache_fragmentos.obter(cache_fragmentos.chave_grupo(grupo['id'], grupo['versao']))
+        if cartoes[grupo['id']] is None:
+            pendentes.append(grupo)
+
+    if pendentes:
+        # Pedidos de todos os grupos pendentes de uma vez
+        pedidos_por_grupo = repo.pedidos_dos_grupos([grupo['id'] for grupo in pendentes])
+        for grupo in pendentes:
+            cartoes[grupo['id']] = cache_fragmentos.renderizar(
+                cache_fragmentos.chave_grupo(grupo['id'], grupo['versao']), 'cartao_grupo.html',
+                grupo=grupo, pedidos=pedidos_por_grupo[grupo['id']])
+    return cartoes
+
+
+def montar_delta(repo, grupos=(), pedidos=()):
+    """Fragmentos do dashboard para os grupos e pedidos alterados (None = remover da tela)"""
+    cartoes = renderizar_cartoes(repo, repo.listar_grupos(grupos)) if grupos else {}
+
+    expresso = {}
+    if pedidos:
+        for pedido in repo.pedidos_expresso(pedidos):
+            expresso[pedido['id_pedido']] = render_template('item_expresso.html', pedido=pedido)
+
+    return {
+        'grupos': {grupo_id: cartoes.get(grupo_id) for grupo_id in grupos},
+        'expresso': {id_pedido: expresso.get(id_pedido) for id_pedido in pedidos},
+        'resumo': repo.resumo_dashboard(),
+    }
+
+
+def responder_acao(repo, mensagem=None, categoria='success', grupos=(), pedidos=(), destino=None, status=200):
+    """Resposta das ações do dashboard: JSON com os fragmentos alterados ou flash + redirect"""
+    if eventos.quer_json():
+        return jsonify(ok=categoria == 'success', mensagem=mensagem, **montar_delta(repo, grupos, pedidos)), status
+
+    if mensagem:
+        flash(mensagem, categoria)
+    return redirect(destino or url_for('painel.index'))
+
+
+def erro_acao(mensagem, status):
+    """Erro de uma ação: JSON para o dashboard, texto simples para os formulários"""
+    if eventos.quer_json():
+        return jsonify(ok=False, mensagem=mensagem), status
+    return f"Erro: {mensagem}", status
+
+
+def agendar_manutencao(repo):
+    """Vacuum/estatísticas depois de alterações grandes (só no SQLite)"""
+    if repo.sqlite:
+        manutencao.agendar(repo.conectar)
+
+
+def init_app(app, repo, ao_vivo):
+    """Registra o dashboard; `ao_vivo` indica se o /eventos está registrado"""
+    rotas = Blueprint('painel', __name__)
+
+    @rotas.route('/')
+    @cache_http.com_etag
+    def index():
+        """Página principal - Dashboard"""
+        # Ponto do log de alterações a partir do qual o /eventos continua. Lido antes
+        # das listas: uma alteração feita no meio da montagem da página chega de novo
+        # pelo /eventos em vez de se perder
+        ultimo_evento = None
+        if ao_vivo:
+            conn = repo.conectar()
+            try:
+                ultimo_evento = eventos.ultimo_evento(conn)
+            finally:
+                conn.close()
+
+        # Buscar grupos com pedidos
+        grupos = repo.listar_grupos()
+
+        # Buscar pedidos expresso
+        pedidos_expresso = repo.pedidos_expresso()
+
+        cartoes = renderizar_cartoes(repo, grupos)
+        resumo = repo.resumo_dashboard()
+
+        return render_template('index.html',
+                               grupos=grupos,
+                               pedidos_expresso=pedidos_expresso,
+                               cartoes=cartoes,
+                               resumo=resumo,
+                               ultimo_evento=ultimo_evento)
+
+    app.register_blueprint(rotas)
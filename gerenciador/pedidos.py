@@ -0,0 +1,158 @@
+"""
+Pedidos: cadastro, edição, exclusão, busca, listagens e ações em lote
+"""
+
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+
+import cache_fragmentos
+import cache_http
+import repositorio
+from gerenciador.painel import agendar_manutencao, responder_acao
+
+
+def init_app(app, repo):
+    """Registra as rotas de pedidos"""
+    rotas = Blueprint('pedidos', __name__)
+
+    @rotas.route('/pedido/novo', methods=['GET', 'POST'])
+    def novo_pedido():
+        """Criar novo pedido"""
+        if request.method == 'POST':
+            try:
+                repo.criar_pedido(request.form['id_pedido'], request.form['nome_cliente'], request.form['produto'],
+                                  request.form['tamanho'], request.form['tipo_frete'])
+            except repositorio.ErroDuplicado:
+                return "Erro: ID do pedido já existe!", 400
+            return redirect(url_for('painel.index'))
+
+        return render_template('novo_pedido.html')
+
+    @rotas.route('/pedido/<pedido_id>/editar', methods=['GET', 'POST'])
+    def editar_pedido(pedido_id):
+        """Editar pedido existente"""
+        if request.method == 'POST':
+            repo.atualizar_pedido(pedido_id, request.form['nome_cliente'], request.form['produto'],
+                                  request.form['tamanho'], request.form['tipo_frete'])
+
+            return redirect(url_for('painel.index'))
+
+        pedido = repo.obter_pedido(pedido_id)
+
+        if not pedido:
+            return "Pedido não encontrado!", 404
+
+        return render_template('editar_pedido.html', pedido=pedido)
+
+    @rotas.route('/pedido/<pedido_id>/excluir')
+    def excluir_pedido(pedido_id):
+        """Excluir um pedido"""
+        # Verificar se o pedido existe
+        pedido = repo.obter_pedido(pedido_id)
+        if not pedido:
+            return responder_acao(repo, 'Pedido não encontrado', 'error', status=404)
+
+        try:
+            # Exclui também da tabela de pedidos completos, se existir
+            repo.excluir_pedidos([pedido_id])
+            mensagem, categoria = f'Pedido {pedido_id} excluído com sucesso!', 'success'
+        except Exception as e:
+            mensagem, categoria = f'Erro ao excluir pedido: {str(e)}', 'error'
+
+        # Verificar se há um parâmetro 'next' para redirecionamento
+        next_page = request.args.get('next')
+        if not (next_page and next_page.startswith('/')):
+            next_page = None
+        grupos = [pedido['grupo_id']] if pedido['grupo_id'] is not None else []
+        return responder_acao(repo, mensagem, categoria, grupos=grupos, pedidos=[pedido_id], destino=next_page)
+
+    @rotas.route('/buscar_pedido', methods=['GET', 'POST'])
+    def buscar_pedido():
+        """Buscar pedido por ID"""
+        if request.method == 'POST':
+            # Inclui os pedidos de grupos já arquivados
+            pedido = repo.buscar_pedido(request.form['id_pedido'])
+
+            return render_template('buscar_pedido.html', pedido=pedido)
+
+        return render_template('buscar_pedido.html', pedido=None)
+
+    @rotas.route('/pedidos_disponiveis')
+    @cache_http.com_etag
+    def pedidos_disponiveis():
+        """Visualizar todos os pedidos disponíveis (sem grupo)"""
+        # Pedidos sem grupo, já separados por tipo de frete
+        pedidos_padrao = repo.pedidos_sem_grupo('FRETE PADRÃO')
+        pedidos_expresso = repo.pedidos_sem_grupo('EXPRESSO')
+
+        return render_template('pedidos_disponiveis.html',
+                               pedidos_padrao=pedidos_padrao,
+                               pedidos_expresso=pedidos_expresso)
+
+    @rotas.route('/todos_pedidos')
+    @cache_http.com_etag
+    def todos_pedidos():
+        """Visualizar todos os pedidos do sistema"""
+        # Estatísticas direto no banco, sem carregar os pedidos
+        estatisticas = repo.estatisticas_pedidos()
+
+        # Buscar grupos disponíveis para ações em lote
+        grupos_disponiveis = repo.grupos_com_vaga()
+
+        # Tabela com todos os pedidos: reaproveitada enquanto a versão dos dados não mudar
+        chave = cache_fragmentos.chave_tabela('todos_pedidos', request.query_string.decode(), repo.versao_dados())
+        tabela = cache_fragmentos.obter(chave)
+        if tabela is None:
+            tabela = cache_fragmentos.renderizar(chave, 'tabela_pedidos.html', todos_pedidos=repo.listar_pedidos())
+
+        return render_template('todos_pedidos.html',
+                               tabela=tabela,
+                               total_pedidos=estatisticas['total_pedidos'],
+                               total_padrao=estatisticas['total_padrao'],
+                               total_expresso=estatisticas['total_expresso'],
+                               pedidos_em_grupos=estatisticas['pedidos_em_grupos'],
+                               pedidos_sem_grupo=estatisticas['total_pedidos'] - estatisticas['pedidos_em_grupos'],
+                               grupos_enviados=estatisticas['grupos_enviados'],
+                               grupos_disponiveis=grupos_disponiveis)
+
+    @rotas.route('/acoes_lote', methods=['POST'])
+    def acoes_lote():
+        """Executar ações em lote nos pedidos selecionados"""
+        acao = request.form.get('acao')
+        pedidos_selecionados = request.form.getlist('pedidos_selecionados')
+
+        if not pedidos_selecionados:
+            flash('Nenhum pedido selecionado!', 'warning')
+            return redirect(url_for('pedidos.todos_pedidos'))
+
+        try:
+            if acao == 'excluir':
+                # Exclui também da tabela de pedidos completos, se existir
+                repo.excluir_pedidos(pedidos_selecionados)
+                flash(f'{len(pedidos_selecionados)} pedido(s) excluído(s) com sucesso!', 'success')
+                agendar_manutencao(repo)
+
+            elif acao == 'remover_grupos':
+                # Remover pedidos de seus grupos
+                repo.remover_dos_grupos(pedidos_selecionados)
+                flash(f'{len(pedidos_selecionados)} pedido(s) removido(s) de seus grupos!', 'success')
+
+            elif acao == 'mover_grupo':
+                # Mover pedidos para um grupo específico (só os de frete padrão, máximo 5 por grupo)
+                grupo_id = request.form.get('grupo_destino', type=int)
+                if grupo_id:
+                    movidos = repo.mover_para_grupo(grupo_id, pedidos_selecionados)
+                    if movidos is None:
+                        flash('Grupo não encontrado!', 'error')
+                    elif movidos:
+                        flash(f'{len(pedidos_selecionados)} pedido(s) movido(s) para o grupo!', 'success')
+                    else:
+                        flash('Grupo não tem espaço suficiente! Máximo 5 pedidos por grupo.', 'error')
+                else:
+                    flash('Grupo de destino não especificado!', 'error')
+
+        except Exception as e:
+            flash(f'Erro ao executar ação: {str(e)}', 'error')
+
+        return redirect(url_for('pedidos.todos_pedidos'))
+
+    app.register_blueprint(rotas)
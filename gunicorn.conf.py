@@ -0,0 +1,85 @@
+"""
+Configuração do gunicorn para produção (gunicorn -c gunicorn.conf.py app:app)
+
+Workers gthread: cada processo atende GUNICORN_THREADS requisições ao mesmo tempo.
+Enquanto uma thread espera o SQLite ou um upload lento chegando, as outras seguem;
+os processos (WEB_CONCURRENCY, padrão CPUs + 1) cobrem o trabalho de CPU que o GIL
+serializa dentro de um processo. GUNICORN_WORKER=sync volta ao modelo antigo, com
+2 x CPUs + 1 processos de uma requisição cada. GUNICORN_WORKER=uvicorn sobe o modo
+ASGI (assincrono.py, servido como asgi:app): um laço de eventos por processo, com
+uploads e streams esperando sem ocupar thread.
+
+preload_app importa o app uma vez no mestre e os workers herdam o código por
+copy-on-write; gc.freeze() antes do fork evita que o coletor de lixo toque (e
+copie) essas páginas. max_requests com jitter recicla cada worker depois de
+algumas centenas de requisições, sem todos reiniciarem juntos, e limita o
+crescimento de memória. Ao sair, os contadores de métricas do worker são somados
+ao acumulado do /metrics (child_exit, monitoramento.py).
+
+Tempo limite: no gthread e no uvicorn o timeout do gunicorn só pega worker travado; o prazo
+de cada requisição (maior nas rotas de upload) está em prazos.py. No sync uma
+requisição longa impede o worker de avisar o mestre, então o timeout precisa
+cobrir o upload mais lento. graceful_timeout deixa terminar a importação em
+andamento quando um worker é reciclado ou num deploy.
+
+Comparação das configurações sob carga: python -m benchmarks.carga
+"""
+
+import gc
+import os
+
+import prazos
+
+
+def _cpus():
+    # Respeita o limite de CPUs do contêiner quando o sistema informa
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+CPUS = _cpus()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+worker_class = os.environ.get('GUNICORN_WORKER', 'gthread')
+if worker_class == 'gthread':
+    workers = int(os.environ.get('WEB_CONCURRENCY', CPUS + 1))
+    threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+elif worker_class == 'uvicorn':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    workers = int(os.environ.get('WEB_CONCURRENCY', CPUS + 1))
+else:
+    workers = int(os.environ.get('WEB_CONCURRENCY', CPUS * 2 + 1))
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', str(max_requests // 5)))
+
+if worker_class == 'sync':
+    timeout = int(prazos.PRAZO_UPLOAD)
+else:
+    timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(prazos.PRAZO_UPLOAD)
+keepalive = 5
+
+# Batimento dos workers em memória: disco lento do contêiner não vira falso "travado"
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+
+def when_ready(server):
+    server.log.info('Workers: %d x %s%s, preload=%s, max_requests=%d (+%d), timeout=%ds, prazo upload=%ds',
+                    workers, worker_class, f' ({threads} threads)' if worker_class == 'gthread' else '',
+                    preload_app, max_requests, max_requests_jitter, timeout, graceful_timeout)
+
+
+def pre_fork(server, worker):
+    # Objetos do app carregado no mestre vão para a geração permanente do coletor
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    # Contadores do worker que saiu vão para o acumulado do /metrics e o arquivo dele é apagado
+    import monitoramento
+    monitoramento.recolher_worker(worker.pid)
@@ -0,0 +1,616 @@
+"""
+Pipeline de importação de CSV exportado da Nuvemshop
+
+A importação é dividida em etapas cronometradas individualmente:
+
+    abrir        entrega o CSV como arquivo (descompactando .gz e .zip aos poucos)
+                 ou reconhece uma planilha .xlsx
+    detectar     descobre codificação e separador a partir de uma amostra do arquivo
+    ler          carrega o CSV com pandas (com as tentativas alternativas de leitura);
+                 a planilha é lida linha a linha pelo openpyxl, sem detecção, em
+                 blocos de LINHAS_POR_BLOCO que seguem direto para transformar
+    transformar  agrupa as linhas por número do pedido e monta as tuplas de cada item
+    gravar       insere em pedidos_completos e pedidos
+
+analisar() executa as etapas até transformar, sem tocar no banco, e concluir()
+grava; importar() faz as duas coisas. A prévia da importação (previa.py) guarda o
+resultado de analisar() e só chama concluir() quando o usuário confirma.
+
+O arquivo nunca é carregado inteiro em memória: o upload chega como o arquivo
+temporário do Werkzeug, a descompactação grava num arquivo temporário (em disco
+acima de EM_MEMORIA) e o pandas lê dele só as colunas usadas. A planilha .xlsx
+(a exportação aberta e salva no Excel) é lida em modo read_only, que percorre a
+primeira aba sem montar a pasta de trabalho inteira; cada linha vira item assim que
+chega, sem guardar as linhas lidas. O CSV descompactado, e a planilha descompactada
+(contando os bytes de fato lidos, não os tamanhos que o zip declara), são limitados
+a IMPORTACAO_MAXIMO_MB (padrão 500); o upload em si, ao MAX_CONTENT_LENGTH do app
+(UPLOAD_MAXIMO_MB).
+
+pandas e openpyxl estão no requirements.txt. Sem eles (requirements_light.txt) o
+app sobe normalmente e só a importação de arquivos responde com uma mensagem de erro.
+
+Ao final é emitido um único registro de log com as contagens e o tempo de cada etapa.
+O log por linha é de nível DEBUG e amostrado (ver logs.Amostrador).
+"""
+
+import datetime
+import gzip
+import io
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+import zipfile
+import zlib
+
+from logs import Amostrador
+
+try:
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+try:
+    import chardet
+    CHARDET_AVAILABLE = True
+except ImportError:
+    CHARDET_AVAILABLE = False
+
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+logger = logging.getLogger('pedidos.importacao')
+
+# Tamanho da amostra usada para detectar codificação e separador
+TAMANHO_AMOSTRA = 64 * 1024
+
+# Limite do CSV descompactado e quanto dele fica em memória antes de ir para o disco
+MAXIMO_DESCOMPACTADO = int(os.environ.get('IMPORTACAO_MAXIMO_MB', '500')) * 1024 * 1024
+EM_MEMORIA = 1024 * 1024
+BLOCO = 64 * 1024
+
+# Linhas da planilha em cada DataFrame entregue a transformar
+LINHAS_POR_BLOCO = 5000
+
+ENCODINGS_ALTERNATIVOS = ['utf-8', 'iso-8859-1', 'windows-1252', 'latin1', 'cp1252']
+
+COLUNAS_ESPERADAS = [
+    'Número do Pedido', 'E-mail', 'Data', 'Status do Pedido',
+    'Status do Pagamento', 'Status do Envio', 'Moeda', 'Subtotal',
+    'Desconto', 'Valor do Frete', 'Total', 'Nome do comprador',
+    'CPF / CNPJ', 'Telefone', 'Nome para a entrega', 'Telefone para a entrega',
+    'Endereço', 'Número', 'Complemento', 'Bairro', 'Cidade',
+    'Código postal', 'Estado', 'País', 'Forma de Entrega',
+    'Forma de Pagamento', 'Cupom de Desconto', 'Anotações do Comprador',
+    'Anotações do Vendedor', 'Data de pagamento', 'Data de envío',
+    'Nome do Produto', 'Valor do Produto'
+]
+
+# As demais colunas da exportação nem chegam ao DataFrame
+_COLUNAS_USADAS = frozenset(COLUNAS_ESPERADAS)
+
+# Coluna do CSV -> coluna de pedidos_completos (dados do pedido, vindos da primeira linha)
+CAMPOS_TEXTO = [
+    ('email', 'E-mail'), ('data_pedido', 'Data'), ('status_pedido', 'Status do Pedido'),
+    ('status_pagamento', 'Status do Pagamento'), ('status_envio', 'Status do Envio'),
+    ('moeda', 'Moeda'), ('nome_comprador', 'Nome do comprador'), ('cpf_cnpj', 'CPF / CNPJ'),
+    ('telefone', 'Telefone'), ('nome_entrega', 'Nome para a entrega'),
+    ('telefone_entrega', 'Telefone para a entrega'), ('endereco', 'Endereço'),
+    ('numero', 'Número'), ('complemento', 'Complemento'), ('bairro', 'Bairro'),
+    ('cidade', 'Cidade'), ('codigo_postal', 'Código postal'), ('estado', 'Estado'),
+    ('pais', 'País'), ('forma_entrega', 'Forma de Entrega'),
+    ('forma_pagamento', 'Forma de Pagamento'), ('cupom_desconto', 'Cupom de Desconto'),
+    ('anotacoes_comprador', 'Anotações do Comprador'),
+    ('anotacoes_vendedor', 'Anotações do Vendedor'),
+    ('data_pagamento', 'Data de pagamento'), ('data_envio', 'Data de envío'),
+]
+CAMPOS_NUMERO = [
+    ('subtotal', 'Subtotal'), ('desconto', 'Desconto'),
+    ('valor_frete', 'Valor do Frete'), ('total', 'Total'),
+]
+
+COLUNAS_PEDIDOS_COMPLETOS = [
+    'numero_pedido', 'email', 'data_pedido', 'status_pedido', 'status_pagamento',
+    'status_envio', 'moeda', 'subtotal', 'desconto', 'valor_frete', 'total',
+    'nome_comprador', 'cpf_cnpj', 'telefone', 'nome_entrega', 'telefone_entrega',
+    'endereco', 'numero', 'complemento', 'bairro', 'cidade', 'codigo_postal',
+    'estado', 'pais', 'forma_entrega', 'forma_pagamento', 'cupom_desconto',
+    'anotacoes_comprador', 'anotacoes_vendedor', 'data_pagamento',
+    'data_envio', 'nome_produto', 'valor_produto'
+]
+
+TAMANHOS = ['PP', 'P', 'M', 'G', 'GG', 'XG', 'XXG']
+
+
+class ErroImportacao(Exception):
+    """Arquivo que não pode ser importado; a mensagem é mostrada ao usuário"""
+
+
+def _texto(valor):
+    return '' if pd.isna(valor) else str(valor).strip()
+
+
+def _numero(valor):
+    texto = _texto(valor)
+    return float(texto) if texto != '' else 0.0
+
+
+def extrair_tamanho(nome_produto):
+    """Extrai o tamanho do nome do produto (M quando não encontra)"""
+    nome = nome_produto.upper()
+    for t in TAMANHOS:
+        if t in nome:
+            return t
+    return 'M'
+
+
+def classificar_frete(forma_entrega):
+    """Tipo de frete do pedido a partir da forma de entrega"""
+    return 'EXPRESSO' if 'expresso' in forma_entrega.lower() else 'FRETE PADRÃO'
+
+
+def _copiar_limitado(origem, destino, limite=MAXIMO_DESCOMPACTADO):
+    """Copia `origem` em blocos; `destino` None só conta os bytes"""
+    total = 0
+    while True:
+        bloco = origem.read(BLOCO)
+        if not bloco:
+            return total
+        total += len(bloco)
+        if total > limite:
+            raise ErroImportacao(f'Arquivo muito grande: o CSV descompactado passa de {limite // (1024 * 1024)} MB')
+        if destino is not None:
+            destino.write(bloco)
+
+
+def _conferir_planilha(pacote):
+    """Descompacta as partes da planilha sem guardar, parando em MAXIMO_DESCOMPACTADO
+
+    Os tamanhos no índice do zip são declarados por quem montou o arquivo; só a
+    leitura mostra quanto cada parte ocupa de fato.
+    """
+    restante = MAXIMO_DESCOMPACTADO
+    try:
+        for info in pacote.infolist():
+            if info.filename.startswith('xl/') and not info.is_dir():
+                with pacote.open(info) as parte:
+                    restante -= _copiar_limitado(parte, None, restante)
+    except ErroImportacao:
+        raise ErroImportacao(f'Planilha muito grande: passa de {MAXIMO_DESCOMPACTADO // (1024 * 1024)} MB '
+                             'descompactada')
+    except (OSError, EOFError, zlib.error, zipfile.BadZipFile, NotImplementedError) as e:
+        raise ErroImportacao(f'Não foi possível ler a planilha: {e}')
+
+
+def abrir_arquivo(dados):
+    """Etapa abrir: retorna (arquivo binário posicionável com o CSV, formato)
+
+    `dados` são bytes ou um arquivo binário (o upload já guardado pelo Werkzeug).
+    gzip e zip (com um único .csv dentro) são reconhecidos pelo conteúdo e
+    descompactados em blocos para um arquivo temporário. Uma planilha .xlsx (que
+    também é um zip) volta como está, com o formato 'xlsx'.
+    """
+    if isinstance(dados, (bytes, bytearray)):
+        dados = io.BytesIO(dados)
+    assinatura = dados.read(4)
+    dados.seek(0)
+
+    pacote = None
+    if assinatura[:2] == b'\x1f\x8b':
+        formato = 'gzip'
+        origem = gzip.GzipFile(fileobj=dados)
+    elif assinatura == b'PK\x03\x04':
+        formato = 'zip'
+        try:
+            pacote = zipfile.ZipFile(dados)
+        except zipfile.BadZipFile:
+            raise ErroImportacao('Arquivo zip inválido')
+        if 'xl/workbook.xml' in pacote.namelist():
+            try:
+                _conferir_planilha(pacote)
+            finally:
+                pacote.close()
+            dados.seek(0)
+            return dados, 'xlsx'
+        csvs = [i for i in pacote.infolist() if not i.is_dir() and i.filename.lower().endswith('.csv')]
+        if len(csvs) != 1:
+            pacote.close()
+            raise ErroImportacao('O arquivo zip deve conter um único arquivo .csv')
+        origem = pacote.open(csvs[0])
+    elif dados.seekable():
+        return dados, 'csv'
+    else:
+        formato = 'csv'
+        origem = dados
+
+    destino = tempfile.SpooledTemporaryFile(max_size=EM_MEMORIA)
+    try:
+        _copiar_limitado(origem, destino)
+    except (OSError, EOFError, zlib.error, zipfile.BadZipFile) as e:
+        destino.close()
+        raise ErroImportacao(f'Não foi possível descompactar o arquivo: {e}')
+    except ErroImportacao:
+        destino.close()
+        raise
+    finally:
+        origem.close()
+        if pacote is not None:
+            pacote.close()
+    destino.seek(0)
+    return destino, formato
+
+
+def detectar_formato(arquivo):
+    """Etapa detectar: retorna (codificações a tentar, separador) a partir de uma amostra"""
+    amostra = arquivo.read(TAMANHO_AMOSTRA)
+    arquivo.seek(0)
+    candidatas = []
+    if CHARDET_AVAILABLE:
+        resultado = chardet.detect(amostra)
+        if resultado['encoding']:
+            logger.debug('Codificação detectada: %s (confiança: %.2f)',
+                         resultado['encoding'], resultado['confidence'] or 0)
+            candidatas.append(resultado['encoding'])
+    candidatas += [e for e in ENCODINGS_ALTERNATIVOS if e not in candidatas]
+
+    # O cabeçalho só tem ASCII e letras latinas; latin-1 sempre decodifica
+    cabecalho = amostra.split(b'\n', 1)[0].decode('iso-8859-1')
+    separador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+    return candidatas, separador
+
+
+def _coluna_usada(coluna):
+    return coluna in _COLUNAS_USADAS
+
+
+def ler_csv(arquivo, encodings, separador):
+    """Etapa ler: carrega o CSV tentando cada codificação; retorna (df, encoding)"""
+    for encoding in encodings:
+        try:
+            arquivo.seek(0)
+            df = pd.read_csv(arquivo, encoding=encoding, sep=separador, usecols=_coluna_usada,
+                             dtype=str, on_bad_lines='skip')
+            logger.debug('Arquivo lido com a codificação %s e separador %r', encoding, separador)
+            return df, encoding
+        except (UnicodeDecodeError, LookupError, pd.errors.ParserError) as e:
+            logger.debug('Falha com a codificação %s: %s', encoding, e)
+
+    # Último recurso: engine='python', que tolera arquivos mais irregulares
+    for encoding in ['utf-8', 'iso-8859-1', 'windows-1252']:
+        try:
+            arquivo.seek(0)
+            df = pd.read_csv(arquivo, encoding=encoding, sep=None, engine='python', usecols=_coluna_usada,
+                             dtype=str, on_bad_lines='skip')
+            logger.debug("Arquivo lido com engine='python' e codificação %s", encoding)
+            return df, encoding
+        except Exception as e:
+            logger.debug("Falha com engine='python' e codificação %s: %s", encoding, e)
+
+    raise ErroImportacao('Não foi possível ler o arquivo CSV. Verifique se o arquivo está em um '
+                         'formato válido. Se ele passou pelo Excel, envie a planilha .xlsx direto '
+                         'ou salve como "CSV UTF-8".')
+
+
+# Colunas em que o Excel, ao guardar como número, perde os zeros à esquerda
+_LARGURAS = {'Código postal': (8,), 'CPF / CNPJ': (11, 14)}
+
+
+def _celula(valor, larguras=None):
+    """Valor da planilha no mesmo texto que a exportação em CSV traria"""
+    if valor is None:
+        return None
+    if larguras and isinstance(valor, (int, float)) and float(valor).is_integer():
+        texto = str(int(valor))
+        return texto.zfill(next((l for l in larguras if len(texto) <= l), len(texto)))
+    if isinstance(valor, datetime.datetime):
+        return valor.strftime('%d/%m/%Y' if valor.time() == datetime.time() else '%d/%m/%Y %H:%M:%S')
+    if isinstance(valor, datetime.date):
+        return valor.strftime('%d/%m/%Y')
+    if isinstance(valor, float) and valor.is_integer():
+        # Número do pedido, CEP e número da casa viram 377.0 no Excel
+        return str(int(valor))
+    return str(valor)
+
+
+def ler_xlsx(arquivo, tempos=None):
+    """Etapa ler para planilhas: retorna (blocos, nome da aba)
+
+    `blocos` gera DataFrames de até LINHAS_POR_BLOCO linhas da primeira aba (ao
+    menos um, com as colunas, mesmo sem linhas) e fecha a planilha ao terminar;
+    o tempo gasto lendo é somado em tempos['ler'].
+    """
+    if not OPENPYXL_AVAILABLE:
+        raise ErroImportacao('Para importar planilhas .xlsx instale o openpyxl (pip install openpyxl) '
+                             'ou salve a planilha como "CSV UTF-8".')
+    try:
+        planilha = openpyxl.load_workbook(arquivo, read_only=True, data_only=True)
+    except Exception as e:
+        # XML quebrado, partes faltando no zip: o openpyxl não tem um erro só
+        raise ErroImportacao(f'Não foi possível ler a planilha: {e}')
+    if not planilha.worksheets:
+        planilha.close()
+        raise ErroImportacao('A planilha não tem nenhuma aba')
+    aba = planilha.worksheets[0]
+    tempos = {} if tempos is None else tempos
+
+    def blocos():
+        marca = time.perf_counter()
+        try:
+            linhas = aba.iter_rows(values_only=True)
+            posicoes = {}
+            for i, nome in enumerate(next(linhas, ())):
+                nome = '' if nome is None else str(nome).strip()
+                if nome in _COLUNAS_USADAS:
+                    posicoes.setdefault(nome, i)
+            colunas = [(i, _LARGURAS.get(nome)) for nome, i in posicoes.items()]
+            registros = []
+            entregue = False
+            for linha in linhas:
+                if any(valor is not None for valor in linha):
+                    registros.append([_celula(linha[i], larguras) if i < len(linha) else None
+                                      for i, larguras in colunas])
+                if len(registros) == LINHAS_POR_BLOCO:
+                    bloco = pd.DataFrame(registros, columns=list(posicoes), dtype=object)
+                    registros = []
+                    tempos['ler'] = tempos.get('ler', 0) + time.perf_counter() - marca
+                    yield bloco
+                    entregue = True
+                    marca = time.perf_counter()
+            if registros or not entregue:
+                bloco = pd.DataFrame(registros, columns=list(posicoes), dtype=object)
+                tempos['ler'] = tempos.get('ler', 0) + time.perf_counter() - marca
+                yield bloco
+        finally:
+            planilha.close()
+
+    return blocos(), aba.title
+
+
+def transformar(df, resumo):
+    """Etapa transformar: agrupa por pedido e retorna a lista de (numero_pedido, itens)
+
+    `df` é um DataFrame ou uma sequência de DataFrames (os blocos da planilha);
+    as linhas de um pedido podem estar em blocos diferentes. Cada item é
+    (id_produto, linha de pedidos_completos, linha de pedidos) ou uma exceção,
+    quando o item não pôde ser convertido. Só os itens montados ficam em memória,
+    não as linhas lidas.
+    """
+    blocos = [df] if isinstance(df, pd.DataFrame) else df
+    amostrar = Amostrador(logger)
+    # numero_pedido -> (dados do pedido, tipo de frete, itens); None se a linha principal deu erro
+    pedidos_agrupados = {}
+    indice = 0
+    for bloco in blocos:
+        faltantes = [col for col in COLUNAS_ESPERADAS if col not in bloco.columns]
+        if faltantes:
+            raise ErroImportacao(f'Colunas faltantes no CSV: {", ".join(faltantes)}')
+
+        for linha in bloco[COLUNAS_ESPERADAS].to_dict('records'):
+            indice += 1
+            numero_pedido = _texto(linha['Número do Pedido'])
+            if numero_pedido == '' or numero_pedido == 'nan':
+                resumo['linhas_puladas'] += 1
+                if amostrar(indice - 1):
+                    logger.debug('Linha %d pulada: número do pedido vazio ou inválido', indice)
+                continue
+            resumo['linhas_processadas'] += 1
+            if amostrar(indice - 1):
+                logger.debug('Linha %d: pedido %s', indice, numero_pedido)
+
+            if numero_pedido not in pedidos_agrupados:
+                # Os dados do pedido vêm da primeira linha; as seguintes só trazem o produto
+                try:
+                    base = [_texto(linha[coluna]) for _, coluna in CAMPOS_TEXTO]
+                    numeros = [_numero(linha[coluna]) for _, coluna in CAMPOS_NUMERO]
+                except ValueError as e:
+                    resumo['erros'] += 1
+                    logger.warning('Erro ao processar pedido %s: %s', numero_pedido, e)
+                    pedidos_agrupados[numero_pedido] = None
+                    continue
+                dados = dict(zip([c for c, _ in CAMPOS_TEXTO], base))
+                dados.update(zip([c for c, _ in CAMPOS_NUMERO], numeros))
+                pedidos_agrupados[numero_pedido] = (dados, classificar_frete(dados['forma_entrega']), [])
+            elif pedidos_agrupados[numero_pedido] is None:
+                continue
+            dados, tipo_frete, itens = pedidos_agrupados[numero_pedido]
+
+            id_produto = f"{numero_pedido}_{len(itens)+1}" if itens else numero_pedido
+            try:
+                nome_produto = _texto(linha['Nome do Produto'])
+                valor_produto = _numero(linha['Valor do Produto'])
+            except ValueError as e:
+                itens.append((id_produto, e, None))
+                continue
+            completo = dict(dados, numero_pedido=id_produto, nome_produto=nome_produto,
+                            valor_produto=valor_produto)
+            itens.append((
+                id_produto,
+                tuple(completo[c] for c in COLUNAS_PEDIDOS_COMPLETOS),
+                (id_produto, dados['nome_comprador'], nome_produto,
+                 extrair_tamanho(nome_produto) if nome_produto else 'M', tipo_frete),
+            ))
+
+    return [(numero_pedido, grupo[2]) for numero_pedido, grupo in pedidos_agrupados.items() if grupo is not None]
+
+
+def _arquivados(conn, ids):
+    """Dos ids informados, os de pedidos que já foram para o arquivo (ver arquivamento.py)"""
+    return {linha[0] for linha in conn.execute(
+        'SELECT id_pedido FROM pedidos_arquivo WHERE id_pedido IN (SELECT value FROM json_each(?))',
+        (json.dumps(list(ids)),))}
+
+
+def gravar(conn, pedidos, resumo):
+    """Etapa gravar: insere os itens; duplicados (inclusive os arquivados) são contados e ignorados"""
+    sql_completo = (f"INSERT INTO pedidos_completos ({', '.join(COLUNAS_PEDIDOS_COMPLETOS)}) "
+                    f"VALUES ({', '.join('?' * len(COLUNAS_PEDIDOS_COMPLETOS))})")
+    sql_pedido = ('INSERT INTO pedidos (id_pedido, nome_cliente, produto, tamanho, tipo_frete) '
+                  'VALUES (?, ?, ?, ?, ?)')
+
+    arquivados = _arquivados(conn, (id_produto for _, itens in pedidos for id_produto, _, _ in itens))
+    for numero_pedido, itens in pedidos:
+        for id_produto, completo, pedido in itens:
+            if isinstance(completo, Exception):
+                resumo['erros'] += 1
+                logger.warning('Erro ao processar produto %s do pedido %s: %s',
+                               id_produto, numero_pedido, completo)
+                continue
+            if id_produto in arquivados:
+                resumo['duplicados'] += 1
+                continue
+            try:
+                conn.execute(sql_completo, completo)
+            except sqlite3.IntegrityError:
+                resumo['duplicados'] += 1
+                continue
+            try:
+                conn.execute(sql_pedido, pedido)
+                resumo['importados'] += 1
+            except sqlite3.IntegrityError:
+                resumo['duplicados'] += 1
+    conn.commit()
+
+
+def gravar_atualizando(conn, pedidos, resumo):
+    """Variante da etapa gravar para fontes que reenviam pedidos já gravados
+
+    Itens novos são inseridos e os existentes têm os dados atualizados; o grupo do
+    pedido é preservado. Linhas sem nenhuma diferença não são tocadas, para não
+    invalidar caches nem gerar eventos no dashboard à toa; pedidos já arquivados
+    contam como inalterados. Não faz commit.
+    """
+    completos = []
+    simples = []
+    arquivados = _arquivados(conn, (id_produto for _, itens in pedidos for id_produto, _, _ in itens))
+    for numero_pedido, itens in pedidos:
+        for id_produto, completo, pedido in itens:
+            if isinstance(completo, Exception):
+                resumo['erros'] += 1
+                logger.warning('Erro ao processar produto %s do pedido %s: %s',
+                               id_produto, numero_pedido, completo)
+                continue
+            if id_produto in arquivados:
+                resumo['inalterados'] += 1
+                continue
+            completos.append(completo)
+            simples.append(pedido)
+    if not completos:
+        return
+
+    ids = json.dumps([c[0] for c in completos])
+    existentes = {linha[0] for linha in conn.execute(
+        'SELECT numero_pedido FROM pedidos_completos WHERE numero_pedido IN '
+        '(SELECT value FROM json_each(?))', (ids,))}
+
+    colunas = COLUNAS_PEDIDOS_COMPLETOS[1:]
+    cursor = conn.executemany(
+        f"INSERT INTO pedidos_completos ({', '.join(COLUNAS_PEDIDOS_COMPLETOS)}) "
+        f"VALUES ({', '.join('?' * len(COLUNAS_PEDIDOS_COMPLETOS))}) "
+        f"ON CONFLICT (numero_pedido) DO UPDATE SET "
+        f"{', '.join(f'{c} = excluded.{c}' for c in colunas)} "
+        f"WHERE {' OR '.join(f'{c} IS NOT excluded.{c}' for c in colunas)}",
+        completos)
+    alterados = cursor.rowcount
+
+    # Pedido já conhecido que foi excluído da lista de agrupamento não volta
+    novos = [p for p in simples if p[0] not in existentes]
+    conn.executemany('INSERT OR IGNORE INTO pedidos (id_pedido, nome_cliente, produto, tamanho, tipo_frete) '
+                     'VALUES (?, ?, ?, ?, ?)', novos)
+    conn.executemany(
+        'UPDATE pedidos SET nome_cliente = ?, produto = ?, tamanho = ?, tipo_frete = ? '
+        'WHERE id_pedido = ? AND (nome_cliente IS NOT ? OR produto IS NOT ? '
+        'OR tamanho IS NOT ? OR tipo_frete IS NOT ?)',
+        [(p[1], p[2], p[3], p[4], p[0], p[1], p[2], p[3], p[4]) for p in simples if p[0] in existentes])
+
+    resumo['importados'] += len(novos)
+    resumo['atualizados'] += alterados - len(novos)
+    resumo['inalterados'] += len(existentes) - (alterados - len(novos))
+
+
+def analisar(dados, nome_arquivo=''):
+    """Etapas abrir a transformar, sem tocar no banco; retorna (pedidos, resumo)
+
+    Lança ErroImportacao quando o arquivo não pode ser lido ou não tem as colunas
+    necessárias. Os pedidos seguem para concluir() ou para a prévia (previa.py).
+    """
+    resumo = {'arquivo': nome_arquivo, 'bytes': 0, 'linhas': 0, 'linhas_processadas': 0,
+              'linhas_puladas': 0, 'pedidos': 0, 'importados': 0, 'duplicados': 0, 'erros': 0,
+              'tempos': {}}
+    tempos = resumo['tempos']
+    inicio = time.perf_counter()
+    if not PANDAS_AVAILABLE:
+        raise ErroImportacao('A importação de arquivos precisa do pandas (pip install -r requirements.txt)')
+
+    try:
+        marca = time.perf_counter()
+        arquivo, formato = abrir_arquivo(dados)
+        tempos['abrir'] = time.perf_counter() - marca
+        try:
+            resumo.update(formato=formato, bytes=arquivo.seek(0, io.SEEK_END))
+            arquivo.seek(0)
+
+            if formato == 'xlsx':
+                # Leitura e transformação intercaladas, bloco a bloco
+                marca = time.perf_counter()
+                tempos['ler'] = 0.0
+                blocos, aba = ler_xlsx(arquivo, tempos)
+                try:
+                    pedidos = transformar(blocos, resumo)
+                finally:
+                    blocos.close()
+                tempos['transformar'] = time.perf_counter() - marca - tempos['ler']
+                resumo.update(aba=aba, linhas=resumo['linhas_processadas'] + resumo['linhas_puladas'])
+            else:
+                marca = time.perf_counter()
+                encodings, separador = detectar_formato(arquivo)
+                tempos['detectar'] = time.perf_counter() - marca
+
+                marca = time.perf_counter()
+                df, encoding = ler_csv(arquivo, encodings, separador)
+                tempos['ler'] = time.perf_counter() - marca
+                resumo.update(encoding=encoding, separador=separador, linhas=len(df))
+
+                marca = time.perf_counter()
+                pedidos = transformar(df, resumo)
+                tempos['transformar'] = time.perf_counter() - marca
+        finally:
+            if arquivo is not dados:
+                arquivo.close()
+        resumo['pedidos'] = len(pedidos)
+    except ErroImportacao as e:
+        tempos['total'] = time.perf_counter() - inicio
+        logger.warning('Importação rejeitada: %s', e, extra={'evento': 'importacao', 'resumo': resumo})
+        raise
+
+    tempos['total'] = time.perf_counter() - inicio
+    return pedidos, resumo
+
+
+def concluir(conn, pedidos, resumo, etapa_gravar=gravar):
+    """Etapa gravar sobre pedidos já transformados; completa e retorna o resumo
+
+    `etapa_gravar(conn, pedidos, resumo)` substitui a etapa gravar (o PostgreSQL
+    grava com COPY, ver repositorio.py).
+    """
+    tempos = resumo['tempos']
+    marca = time.perf_counter()
+    etapa_gravar(conn, pedidos, resumo)
+    tempos['gravar'] = time.perf_counter() - marca
+    tempos['total'] += tempos['gravar']
+
+    logger.info('Importação concluída: %d itens importados, %d duplicados, %d erros em %.2fs',
+                resumo['importados'], resumo['duplicados'], resumo['erros'], tempos['total'],
+                extra={'evento': 'importacao', 'resumo': resumo})
+    return resumo
+
+
+def importar(conn, dados, nome_arquivo='', etapa_gravar=gravar):
+    """Executa todas as etapas sobre o arquivo (bytes ou arquivo binário) e retorna o resumo"""
+    pedidos, resumo = analisar(dados, nome_arquivo)
+    return concluir(conn, pedidos, resumo, etapa_gravar)
@@ -0,0 +1,281 @@
+"""
+Instantâneo em memória da lista de pedidos (páginas de leitura)
+
+Todos os pedidos, Pedidos disponíveis e Adicionar pedido ao grupo leem a tabela
+pedidos inteira. Cada worker guarda, por arquivo de banco (uma loja = um arquivo),
+um instantâneo só de leitura em colunas:
+
+    id, grupo_id          array de inteiros (0 = sem grupo)
+    tamanho, tipo_frete   array de bytes com o código do valor (vocabulário pequeno)
+    id_pedido, nome_cliente, produto, data_criacao
+                          listas de strings internadas (nomes e produtos repetidos
+                          são um objeto só)
+
+mais o nome e a situação de cada grupo. Filtrar e contar são operações sobre as
+colunas (array.count, map/compress do itertools, em C): nenhum sqlite3.Row é criado
+e só os pedidos exibidos viram dicionários.
+
+O instantâneo tem a versão do log de alterações (eventos.py) em que foi lido. A
+cada leitura uma consulta compara com o último id do log; se mudou, só os pedidos
+e grupos alterados são lidos de novo e um instantâneo novo substitui o anterior
+(quem já tem o antigo continua com ele, sem lock). Log podado além da versão ou
+pedido fora da ordem de criação fazem a leitura completa. A limpeza do banco
+(manutencao.resetar) copia o banco novo sobre o mesmo arquivo, mas começa o log
+dois ids adiante: o salto aparece como log podado e também leva à leitura completa.
+Só existe no SQLite; INSTANTANEO=0 volta às consultas diretas.
+"""
+
+import os
+import sys
+import threading
+from array import array
+from copy import copy
+from itertools import compress, repeat
+from operator import eq, ne
+
+import eventos
+
+ATIVO = os.environ.get('INSTANTANEO', '1') != '0'
+
+# Acima disso os pedidos alterados são lidos com a tabela inteira
+MAX_ALTERADOS = 2000
+
+PADRAO = 'FRETE PADRÃO'
+
+_instantaneos = {}
+_lock = threading.Lock()
+
+contadores = {'completos': 0, 'incrementais': 0}
+
+
+def _internar(valor):
+    return sys.intern(valor) if isinstance(valor, str) else valor
+
+
+class Vocabulario:
+    """Valores distintos de uma coluna e o código (0-255) de cada um"""
+
+    __slots__ = ('valores', 'codigos')
+
+    def __init__(self, valores=()):
+        self.valores = list(valores)
+        self.codigos = {v: i for i, v in enumerate(self.valores)}
+
+    def codigo(self, valor):
+        codigo = self.codigos.get(valor)
+        if codigo is None:
+            if len(self.valores) == 255:
+                raise OverflowError('Vocabulário com mais de 255 valores')
+            codigo = self.codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return codigo
+
+    def copia(self):
+        return Vocabulario(self.valores)
+
+
+class Instantaneo:
+    """Pedidos em colunas, na ordem de criação; não muda depois de publicado"""
+
+    COLUNAS = ('id', 'id_pedido', 'nome_cliente', 'produto', 'tamanho', 'tipo_frete', 'grupo_id',
+               'data_criacao')
+
+    def __init__(self, arquivo, versao):
+        self.arquivo = arquivo
+        self.versao = versao
+        self.ids = array('q')
+        self.id_pedido = []
+        self.nome_cliente = []
+        self.produto = []
+        self.data_criacao = []
+        self.tamanho = array('B')
+        self.tipo_frete = array('B')
+        self.grupo_id = array('q')
+        self.tamanhos = Vocabulario()
+        self.fretes = Vocabulario([PADRAO, 'EXPRESSO'])
+        self.posicao = {}
+        self.grupos = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    # Montagem
+
+    def _acrescentar(self, linha):
+        self.posicao[linha['id_pedido']] = len(self.ids)
+        self.ids.append(linha['id'])
+        self.id_pedido.append(_internar(linha['id_pedido']))
+        self.nome_cliente.append(_internar(linha['nome_cliente']))
+        self.produto.append(_internar(linha['produto']))
+        self.data_criacao.append(linha['data_criacao'])
+        self.tamanho.append(self.tamanhos.codigo(_internar(linha['tamanho'])))
+        self.tipo_frete.append(self.fretes.codigo(_internar(linha['tipo_frete'])))
+        self.grupo_id.append(linha['grupo_id'] or 0)
+
+    def _substituir(self, i, linha):
+        self.nome_cliente[i] = _internar(linha['nome_cliente'])
+        self.produto[i] = _internar(linha['produto'])
+        self.tamanho[i] = self.tamanhos.codigo(_internar(linha['tamanho']))
+        self.tipo_frete[i] = self.fretes.codigo(_internar(linha['tipo_frete']))
+        self.grupo_id[i] = linha['grupo_id'] or 0
+
+    def _copia(self, versao):
+        novo = Instantaneo(self.arquivo, versao)
+        for nome in ('ids', 'id_pedido', 'nome_cliente', 'produto', 'data_criacao', 'tamanho', 'tipo_frete',
+                     'grupo_id', 'posicao', 'grupos'):
+            setattr(novo, nome, copy(getattr(self, nome)))
+        novo.tamanhos = self.tamanhos.copia()
+        novo.fretes = self.fretes.copia()
+        return novo
+
+    def _remover(self, indices):
+        """Tira as posições `indices` de todas as colunas"""
+        manter = [True] * len(self.ids)
+        for i in indices:
+            manter[i] = False
+        for nome in ('ids', 'tamanho', 'tipo_frete', 'grupo_id'):
+            coluna = getattr(self, nome)
+            setattr(self, nome, array(coluna.typecode, compress(coluna, manter)))
+        for nome in ('id_pedido', 'nome_cliente', 'produto', 'data_criacao'):
+            setattr(self, nome, list(compress(getattr(self, nome), manter)))
+        self.posicao = dict(zip(self.id_pedido, range(len(self.id_pedido))))
+
+    # Consultas
+
+    def _linhas(self, indices):
+        tamanhos, fretes, grupos = self.tamanhos.valores, self.fretes.valores, self.grupos
+        linhas = []
+        for i in indices:
+            grupo_id = self.grupo_id[i] or None
+            nome_grupo, enviado = grupos.get(grupo_id, (None, None))
+            linhas.append({
+                'id': self.ids[i], 'id_pedido': self.id_pedido[i], 'nome_cliente': self.nome_cliente[i],
+                'produto': self.produto[i], 'tamanho': tamanhos[self.tamanho[i]],
+                'tipo_frete': fretes[self.tipo_frete[i]], 'grupo_id': grupo_id,
+                'data_criacao': self.data_criacao[i], 'nome_grupo': nome_grupo, 'grupo_enviado': enviado,
+            })
+        return linhas
+
+    def _sem_grupo(self, tipo_frete=None):
+        """Máscara dos pedidos sem grupo (e do tipo de frete, se informado)"""
+        mascara = map(eq, self.grupo_id, repeat(0))
+        if tipo_frete is not None:
+            codigo = self.fretes.codigos.get(tipo_frete)
+            if codigo is None:
+                return repeat(False, len(self))
+            mascara = map(bool.__and__, mascara, map(eq, self.tipo_frete, repeat(codigo)))
+        return mascara
+
+    def listar(self):
+        """Todos os pedidos com o nome e a situação do grupo, mais recentes primeiro"""
+        return self._linhas(range(len(self) - 1, -1, -1))
+
+    def sem_grupo(self, tipo_frete=None, recentes=True):
+        indices = list(compress(range(len(self)), self._sem_grupo(tipo_frete)))
+        if recentes:
+            indices.reverse()
+        return self._linhas(indices)
+
+    def estatisticas(self):
+        """Mesmos totais do Repositorio.estatisticas_pedidos"""
+        enviados = {grupo_id for grupo_id, (_, enviado) in self.grupos.items() if enviado == 1}
+        return {
+            'total_pedidos': len(self),
+            'pedidos_em_grupos': sum(map(ne, self.grupo_id, repeat(0))),
+            'total_padrao': self.tipo_frete.count(self.fretes.codigos[PADRAO]),
+            'total_expresso': self.tipo_frete.count(self.fretes.codigos['EXPRESSO']),
+            'grupos_enviados': sum(map(enviados.__contains__, self.grupo_id)) if enviados else 0,
+        }
+
+
+_SQL_PEDIDOS = f"SELECT {', '.join(Instantaneo.COLUNAS)} FROM pedidos"
+
+
+def _arquivo(conn):
+    """Caminho do banco da conexão (a chave do instantâneo)"""
+    return conn.execute('PRAGMA database_list').fetchone()[2]
+
+
+def carregar(conn, arquivo=None):
+    """Lê a tabela inteira num instantâneo novo"""
+    versao = eventos.ultimo_evento(conn)
+    instantaneo = Instantaneo(arquivo or _arquivo(conn), versao)
+    for linha in conn.execute(f'{_SQL_PEDIDOS} ORDER BY data_criacao, id'):
+        instantaneo._acrescentar(linha)
+    instantaneo.grupos = {linha['id']: (linha['nome'], linha['enviado'])
+                         for linha in conn.execute('SELECT id, nome, enviado FROM grupos')}
+    contadores['completos'] += 1
+    return instantaneo
+
+
+def atualizar(conn, atual):
+    """Instantâneo novo com as alterações do log desde `atual`; None se for preciso ler tudo"""
+    alteracoes = eventos.ler_alteracoes(conn, atual.versao)
+    if alteracoes is None:
+        return None
+    versao, grupos, pedidos = alteracoes
+    if len(pedidos) > MAX_ALTERADOS:
+        return None
+
+    novo = atual._copia(versao)
+    linhas = {}
+    lista = list(pedidos)
+    for inicio in range(0, len(lista), 500):
+        lote = lista[inicio:inicio + 500]
+        for linha in conn.execute(f"{_SQL_PEDIDOS} WHERE id_pedido IN ({','.join('?' * len(lote))})", lote):
+            linhas[linha['id_pedido']] = linha
+
+    removidos = []
+    for id_pedido in pedidos:
+        i = novo.posicao.get(id_pedido)
+        linha = linhas.get(id_pedido)
+        if i is not None and (linha is None or linha['id'] != novo.ids[i]):
+            # Excluído (ou excluído e criado de novo com o mesmo id)
+            removidos.append(i)
+            del novo.posicao[id_pedido]
+        elif i is not None:
+            if linha['data_criacao'] != novo.data_criacao[i]:
+                return None
+            novo._substituir(i, linha)
+    if removidos:
+        novo._remover(removidos)
+
+    criados = sorted((linha for id_pedido, linha in linhas.items() if id_pedido not in novo.posicao),
+                     key=lambda linha: (linha['data_criacao'], linha['id']))
+    if criados and novo.data_criacao and criados[0]['data_criacao'] < novo.data_criacao[-1]:
+        return None
+    for linha in criados:
+        novo._acrescentar(linha)
+
+    if grupos:
+        lista = [grupo_id for grupo_id in grupos if grupo_id is not None]
+        for grupo_id in lista:
+            novo.grupos.pop(grupo_id, None)
+        for inicio in range(0, len(lista), 500):
+            lote = lista[inicio:inicio + 500]
+            for linha in conn.execute(f"SELECT id, nome, enviado FROM grupos WHERE id IN ({','.join('?' * len(lote))})",
+                                      lote):
+                novo.grupos[linha['id']] = (linha['nome'], linha['enviado'])
+    contadores['incrementais'] += 1
+    return novo
+
+
+def obter(conn):
+    """Instantâneo em dia com o banco da conexão"""
+    arquivo = _arquivo(conn)
+    versao = eventos.ultimo_evento(conn)
+    atual = _instantaneos.get(arquivo)
+    if atual is not None and atual.versao == versao:
+        return atual
+
+    with _lock:
+        atual = _instantaneos.get(arquivo)
+        if atual is not None and atual.versao >= versao:
+            return atual
+        novo = None
+        if atual is not None:
+            novo = atualizar(conn, atual)
+        if novo is None:
+            novo = carregar(conn, arquivo)
+        _instantaneos[arquivo] = novo
+        return novo
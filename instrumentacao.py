@@ -0,0 +1,244 @@
+"""
+Instrumentação de desempenho por requisição
+
+Mede o tempo total de cada requisição e, através de uma conexão SQLite
+instrumentada, a quantidade de consultas, o tempo gasto no banco e as linhas
+retornadas. Os números vão para o cabeçalho Server-Timing da resposta e para um
+relatório agregado em memória (rotas e consultas mais lentas) em /admin/desempenho.
+
+Uso:
+    conn = sqlite3.connect(DATABASE, factory=instrumentacao.ConexaoInstrumentada)
+    instrumentacao.init_app(app)
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+
+from flask import g, jsonify, request
+
+import prazos
+from admin import requer_admin
+
+# Pode ser desligada com INSTRUMENTACAO=0 (a conexão continua funcionando normalmente)
+ATIVA = os.environ.get('INSTRUMENTACAO', '1') != '0'
+
+# Segundos que uma gravação espera o lock de outra (threads do gthread, outros workers)
+ESPERA_BLOQUEIO = float(os.environ.get('SQLITE_ESPERA', '15'))
+
+# Limite de consultas distintas guardadas no relatório (evita crescer sem controle)
+MAX_CONSULTAS = 500
+
+_coletor_atual = ContextVar('coletor_sql', default=None)
+_lock = threading.Lock()
+_rotas = {}
+_consultas = {}
+_espacos = re.compile(r'\s+')
+
+# Contadores de contenção do SQLite lidos pelo módulo de monitoramento
+contadores_sqlite = {'bloqueios': 0, 'commits': 0, 'tempo_commit': 0.0}
+
+
+class ColetorSQL:
+    """Acumula as métricas de SQL de uma única requisição"""
+    __slots__ = ('consultas', 'tempo', 'linhas')
+
+    def __init__(self):
+        self.consultas = 0
+        self.tempo = 0.0
+        self.linhas = 0
+
+
+def _registrar(sql, duracao, linhas, nova_consulta):
+    """Soma a duração e as linhas na requisição atual e no agregado da consulta"""
+    coletor = _coletor_atual.get()
+    if coletor is not None:
+        coletor.tempo += duracao
+        coletor.linhas += linhas
+        if nova_consulta:
+            coletor.consultas += 1
+
+    chave = _espacos.sub(' ', sql).strip()
+    with _lock:
+        estatistica = _consultas.get(chave)
+        if estatistica is None:
+            if len(_consultas) >= MAX_CONSULTAS:
+                return
+            estatistica = _consultas[chave] = {'execucoes': 0, 'tempo_total': 0.0, 'tempo_max': 0.0, 'linhas': 0}
+        if nova_consulta:
+            estatistica['execucoes'] += 1
+        estatistica['tempo_total'] += duracao
+        estatistica['tempo_max'] = max(estatistica['tempo_max'], duracao)
+        estatistica['linhas'] += linhas
+
+
+def _contar_bloqueio(erro):
+    mensagem = str(erro)
+    if 'locked' in mensagem or 'busy' in mensagem:
+        contadores_sqlite['bloqueios'] += 1
+
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """Cursor que cronometra execute/fetch e conta as linhas lidas"""
+
+    _sql = ''
+
+    def execute(self, sql, parametros=()):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        except sqlite3.OperationalError as e:
+            _contar_bloqueio(e)
+            raise
+        finally:
+            self._sql = sql
+            _registrar(sql, time.perf_counter() - inicio, 0, True)
+
+    def executemany(self, sql, sequencia):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, sequencia)
+        except sqlite3.OperationalError as e:
+            _contar_bloqueio(e)
+            raise
+        finally:
+            self._sql = sql
+            _registrar(sql, time.perf_counter() - inicio, 0, True)
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        linha = super().fetchone()
+        _registrar(self._sql, time.perf_counter() - inicio, 0 if linha is None else 1, False)
+        return linha
+
+    def fetchmany(self, size=None):
+        inicio = time.perf_counter()
+        linhas = super().fetchmany(self.arraysize if size is None else size)
+        _registrar(self._sql, time.perf_counter() - inicio, len(linhas), False)
+        return linhas
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        linhas = super().fetchall()
+        _registrar(self._sql, time.perf_counter() - inicio, len(linhas), False)
+        return linhas
+
+
+class ConexaoInstrumentada(sqlite3.Connection):
+    """Conexão SQLite cujos cursores são instrumentados"""
+
+    def cursor(self, factory=CursorInstrumentado):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, sequencia):
+        return self.cursor().executemany(sql, sequencia)
+
+    def commit(self):
+        # O commit é onde a escrita espera pelo lock do arquivo quando há concorrência
+        inicio = time.perf_counter()
+        try:
+            super().commit()
+        except sqlite3.OperationalError as e:
+            _contar_bloqueio(e)
+            raise
+        finally:
+            contadores_sqlite['commits'] += 1
+            contadores_sqlite['tempo_commit'] += time.perf_counter() - inicio
+
+
+def conectar(caminho, **kwargs):
+    """Abre uma conexão instrumentada (ou comum, se a instrumentação estiver desligada)"""
+    if ATIVA:
+        kwargs.setdefault('factory', ConexaoInstrumentada)
+    kwargs.setdefault('timeout', ESPERA_BLOQUEIO)
+    conn = sqlite3.connect(caminho, **kwargs)
+    prazos.instalar(conn)
+    return conn
+
+
+def _iniciar_requisicao():
+    g._inicio_requisicao = time.perf_counter()
+    g._token_coletor = _coletor_atual.set(ColetorSQL())
+
+
+def _finalizar_requisicao(resposta):
+    inicio = g.pop('_inicio_requisicao', None)
+    token = g.pop('_token_coletor', None)
+    if inicio is None or token is None:
+        return resposta
+
+    coletor = _coletor_atual.get()
+    _coletor_atual.reset(token)
+    duracao = time.perf_counter() - inicio
+
+    resposta.headers.add(
+        'Server-Timing',
+        f'app;dur={duracao * 1000:.1f}, '
+        f'sql;dur={coletor.tempo * 1000:.1f};desc="{coletor.consultas} consultas, {coletor.linhas} linhas"'
+    )
+
+    rota = f"{request.method} {request.url_rule.rule if request.url_rule else '<sem rota>'}"
+    with _lock:
+        estatistica = _rotas.get(rota)
+        if estatistica is None:
+            estatistica = _rotas[rota] = {'requisicoes': 0, 'tempo_total': 0.0, 'tempo_max': 0.0,
+                                          'tempo_sql': 0.0, 'consultas': 0, 'linhas': 0}
+        estatistica['requisicoes'] += 1
+        estatistica['tempo_total'] += duracao
+        estatistica['tempo_max'] = max(estatistica['tempo_max'], duracao)
+        estatistica['tempo_sql'] += coletor.tempo
+        estatistica['consultas'] += coletor.consultas
+        estatistica['linhas'] += coletor.linhas
+    return resposta
+
+
+def _descartar_coletor(erro=None):
+    # after_request não roda quando a view lança exceção; garante que o contexto seja limpo
+    token = g.pop('_token_coletor', None)
+    if token is not None:
+        _coletor_atual.reset(token)
+
+
+def relatorio(limite=10):
+    """Retorna as rotas e consultas mais lentas acumuladas neste processo"""
+    with _lock:
+        rotas = [dict(rota=r, tempo_medio=e['tempo_total'] / e['requisicoes'],
+                      consultas_por_requisicao=e['consultas'] / e['requisicoes'], **e)
+                 for r, e in _rotas.items()]
+        consultas = [dict(sql=s, tempo_medio=e['tempo_total'] / e['execucoes'] if e['execucoes'] else 0.0, **e)
+                     for s, e in _consultas.items()]
+    rotas.sort(key=lambda r: r['tempo_total'], reverse=True)
+    consultas.sort(key=lambda c: c['tempo_total'], reverse=True)
+    return {'pid': os.getpid(), 'rotas': rotas[:limite], 'consultas': consultas[:limite]}
+
+
+def limpar():
+    """Zera o relatório agregado"""
+    with _lock:
+        _rotas.clear()
+        _consultas.clear()
+
+
+def init_app(app):
+    """Registra os ganchos de medição e a rota do relatório na aplicação"""
+    if not ATIVA:
+        return
+    app.before_request(_iniciar_requisicao)
+    app.after_request(_finalizar_requisicao)
+    app.teardown_request(_descartar_coletor)
+
+    @app.route('/admin/desempenho')
+    @requer_admin
+    def relatorio_desempenho():
+        """Relatório das rotas e consultas mais lentas deste processo"""
+        limite = request.args.get('limite', 10, type=int)
+        dados = relatorio(limite)
+        if request.args.get('limpar') == '1':
+            limpar()
+        return jsonify(dados)
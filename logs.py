@@ -0,0 +1,106 @@
+"""
+Configuração de logging da aplicação
+
+Todos os módulos usam loggers abaixo de "pedidos" (ex.: logging.getLogger('pedidos.importacao')).
+Os registros vão para uma fila em memória e uma thread (QueueListener) faz a escrita
+em stderr, então o código que loga nunca espera pela E/S do terminal/Render.
+
+Variáveis de ambiente:
+    LOG_NIVEL     DEBUG, INFO (padrão), WARNING...
+    LOG_FORMATO   json (padrão, um objeto por linha) ou texto
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+LOGGER_RAIZ = 'pedidos'
+
+# Atributos padrão do LogRecord; o resto veio de `extra=` e vira campo do JSON
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_lock = threading.Lock()
+_listener = None
+
+
+class FormatadorJSON(logging.Formatter):
+    """Formata cada registro como uma linha JSON, incluindo os campos de `extra=`"""
+
+    def format(self, record):
+        dados = {
+            'momento': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensagem': record.getMessage(),
+        }
+        for chave, valor in record.__dict__.items():
+            if chave not in _ATRIBUTOS_PADRAO and not chave.startswith('_'):
+                dados[chave] = valor
+        if record.exc_info:
+            dados['excecao'] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+def _criar_handler_saida():
+    handler = logging.StreamHandler(sys.stderr)
+    if os.environ.get('LOG_FORMATO', 'json') == 'texto':
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    else:
+        handler.setFormatter(FormatadorJSON())
+    return handler
+
+
+def _iniciar_listener(fila):
+    global _listener
+    _listener = logging.handlers.QueueListener(fila, _criar_handler_saida(), respect_handler_level=False)
+    _listener.start()
+
+
+def configurar_logging():
+    """Liga o logger "pedidos" a uma fila não bloqueante (chamadas repetidas não têm efeito)"""
+    with _lock:
+        logger = logging.getLogger(LOGGER_RAIZ)
+        if _listener is not None:
+            return logger
+
+        fila = queue.SimpleQueue()
+        logger.addHandler(logging.handlers.QueueHandler(fila))
+        logger.setLevel(os.environ.get('LOG_NIVEL', 'INFO').upper())
+        logger.propagate = False
+        _iniciar_listener(fila)
+        atexit.register(encerrar_logging)
+
+        # Após o fork (gunicorn com preload) a thread do listener não existe no filho
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=lambda: _iniciar_listener(fila))
+        return logger
+
+
+def encerrar_logging():
+    """Esvazia a fila e para a thread de escrita"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+class Amostrador:
+    """Decide quais itens de um laço merecem log de depuração
+
+    Loga os `primeiros` itens e depois um a cada `intervalo`, e só se o nível DEBUG
+    estiver ativo — consultado uma vez, fora do laço.
+    """
+
+    def __init__(self, logger, primeiros=5, intervalo=1000):
+        self.ativo = logger.isEnabledFor(logging.DEBUG)
+        self.primeiros = primeiros
+        self.intervalo = intervalo
+
+    def __call__(self, indice):
+        return self.ativo and (indice < self.primeiros or indice % self.intervalo == 0)
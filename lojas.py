@@ -0,0 +1,274 @@
+"""
+Várias lojas da Nuvemshop, cada uma com o seu banco SQLite
+
+Com LOJAS=centro,norte,outlet cada loja tem o próprio arquivo em LOJAS_DIR
+(lojas/centro.db, ...): a importação de uma loja não trava as outras e cada banco
+cresce sozinho. A loja da requisição é descoberta, nesta ordem, por:
+
+    cabeçalho    X-Loja: centro
+    caminho      /loja/centro/todos_pedidos   (os links gerados levam o prefixo)
+    subdomínio   centro.pedidos.exemplo.com
+
+Loja fora da lista responde 404; requisição sem loja usa o banco padrão
+(DATABASE), o que mantém /health, /metrics e instalações de uma loja só como antes.
+O esquema de cada banco é criado na primeira conexão do processo.
+
+Cada worker guarda as conexões abertas das lojas mais usadas num LRU limitado
+(LOJAS_MAX_ABERTAS lojas, LOJAS_CONEXOES_POR_LOJA conexões livres em cada): close()
+devolve a conexão ao cache e a loja menos usada tem as conexões fechadas quando
+outra precisa de lugar.
+
+Manutenção, arquivamento, API JSON e dashboard ao vivo agem sobre a loja da
+requisição, e os backups de cada loja ficam em BACKUP_DIR/<loja>. Sincronização
+com a API, gravador de webhooks e acompanhamento de entrega rodam em threads do
+processo com uma credencial da Nuvemshop só, e continuam no banco padrão.
+
+GET /admin/lojas consulta todas as lojas em paralelo e devolve o resumo de cada
+uma e o total; o mesmo relatório sai em linha de comando:
+
+    python lojas.py --relatorio
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+
+from flask import g, jsonify, request
+from werkzeug.exceptions import NotFound
+
+import instrumentacao
+import repositorio
+from admin import requer_admin
+
+logger = logging.getLogger('pedidos.lojas')
+
+FORMATO = re.compile(r'^[a-z0-9][a-z0-9-]{0,39}$')
+LOJAS = [loja for loja in (p.strip().lower() for p in os.environ.get('LOJAS', '').split(',')) if FORMATO.match(loja)]
+DIRETORIO = os.environ.get('LOJAS_DIR', 'lojas')
+MAX_ABERTAS = int(os.environ.get('LOJAS_MAX_ABERTAS', '16'))
+CONEXOES_POR_LOJA = int(os.environ.get('LOJAS_CONEXOES_POR_LOJA', '4'))
+PARALELO = int(os.environ.get('LOJAS_PARALELO', '8'))
+ATIVO = bool(LOJAS)
+
+PREFIXO = '/loja'
+CABECALHO = 'HTTP_X_LOJA'
+CHAVE_ENVIRON = 'pedidos.loja'
+
+_loja_atual = ContextVar('loja', default=None)
+
+
+def atual():
+    """Loja da requisição (ou da thread disparada por ela); None = banco padrão"""
+    return _loja_atual.get()
+
+
+def caminho(loja):
+    return os.path.join(DIRETORIO, f'{loja}.db')
+
+
+class _Devolvivel:
+    """close() devolve a conexão ao cache da loja em vez de fechar"""
+
+    def close(self):
+        _cache.devolver(self)
+
+    def fechar(self):
+        super().close()
+
+
+class ConexaoLoja(_Devolvivel, sqlite3.Connection):
+    pass
+
+
+class ConexaoLojaInstrumentada(_Devolvivel, instrumentacao.ConexaoInstrumentada):
+    pass
+
+
+class CacheConexoes:
+    """Conexões livres por loja num LRU limitado (um por processo)"""
+
+    def __init__(self, maximo_lojas=MAX_ABERTAS, por_loja=CONEXOES_POR_LOJA):
+        self.maximo_lojas = maximo_lojas
+        self.por_loja = por_loja
+        self._lojas = OrderedDict()
+        self._lock = threading.Lock()
+        self._esquema = set()
+        self.contadores = {'abertas': 0, 'reaproveitadas': 0, 'despejadas': 0}
+
+    def obter(self, loja, criar_esquema):
+        despejadas = []
+        with self._lock:
+            livres = self._lojas.get(loja)
+            if livres is None:
+                livres = self._lojas[loja] = []
+                while len(self._lojas) > self.maximo_lojas:
+                    _, antigas = self._lojas.popitem(last=False)
+                    despejadas.extend(antigas)
+            self._lojas.move_to_end(loja)
+            conn = livres.pop() if livres else None
+            self.contadores['despejadas'] += len(despejadas)
+            self.contadores['reaproveitadas' if conn else 'abertas'] += 1
+            precisa_esquema = loja not in self._esquema
+        for antiga in despejadas:
+            antiga.fechar()
+        if conn is not None:
+            return conn
+
+        if precisa_esquema:
+            os.makedirs(DIRETORIO, exist_ok=True)
+            criar_esquema(caminho(loja))
+            with self._lock:
+                self._esquema.add(loja)
+        conn = instrumentacao.conectar(
+            caminho(loja), check_same_thread=False,
+            factory=ConexaoLojaInstrumentada if instrumentacao.ATIVA else ConexaoLoja)
+        conn.loja = loja
+        return conn
+
+    def devolver(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            livres = self._lojas.get(conn.loja)
+            if livres is not None and len(livres) < self.por_loja:
+                livres.append(conn)
+                return
+        conn.fechar()
+
+    def estado(self):
+        with self._lock:
+            return {'lojas_abertas': list(self._lojas), 'conexoes_livres': sum(map(len, self._lojas.values())),
+                    **self.contadores}
+
+
+_cache = CacheConexoes()
+_config = {}
+
+
+def conectar(loja):
+    """Conexão com o banco da loja (close() devolve ao cache)"""
+    conn = _cache.obter(loja, _config['criar_esquema'])
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+class Roteador:
+    """Middleware WSGI que identifica a loja da requisição"""
+
+    def __init__(self, wsgi_app, lojas):
+        self.wsgi_app = wsgi_app
+        self.lojas = set(lojas)
+
+    def __call__(self, environ, start_response):
+        loja = None
+        caminho_pedido = environ.get('PATH_INFO', '')
+        if environ.get(CABECALHO):
+            loja = environ[CABECALHO].strip().lower()
+        elif caminho_pedido.startswith(PREFIXO + '/'):
+            loja, _, resto = caminho_pedido[len(PREFIXO) + 1:].partition('/')
+            # O prefixo vira parte do SCRIPT_NAME: url_for gera os links da mesma loja
+            environ['SCRIPT_NAME'] = f"{environ.get('SCRIPT_NAME', '')}{PREFIXO}/{loja}"
+            environ['PATH_INFO'] = '/' + resto
+        else:
+            host = environ.get('HTTP_HOST', '').split(':')[0]
+            if host.count('.') >= 2 and host.split('.')[0] in self.lojas:
+                loja = host.split('.')[0]
+
+        if loja is not None and loja not in self.lojas:
+            return NotFound(f'Loja desconhecida: {loja}')(environ, start_response)
+        environ[CHAVE_ENVIRON] = loja
+        return self.wsgi_app(environ, start_response)
+
+
+def _iniciar_requisicao():
+    g.loja = request.environ.get(CHAVE_ENVIRON)
+    g._token_loja = _loja_atual.set(g.loja)
+
+
+def _encerrar_requisicao(erro=None):
+    token = g.pop('_token_loja', None)
+    if token is not None:
+        _loja_atual.reset(token)
+
+
+def _resumo_loja(loja):
+    inicio = time.perf_counter()
+    try:
+        repo = repositorio.RepositorioSQLite(lambda: conectar(loja), _config['criar_esquema'])
+        resumo = dict(repo.resumo_dashboard(), **repo.estatisticas_pedidos())
+        resumo['bytes'] = os.path.getsize(caminho(loja))
+    except Exception as e:
+        logger.exception('Erro ao consultar a loja %s', loja)
+        return {'erro': str(e)}
+    resumo['tempo'] = round(time.perf_counter() - inicio, 3)
+    return resumo
+
+
+def relatorio(lojas=None, paralelo=None):
+    """Resumo de cada loja e o total, consultando os bancos em paralelo"""
+    lojas = list(LOJAS if lojas is None else lojas)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(paralelo or PARALELO, len(lojas) or 1)),
+                            thread_name_prefix='relatorio-lojas') as executor:
+        resultados = dict(zip(lojas, executor.map(_resumo_loja, lojas)))
+
+    total = {}
+    for resumo in resultados.values():
+        if 'erro' in resumo:
+            continue
+        for chave, valor in resumo.items():
+            if chave != 'tempo':
+                total[chave] = total.get(chave, 0) + valor
+    return {'lojas': resultados, 'total': total, 'com_erro': sorted(l for l, r in resultados.items() if 'erro' in r),
+            'tempo': round(time.perf_counter() - inicio, 3)}
+
+
+def init_app(app, criar_esquema):
+    """Liga o roteamento por loja e registra /admin/lojas
+
+    `criar_esquema(caminho)` cria as tabelas num banco novo (o init_db do app).
+    """
+    _config['criar_esquema'] = criar_esquema
+    if not ATIVO:
+        return
+    app.wsgi_app = Roteador(app.wsgi_app, LOJAS)
+    app.before_request(_iniciar_requisicao)
+    app.teardown_request(_encerrar_requisicao)
+
+    @app.route('/admin/lojas')
+    @requer_admin
+    def lojas_admin():
+        """Resumo de todas as lojas (consultadas em paralelo) e o cache de conexões deste worker"""
+        resultado = relatorio()
+        resultado['conexoes'] = _cache.estado()
+        return jsonify(resultado)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Relatório consolidado das lojas')
+    parser.add_argument('--relatorio', action='store_true', required=True)
+    parser.add_argument('--lojas', default=','.join(LOJAS), help='Lojas separadas por vírgula (padrão: LOJAS)')
+    parser.add_argument('--paralelo', type=int, default=PARALELO, help='Lojas consultadas ao mesmo tempo')
+    args = parser.parse_args()
+
+    lojas = [l.strip() for l in args.lojas.split(',') if FORMATO.match(l.strip())]
+    if not lojas:
+        parser.error('nenhuma loja informada (--lojas ou LOJAS)')
+    # Fora do app só lê: loja sem arquivo ainda não recebeu nenhuma requisição
+    ausentes = [l for l in lojas if not os.path.exists(caminho(l))]
+    _config['criar_esquema'] = lambda caminho_banco: None
+    resultado = relatorio([l for l in lojas if l not in ausentes], args.paralelo)
+    resultado['sem_banco'] = ausentes
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""
+Manutenção do banco: limpeza rápida, vacuum incremental e estatísticas do planejador
+
+Limpeza     o conteúdo do banco é trocado de uma vez por um banco recém-criado pelo
+            init_db (API de backup do SQLite: atômica para as outras conexões e
+            segura com elas abertas, o que um os.replace do arquivo não é). Os
+            contadores de versão, a marca d'água da sincronização e a sequência do
+            log de alterações passam para o banco novo, para que ETags, chaves do
+            cache de fragmentos e ids do /eventos não se repitam; os dashboards
+            abertos recebem "recarregar".
+Rotina      PRAGMA incremental_vacuum devolve ao sistema as páginas livres e
+            ANALYZE / PRAGMA optimize atualiza as estatísticas usadas pelo
+            planejador. Roda depois de importações e exclusões grandes (quando o
+            contador de alterações andou MANUTENCAO_LIMIAR desde a última vez), pelo
+            comando abaixo (cron) ou por POST /admin/manutencao.
+
+    python manutencao.py --banco pedidos.db --analisar
+    python manutencao.py --banco pedidos.db --continuo 3600
+
+Bancos criados antes do auto_vacuum incremental precisam de um VACUUM completo uma
+vez (--vacuum ou ?vacuum=1), que reescreve o arquivo inteiro.
+"""
+
+import argparse
+import contextvars
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from flask import jsonify, request
+
+import sincronizacao
+from admin import requer_admin
+
+logger = logging.getLogger('pedidos.manutencao')
+
+# Alterações (contador de versao_dados) que justificam uma manutenção automática
+LIMIAR = int(os.environ.get('MANUTENCAO_LIMIAR', '5000'))
+# Linhas amostradas por índice no ANALYZE: mantém o custo baixo em tabelas grandes
+LIMITE_ANALISE = 1000
+
+CHAVE_VERSAO = 'manutencao_versao'
+CHAVE_ULTIMA = 'manutencao_ultima'
+AUTO_VACUUM = {0: 'nenhum', 1: 'completo', 2: 'incremental'}
+
+
+def tamanho(conn):
+    """Páginas ocupadas e livres do banco, em bytes"""
+    pagina = conn.execute('PRAGMA page_size').fetchone()[0]
+    return {'bytes': conn.execute('PRAGMA page_count').fetchone()[0] * pagina,
+            'livres': conn.execute('PRAGMA freelist_count').fetchone()[0] * pagina}
+
+
+def _versao(conn):
+    return conn.execute('SELECT versao FROM versao_dados WHERE id = 1').fetchone()[0]
+
+
+def executar(conn, analisar=False, vacuum=False):
+    """Recupera o espaço livre e atualiza as estatísticas; retorna o resumo"""
+    inicio = time.perf_counter()
+    antes = tamanho(conn)
+    modo = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+    resumo = {'auto_vacuum': AUTO_VACUUM.get(modo, modo), 'vacuum_completo': False}
+
+    if vacuum and modo != 2:
+        # Converte para incremental; só um VACUUM completo muda o modo de um banco existente
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        resumo['auto_vacuum'] = AUTO_VACUUM[2]
+        resumo['vacuum_completo'] = True
+    elif modo == 2:
+        # executescript vai até o fim do comando; execute liberaria uma única página
+        conn.executescript('PRAGMA incremental_vacuum')
+    marca = time.perf_counter()
+    resumo['tempo_vacuum'] = round(marca - inicio, 3)
+
+    conn.execute(f'PRAGMA analysis_limit = {LIMITE_ANALISE}')
+    conn.execute('ANALYZE' if analisar else 'PRAGMA optimize')
+    conn.commit()
+    resumo['analisado'] = analisar
+    resumo['tempo_analise'] = round(time.perf_counter() - marca, 3)
+
+    depois = tamanho(conn)
+    resumo.update({'bytes_antes': antes['bytes'], 'bytes_depois': depois['bytes'],
+                   'bytes_recuperados': antes['bytes'] - depois['bytes'], 'bytes_livres': depois['livres'],
+                   'tempo': round(time.perf_counter() - inicio, 3)})
+    sincronizacao.gravar_estado(conn, CHAVE_VERSAO, str(_versao(conn)))
+    sincronizacao.gravar_estado(conn, CHAVE_ULTIMA, json.dumps(resumo))
+    conn.commit()
+    logger.info('Manutenção: %d bytes recuperados em %.2fs', resumo['bytes_recuperados'], resumo['tempo'],
+                extra={'evento': 'manutencao', 'resumo': resumo})
+    return resumo
+
+
+def precisa(conn):
+    """True quando houve alterações suficientes desde a última manutenção"""
+    marca = sincronizacao.ler_estado(conn, CHAVE_VERSAO)
+    return _versao(conn) - int(marca or 0) >= LIMIAR
+
+
+def resetar(conn, criar_esquema):
+    """Troca todo o conteúdo do banco por um banco novo; retorna o resumo
+
+    `criar_esquema(caminho)` cria as tabelas num arquivo vazio (o init_db do app).
+    """
+    inicio = time.perf_counter()
+    antes = tamanho(conn)
+    caminho = conn.execute('PRAGMA database_list').fetchone()[2]
+    descritor, temporario = tempfile.mkstemp(suffix='.db', dir=os.path.dirname(os.path.abspath(caminho)))
+    os.close(descritor)
+    try:
+        criar_esquema(temporario)
+        novo = sqlite3.connect(temporario)
+        try:
+            # Contadores seguem adiante: nada do banco antigo pode ser confundido com o novo.
+            # Os ids de grupo recomeçam do 1 e criar um grupo não muda a versão dele, então
+            # cada versão avança um passo: o grupo novo não herda o cartão em cache do antigo
+            novo.execute('UPDATE versao_dados SET versao = ? WHERE id = 1', (_versao(conn) + 1,))
+            novo.executemany('INSERT INTO versao_grupos (grupo_id, versao) VALUES (?, ?)',
+                             conn.execute('SELECT grupo_id, versao + 1 FROM versao_grupos'))
+            novo.executemany('INSERT INTO sincronizacao_estado (chave, valor, atualizado_em) VALUES (?, ?, ?)',
+                             conn.execute('SELECT chave, valor, atualizado_em FROM sincronizacao_estado'))
+            # O salto de um id no log faz os dashboards abertos recarregarem (ver eventos.py)
+            ultimo = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'log_alteracoes'").fetchone()
+            novo.execute("INSERT INTO log_alteracoes (id, entidade, operacao, chave) VALUES (?, 'banco', 'reset', '')",
+                         ((ultimo[0] if ultimo else 0) + 2,))
+            novo.commit()
+            novo.backup(conn)
+        finally:
+            novo.close()
+    finally:
+        os.remove(temporario)
+
+    depois = tamanho(conn)
+    resumo = {'bytes_antes': antes['bytes'], 'bytes_depois': depois['bytes'],
+              'bytes_recuperados': antes['bytes'] - depois['bytes'], 'tempo': round(time.perf_counter() - inicio, 3)}
+    sincronizacao.gravar_estado(conn, CHAVE_VERSAO, str(_versao(conn)))
+    conn.commit()
+    logger.info('Banco limpo: %d bytes recuperados em %.2fs', resumo['bytes_recuperados'], resumo['tempo'],
+                extra={'evento': 'manutencao_reset', 'resumo': resumo})
+    return resumo
+
+
+# Uma manutenção por vez em cada processo
+_em_andamento = threading.Lock()
+
+
+def agendar(obter_conexao):
+    """Dispara a manutenção numa thread se o limiar de alterações foi atingido"""
+    conn = obter_conexao()
+    try:
+        if not precisa(conn):
+            return False
+    finally:
+        conn.close()
+    if not _em_andamento.acquire(blocking=False):
+        return False
+
+    def rodar():
+        conn = obter_conexao()
+        try:
+            executar(conn, analisar=True)
+        except Exception:
+            logger.exception('Erro na manutenção do banco')
+        finally:
+            conn.close()
+            _em_andamento.release()
+
+    # Contexto copiado: a thread abre a conexão da mesma loja da requisição (ver lojas.py)
+    threading.Thread(target=contextvars.copy_context().run, args=(rodar,), name='manutencao', daemon=True).start()
+    return True
+
+
+def init_app(app, obter_conexao):
+    """Registra /admin/manutencao (GET mostra o estado, POST executa)"""
+
+    @app.route('/admin/manutencao', methods=['GET', 'POST'])
+    @requer_admin
+    def manutencao_admin():
+        """Tamanho do banco e última manutenção; POST executa agora (?analisar=1, ?vacuum=1)"""
+        conn = obter_conexao()
+        try:
+            if request.method == 'POST':
+                if not _em_andamento.acquire(blocking=False):
+                    return jsonify({'erro': 'Manutenção já em andamento'}), 409
+                try:
+                    return jsonify(executar(conn, analisar=request.args.get('analisar') == '1',
+                                            vacuum=request.args.get('vacuum') == '1'))
+                finally:
+                    _em_andamento.release()
+
+            ultima = sincronizacao.ler_estado(conn, CHAVE_ULTIMA)
+            marca = sincronizacao.ler_estado(conn, CHAVE_VERSAO)
+            modo = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+            return jsonify(dict(tamanho(conn), auto_vacuum=AUTO_VACUUM.get(modo, modo),
+                                alteracoes_pendentes=_versao(conn) - int(marca or 0), limiar=LIMIAR,
+                                em_andamento=_em_andamento.locked(),
+                                ultima=json.loads(ultima) if ultima else None))
+        finally:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vacuum incremental e estatísticas do banco')
+    parser.add_argument('--banco', default='pedidos.db', help='Banco do app (já inicializado)')
+    parser.add_argument('--analisar', action='store_true', help='ANALYZE completo em vez de PRAGMA optimize')
+    parser.add_argument('--vacuum', action='store_true', help='VACUUM completo, convertendo para incremental')
+    parser.add_argument('--continuo', type=int, metavar='SEGUNDOS',
+                        help='Repete a cada SEGUNDOS em vez de rodar uma vez')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    conn = sqlite3.connect(args.banco, timeout=30)
+    sincronizacao.criar_estado(conn.cursor())
+    try:
+        while True:
+            print(json.dumps(executar(conn, args.analisar, args.vacuum), ensure_ascii=False))
+            if not args.continuo:
+                break
+            time.sleep(args.continuo)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
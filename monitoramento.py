@@ -0,0 +1,441 @@
+"""
+Monitoramento: endpoint /metrics no formato Prometheus e health checks
+
+Cada processo (worker do gunicorn) acumula seus contadores e histogramas em
+memória e os grava periodicamente em METRICAS_DIR/<pid>.json. O /metrics soma os
+arquivos de todos os workers do mesmo processo mestre, então qualquer worker que
+atender a coleta devolve o total correto. Os valores que dependem do banco
+(tamanho do arquivo e do WAL, pedidos sem grupo) são lidos no momento da coleta.
+
+Quando um worker termina (reciclado pelo max_requests, por exemplo), o mestre
+soma os contadores dele em METRICAS_DIR/acumulado-<mestre>.json e apaga o arquivo
+do pid (hook child_exit em gunicorn.conf.py): o diretório não cresce e um pid
+reaproveitado não sobrescreve contadores de outro processo. A coleta faz o mesmo
+com arquivos de workers mortos que sobraram e apaga os de mestres que já não
+existem (deploys anteriores).
+
+Rotas:
+    /health        liveness simples (mantido para o Render)
+    /health/live   liveness
+    /health/ready  readiness com uma consulta real ao banco
+    /metrics       métricas em texto no formato de exposição do Prometheus
+"""
+
+import atexit
+import contextlib
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from flask import Response, g, jsonify, request
+
+import cache_fragmentos
+import instrumentacao
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+METRICAS_DIR = os.environ.get('METRICAS_DIR', os.path.join(tempfile.gettempdir(), 'pedidos_metricas'))
+
+# Intervalo mínimo entre gravações do arquivo deste processo
+INTERVALO_PERSISTENCIA = 1.0
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_ultima_persistencia = 0.0
+# (pid, marca) deste processo; refeito depois de um fork
+_identidade = None
+_estado = {
+    'requisicoes': {},      # "metodo|rota|status" -> total
+    'histogramas': {},      # "metodo|rota" -> {'buckets': [...], 'soma': s, 'contagem': n}
+    'em_andamento': 0,
+    'importacao': {'jobs': 0, 'linhas': 0, 'segundos': 0.0, 'erros': 0},
+}
+
+
+def _chave_rota():
+    rota = request.url_rule.rule if request.url_rule else '<sem rota>'
+    return f"{request.method}|{rota}"
+
+
+def _iniciar_requisicao():
+    g._inicio_metricas = time.perf_counter()
+    with _lock:
+        _estado['em_andamento'] += 1
+
+
+def _finalizar_requisicao(resposta):
+    inicio = g.pop('_inicio_metricas', None)
+    if inicio is None:
+        return resposta
+    duracao = time.perf_counter() - inicio
+    chave = _chave_rota()
+
+    with _lock:
+        _estado['em_andamento'] -= 1
+        contador = f"{chave}|{resposta.status_code}"
+        _estado['requisicoes'][contador] = _estado['requisicoes'].get(contador, 0) + 1
+
+        histograma = _estado['histogramas'].get(chave)
+        if histograma is None:
+            histograma = _estado['histogramas'][chave] = {
+                'buckets': [0] * len(BUCKETS_LATENCIA), 'soma': 0.0, 'contagem': 0}
+        for i, limite in enumerate(BUCKETS_LATENCIA):
+            if duracao <= limite:
+                histograma['buckets'][i] += 1
+        histograma['soma'] += duracao
+        histograma['contagem'] += 1
+
+    _persistir()
+    return resposta
+
+
+def _descartar_requisicao(erro=None):
+    # Quando a view lança exceção sem resposta o contador de requisições em andamento ainda precisa cair
+    if g.pop('_inicio_metricas', None) is not None:
+        with _lock:
+            _estado['em_andamento'] -= 1
+
+
+def registrar_importacao(linhas, segundos, erros=0):
+    """Contabiliza um job de importação concluído (usado para a vazão em linhas/s)"""
+    with _lock:
+        importacao = _estado['importacao']
+        importacao['jobs'] += 1
+        importacao['linhas'] += linhas
+        importacao['segundos'] += segundos
+        importacao['erros'] += erros
+    _persistir(forcar=True)
+
+
+def _marca_processo():
+    global _identidade
+    if _identidade is None or _identidade[0] != os.getpid():
+        _identidade = (os.getpid(), uuid.uuid4().hex)
+    return _identidade[1]
+
+
+@contextlib.contextmanager
+def _travado():
+    """Exclusão entre processos para ler e reescrever os arquivos de métricas"""
+    os.makedirs(METRICAS_DIR, exist_ok=True)
+    if not FCNTL_AVAILABLE:
+        yield
+        return
+    with open(os.path.join(METRICAS_DIR, '.trava'), 'a') as trava:
+        fcntl.flock(trava, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(trava, fcntl.LOCK_UN)
+
+
+def _ler_json(caminho):
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _gravar_json(caminho, dados):
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(dados))
+    os.replace(temporario, caminho)
+
+
+def _caminho_acumulado(mestre):
+    return os.path.join(METRICAS_DIR, f'acumulado-{mestre}.json')
+
+
+def _vazio():
+    return {'requisicoes': {}, 'histogramas': {},
+            'importacao': {'jobs': 0, 'linhas': 0, 'segundos': 0.0, 'erros': 0},
+            'sqlite': {'bloqueios': 0, 'commits': 0, 'tempo_commit': 0.0},
+            'fragmentos': {'acertos_memoria': 0, 'acertos_disco': 0, 'falhas': 0}}
+
+
+def _somar(total, dados):
+    """Acrescenta a `total` os contadores (só os que nunca diminuem) de `dados`"""
+    for chave, valor in dados.get('requisicoes', {}).items():
+        total['requisicoes'][chave] = total['requisicoes'].get(chave, 0) + valor
+    for chave, h in dados.get('histogramas', {}).items():
+        soma = total['histogramas'].setdefault(chave, {'buckets': [0] * len(BUCKETS_LATENCIA), 'soma': 0.0,
+                                                       'contagem': 0})
+        soma['buckets'] = [a + b for a, b in zip(soma['buckets'], h['buckets'])]
+        soma['soma'] += h['soma']
+        soma['contagem'] += h['contagem']
+    for grupo in ('importacao', 'sqlite', 'fragmentos'):
+        for chave in total[grupo]:
+            total[grupo][chave] += dados.get(grupo, {}).get(chave, 0)
+    return total
+
+
+def _recolher(caminho, dados):
+    """Soma `dados` (arquivo de um processo que terminou) no acumulado do mestre e apaga o arquivo"""
+    acumulado_caminho = _caminho_acumulado(dados['mestre'])
+    acumulado = _ler_json(acumulado_caminho) or dict(_vazio(), mestre=dados['mestre'])
+    _gravar_json(acumulado_caminho, _somar(acumulado, dados))
+    os.remove(caminho)
+
+
+def recolher_worker(pid):
+    """Leva os contadores de um worker que terminou para o acumulado (hook child_exit do gunicorn)"""
+    caminho = os.path.join(METRICAS_DIR, f'{pid}.json')
+    try:
+        with _travado():
+            dados = _ler_json(caminho)
+            if dados is not None and not _processo_vivo(pid):
+                _recolher(caminho, dados)
+    except OSError:
+        pass
+
+
+def _persistir(forcar=False):
+    """Grava o estado deste processo em disco (no máximo uma vez por intervalo)"""
+    global _ultima_persistencia
+    agora = time.monotonic()
+    if not forcar and agora - _ultima_persistencia < INTERVALO_PERSISTENCIA:
+        return
+    _ultima_persistencia = agora
+
+    with _lock:
+        dados = {
+            'pid': os.getpid(),
+            'mestre': os.getppid(),
+            'marca': _marca_processo(),
+            'sqlite': dict(instrumentacao.contadores_sqlite),
+            'fragmentos': dict(cache_fragmentos.contadores),
+            **_estado,
+        }
+    try:
+        caminho = os.path.join(METRICAS_DIR, f'{os.getpid()}.json')
+        with _travado():
+            # Arquivo deixado por outro processo com o mesmo pid: soma antes de ocupar o lugar
+            anterior = _ler_json(caminho)
+            if anterior is not None and anterior.get('marca') != dados['marca'] and 'mestre' in anterior:
+                _recolher(caminho, anterior)
+            _gravar_json(caminho, dados)
+    except OSError:
+        # Métricas nunca devem derrubar uma requisição
+        pass
+
+
+def _processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _ler_processos():
+    """Carrega os arquivos dos workers vivos e o acumulado dos que terminaram (mesmo mestre)
+
+    Arquivos de workers mortos são somados ao acumulado; os de mestres que não
+    existem mais são apagados.
+    """
+    _persistir(forcar=True)
+    mestre = os.getppid()
+    processos = []
+    try:
+        with _travado():
+            for caminho in glob.glob(os.path.join(METRICAS_DIR, '*.json')):
+                dados = _ler_json(caminho)
+                if dados is None or 'mestre' not in dados:
+                    continue
+                if dados['mestre'] != mestre:
+                    if not _processo_vivo(dados['mestre']):
+                        os.remove(caminho)
+                elif 'pid' in dados:
+                    if _processo_vivo(dados['pid']):
+                        processos.append(dados)
+                    else:
+                        _recolher(caminho, dados)
+            # Lido por último: já inclui os workers recolhidos acima
+            acumulado = _ler_json(_caminho_acumulado(mestre))
+            if acumulado is not None:
+                processos.append(acumulado)
+    except OSError:
+        pass
+    return processos
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _linha(nome, rotulos, valor):
+    if rotulos:
+        texto = ','.join(f'{k}="{_escapar(v)}"' for k, v in rotulos.items())
+        return f'{nome}{{{texto}}} {valor}'
+    return f'{nome} {valor}'
+
+
+def gerar_metricas(obter_conexao, caminho_banco):
+    """Monta o texto de exposição somando todos os workers"""
+    processos = _ler_processos()
+
+    total = _vazio()
+    em_andamento = 0
+    workers = 0
+    for dados in processos:
+        _somar(total, dados)
+        # Requisições em andamento só fazem sentido para workers ainda vivos
+        if 'pid' in dados and _processo_vivo(dados['pid']):
+            em_andamento += dados['em_andamento']
+            workers += 1
+    requisicoes, histogramas = total['requisicoes'], total['histogramas']
+    importacao, sqlite, fragmentos = total['importacao'], total['sqlite'], total['fragmentos']
+
+    linhas = [
+        '# HELP pedidos_http_requisicoes_total Requisições HTTP atendidas',
+        '# TYPE pedidos_http_requisicoes_total counter',
+    ]
+    for chave, total in sorted(requisicoes.items()):
+        metodo, rota, status = chave.split('|')
+        linhas.append(_linha('pedidos_http_requisicoes_total',
+                             {'metodo': metodo, 'rota': rota, 'status': status}, total))
+
+    linhas += [
+        '# HELP pedidos_http_duracao_segundos Latência das requisições por rota',
+        '# TYPE pedidos_http_duracao_segundos histogram',
+    ]
+    for chave, h in sorted(histogramas.items()):
+        metodo, rota = chave.split('|')
+        rotulos = {'metodo': metodo, 'rota': rota}
+        for limite, total in zip(BUCKETS_LATENCIA, h['buckets']):
+            linhas.append(_linha('pedidos_http_duracao_segundos_bucket', {**rotulos, 'le': limite}, total))
+        linhas.append(_linha('pedidos_http_duracao_segundos_bucket', {**rotulos, 'le': '+Inf'}, h['contagem']))
+        linhas.append(_linha('pedidos_http_duracao_segundos_sum', rotulos, f"{h['soma']:.6f}"))
+        linhas.append(_linha('pedidos_http_duracao_segundos_count', rotulos, h['contagem']))
+
+    vazao = importacao['linhas'] / importacao['segundos'] if importacao['segundos'] else 0.0
+    linhas += [
+        '# HELP pedidos_http_requisicoes_em_andamento Requisições sendo atendidas agora (fila dos workers)',
+        '# TYPE pedidos_http_requisicoes_em_andamento gauge',
+        _linha('pedidos_http_requisicoes_em_andamento', None, em_andamento),
+        '# HELP pedidos_workers_ativos Workers com métricas registradas e processo vivo',
+        '# TYPE pedidos_workers_ativos gauge',
+        _linha('pedidos_workers_ativos', None, workers),
+        '# HELP pedidos_importacao_jobs_total Importações de CSV concluídas',
+        '# TYPE pedidos_importacao_jobs_total counter',
+        _linha('pedidos_importacao_jobs_total', None, importacao['jobs']),
+        '# HELP pedidos_importacao_linhas_total Linhas de CSV processadas',
+        '# TYPE pedidos_importacao_linhas_total counter',
+        _linha('pedidos_importacao_linhas_total', None, importacao['linhas']),
+        '# HELP pedidos_importacao_segundos_total Tempo total gasto em importações',
+        '# TYPE pedidos_importacao_segundos_total counter',
+        _linha('pedidos_importacao_segundos_total', None, f"{importacao['segundos']:.6f}"),
+        '# HELP pedidos_importacao_erros_total Linhas com erro durante importações',
+        '# TYPE pedidos_importacao_erros_total counter',
+        _linha('pedidos_importacao_erros_total', None, importacao['erros']),
+        '# HELP pedidos_importacao_linhas_por_segundo Vazão média das importações',
+        '# TYPE pedidos_importacao_linhas_por_segundo gauge',
+        _linha('pedidos_importacao_linhas_por_segundo', None, f'{vazao:.2f}'),
+        '# HELP pedidos_sqlite_bloqueios_total Erros "database is locked/busy"',
+        '# TYPE pedidos_sqlite_bloqueios_total counter',
+        _linha('pedidos_sqlite_bloqueios_total', None, sqlite['bloqueios']),
+        '# HELP pedidos_sqlite_commits_total Commits executados',
+        '# TYPE pedidos_sqlite_commits_total counter',
+        _linha('pedidos_sqlite_commits_total', None, sqlite['commits']),
+        '# HELP pedidos_sqlite_espera_commit_segundos_total Tempo gasto em commits (inclui espera pelo lock)',
+        '# TYPE pedidos_sqlite_espera_commit_segundos_total counter',
+        _linha('pedidos_sqlite_espera_commit_segundos_total', None, f"{sqlite['tempo_commit']:.6f}"),
+        '# HELP pedidos_fragmentos_cache_total Consultas ao cache de fragmentos HTML por resultado',
+        '# TYPE pedidos_fragmentos_cache_total counter',
+        _linha('pedidos_fragmentos_cache_total', {'resultado': 'acerto_memoria'}, fragmentos['acertos_memoria']),
+        _linha('pedidos_fragmentos_cache_total', {'resultado': 'acerto_disco'}, fragmentos['acertos_disco']),
+        _linha('pedidos_fragmentos_cache_total', {'resultado': 'falha'}, fragmentos['falhas']),
+    ]
+
+    # Sem arquivo com o banco no PostgreSQL
+    caminho = caminho_banco()
+    if caminho:
+        linhas += [
+            '# HELP pedidos_sqlite_arquivo_bytes Tamanho do arquivo do banco e do WAL',
+            '# TYPE pedidos_sqlite_arquivo_bytes gauge',
+        ]
+        for arquivo, sufixo in (('banco', ''), ('wal', '-wal')):
+            try:
+                tamanho = os.path.getsize(caminho + sufixo)
+            except OSError:
+                tamanho = 0
+            linhas.append(_linha('pedidos_sqlite_arquivo_bytes', {'arquivo': arquivo}, tamanho))
+
+    conn = obter_conexao()
+    try:
+        sem_grupo = conn.execute('''
+            SELECT tipo_frete, COUNT(*) FROM pedidos
+            WHERE grupo_id IS NULL
+            GROUP BY tipo_frete
+        ''').fetchall()
+    finally:
+        conn.close()
+    linhas += [
+        '# HELP pedidos_sem_grupo Pedidos ainda não associados a um grupo',
+        '# TYPE pedidos_sem_grupo gauge',
+    ]
+    for tipo_frete, total in sem_grupo:
+        linhas.append(_linha('pedidos_sem_grupo', {'tipo_frete': tipo_frete}, total))
+
+    return '\n'.join(linhas) + '\n'
+
+
+def verificar_prontidao(obter_conexao):
+    """Executa uma consulta real e retorna (pronto, latência em ms, erro)"""
+    inicio = time.perf_counter()
+    try:
+        conn = obter_conexao()
+        try:
+            conn.execute('SELECT COUNT(*) FROM (SELECT 1 FROM pedidos LIMIT 1)').fetchone()
+        finally:
+            conn.close()
+    except Exception as e:
+        return False, (time.perf_counter() - inicio) * 1000, str(e)
+    return True, (time.perf_counter() - inicio) * 1000, None
+
+
+def init_app(app, obter_conexao, caminho_banco):
+    """Registra a coleta de métricas e as rotas /metrics e /health/* na aplicação
+
+    `obter_conexao` abre uma conexão com o banco e `caminho_banco` retorna o caminho
+    atual do arquivo (uma função, para acompanhar mudanças em DATABASE; None no
+    PostgreSQL).
+    """
+    app.before_request(_iniciar_requisicao)
+    app.after_request(_finalizar_requisicao)
+    app.teardown_request(_descartar_requisicao)
+    atexit.register(_persistir, True)
+
+    @app.route('/metrics')
+    def metricas():
+        """Métricas no formato de exposição do Prometheus"""
+        return Response(gerar_metricas(obter_conexao, caminho_banco),
+                        mimetype='text/plain; version=0.0.4')
+
+    @app.route('/health')
+    @app.route('/health/live')
+    def health_check():
+        """Verificação de saúde da aplicação (liveness)"""
+        return "OK", 200
+
+    @app.route('/health/ready')
+    def health_ready():
+        """Readiness: só responde 200 se o banco atender uma consulta"""
+        pronto, latencia, erro = verificar_prontidao(obter_conexao)
+        corpo = {'status': 'ok' if pronto else 'indisponivel', 'latencia_ms': round(latencia, 2)}
+        if erro:
+            corpo['erro'] = erro
+        return jsonify(corpo), 200 if pronto else 503
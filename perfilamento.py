@@ -0,0 +1,252 @@
+"""
+Perfilamento sob demanda com cProfile e tracemalloc
+
+Permite rodar uma única requisição (ou um job, como uma importação) sob cProfile
+e/ou tracemalloc em produção, sem redeploy. Cada execução gera, em PERFIS_DIR:
+
+    <data>_<nome>.prof   estatísticas do cProfile (abrir com pstats ou snakeviz)
+    <data>_<nome>.json   resumo: duração, funções mais caras e maiores alocações
+
+Formas de disparar (sempre exigem acesso admin, ver admin.py):
+    - qualquer rota com ?perfil=cpu, ?perfil=memoria ou ?perfil=ambos
+    - armar um endpoint em /admin/perfis: a próxima requisição para ele, em qualquer
+      worker, é perfilada (útil para o POST de /importar_csv feito pelo formulário)
+    - PERFILAR_IMPORTACOES=1: toda importação (direta, prévia e confirmação) é
+      perfilada com perfilar(), sem precisar armar nada
+    - no código: `with perfilamento.perfilar('importacao'): ...`
+
+O cProfile mede só a thread que iniciou o perfil. O tracemalloc, ao contrário, é
+do processo inteiro: com workers gthread, as alocações e o pico de memória do
+resumo incluem o que as outras threads do worker fizeram no mesmo intervalo. Para
+um retrato limpo da memória, perfile com o worker sem outras requisições (ou com
+GUNICORN_THREADS=1).
+
+PERFILAMENTO=0 desliga o recurso.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import (abort, flash, g, has_request_context, redirect, render_template, request, send_from_directory,
+                   url_for)
+
+from admin import acesso_admin, requer_admin
+
+ATIVO = os.environ.get('PERFILAMENTO', '1') != '0'
+PERFIS_DIR = os.path.abspath(os.environ.get('PERFIS_DIR', 'perfis'))
+IMPORTACOES = ATIVO and os.environ.get('PERFILAR_IMPORTACOES', '0') == '1'
+
+TOP_FUNCOES = 30
+TOP_ALOCACOES = 25
+MAX_PERFIS = 100
+MODOS = {'cpu': (True, False), 'memoria': (False, True), 'ambos': (True, True)}
+
+
+class Perfilador:
+    """Liga cProfile/tracemalloc em iniciar() e grava os resultados em finalizar()
+
+    A memória medida é a do processo todo, não só a desta thread (ver o início do módulo).
+    """
+
+    def __init__(self, nome, cpu=True, memoria=True, detalhes=None):
+        self.nome = nome
+        self.cpu = cpu
+        self.memoria = memoria
+        self.detalhes = detalhes or {}
+        self._perfil = None
+        self._iniciou_tracemalloc = False
+        self._inicio = None
+
+    def iniciar(self):
+        if self.memoria and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self._iniciou_tracemalloc = True
+        if self.cpu:
+            self._perfil = cProfile.Profile()
+            self._perfil.enable()
+        self._inicio = time.perf_counter()
+        return self
+
+    def finalizar(self):
+        """Para a coleta, grava os arquivos e retorna o resumo"""
+        duracao = time.perf_counter() - self._inicio
+        if self._perfil:
+            self._perfil.disable()
+
+        resumo = {
+            'nome': self.nome,
+            'criado_em': datetime.now().isoformat(timespec='seconds'),
+            'duracao': duracao,
+            'pid': os.getpid(),
+            'detalhes': self.detalhes,
+            'funcoes': [],
+            'alocacoes': [],
+        }
+
+        if self.memoria and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            atual, pico = tracemalloc.get_traced_memory()
+            if self._iniciou_tracemalloc:
+                tracemalloc.stop()
+            resumo['memoria_pico'] = pico
+            resumo['memoria_atual'] = atual
+            for estatistica in snapshot.statistics('lineno')[:TOP_ALOCACOES]:
+                quadro = estatistica.traceback[0]
+                resumo['alocacoes'].append({
+                    'local': f'{quadro.filename}:{quadro.lineno}',
+                    'bytes': estatistica.size,
+                    'blocos': estatistica.count,
+                })
+
+        base = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{_nome_arquivo(self.nome)}"
+        os.makedirs(PERFIS_DIR, exist_ok=True)
+        if self._perfil:
+            self._perfil.dump_stats(os.path.join(PERFIS_DIR, base + '.prof'))
+            resumo['arquivo_prof'] = base + '.prof'
+            saida = io.StringIO()
+            pstats.Stats(self._perfil, stream=saida).sort_stats('cumulative').print_stats(TOP_FUNCOES)
+            resumo['funcoes'] = saida.getvalue().splitlines()
+
+        with open(os.path.join(PERFIS_DIR, base + '.json'), 'w', encoding='utf-8') as f:
+            json.dump(resumo, f, ensure_ascii=False, indent=1)
+        _rotacionar()
+        return resumo
+
+
+@contextmanager
+def perfilar(nome, cpu=True, memoria=True, detalhes=None):
+    """Executa o bloco sob perfilamento
+
+    Dentro de uma requisição que já está sendo perfilada (?perfil= ou endpoint
+    armado) não abre um segundo perfil: o bloco roda direto e recebe None.
+    """
+    if has_request_context() and g.get('_perfilador') is not None:
+        yield None
+        return
+    perfilador = Perfilador(nome, cpu, memoria, detalhes).iniciar()
+    try:
+        yield perfilador
+    finally:
+        perfilador.finalizar()
+
+
+def _nome_arquivo(nome):
+    return ''.join(c if c.isalnum() or c in '-_' else '_' for c in nome)[:60]
+
+
+def _rotacionar():
+    """Mantém apenas os MAX_PERFIS resumos mais recentes (e seus .prof)"""
+    resumos = sorted(f for f in os.listdir(PERFIS_DIR) if f.endswith('.json') and not f.startswith('armado_'))
+    for antigo in resumos[:-MAX_PERFIS]:
+        for extensao in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(PERFIS_DIR, antigo[:-5] + extensao))
+            except OSError:
+                pass
+
+
+def listar_perfis(limite=50):
+    """Retorna os resumos mais recentes, do mais novo para o mais antigo"""
+    if not os.path.isdir(PERFIS_DIR):
+        return []
+    arquivos = sorted((f for f in os.listdir(PERFIS_DIR) if f.endswith('.json') and not f.startswith('armado_')),
+                      reverse=True)
+    perfis = []
+    for arquivo in arquivos[:limite]:
+        try:
+            with open(os.path.join(PERFIS_DIR, arquivo), encoding='utf-8') as f:
+                perfis.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return perfis
+
+
+def _caminho_armado(endpoint):
+    return os.path.join(PERFIS_DIR, f'armado_{_nome_arquivo(endpoint)}.json')
+
+
+def armar(endpoint, modo='ambos'):
+    """Marca o endpoint para que sua próxima requisição seja perfilada"""
+    os.makedirs(PERFIS_DIR, exist_ok=True)
+    with open(_caminho_armado(endpoint), 'w', encoding='utf-8') as f:
+        json.dump({'endpoint': endpoint, 'modo': modo}, f)
+
+
+def _consumir_armado(endpoint):
+    """Tenta reivindicar o gatilho armado; só um worker consegue renomear o arquivo"""
+    caminho = _caminho_armado(endpoint)
+    if not os.path.exists(caminho):
+        return None
+    reivindicado = f'{caminho}.{os.getpid()}'
+    try:
+        os.rename(caminho, reivindicado)
+        with open(reivindicado, encoding='utf-8') as f:
+            dados = json.load(f)
+        os.remove(reivindicado)
+    except (OSError, ValueError):
+        return None
+    return dados.get('modo', 'ambos')
+
+
+def _iniciar_requisicao():
+    if request.endpoint is None or request.endpoint.startswith('perfis'):
+        return
+    modo = request.args.get('perfil')
+    if modo:
+        if modo not in MODOS or not acesso_admin():
+            return
+    else:
+        modo = _consumir_armado(request.endpoint)
+        if not modo:
+            return
+    cpu, memoria = MODOS.get(modo, MODOS['ambos'])
+    g._perfilador = Perfilador(f'{request.method} {request.endpoint}', cpu, memoria,
+                               {'url': request.full_path, 'metodo': request.method}).iniciar()
+
+
+def _finalizar_requisicao(erro=None):
+    perfilador = g.pop('_perfilador', None)
+    if perfilador is not None:
+        if erro is not None:
+            perfilador.detalhes['erro'] = str(erro)
+        perfilador.finalizar()
+
+
+def init_app(app):
+    """Registra o gatilho de perfilamento e a página /admin/perfis"""
+    if not ATIVO:
+        return
+    app.before_request(_iniciar_requisicao)
+    app.teardown_request(_finalizar_requisicao)
+
+    @app.route('/admin/perfis', methods=['GET', 'POST'])
+    @requer_admin
+    def perfis():
+        """Lista os perfis recentes e permite armar o perfilamento de um endpoint"""
+        if request.method == 'POST':
+            endpoint = request.form.get('endpoint', '')
+            modo = request.form.get('modo', 'ambos')
+            if endpoint not in app.view_functions or modo not in MODOS:
+                flash('Endpoint ou modo inválido', 'error')
+            else:
+                armar(endpoint, modo)
+                flash(f'A próxima requisição para "{endpoint}" será perfilada ({modo}).', 'success')
+            return redirect(url_for('perfis'))
+
+        endpoints = sorted(e for e in app.view_functions if e != 'static' and not e.startswith('perfis'))
+        return render_template('admin_perfis.html', perfis=listar_perfis(), endpoints=endpoints)
+
+    @app.route('/admin/perfis/<arquivo>')
+    @requer_admin
+    def perfis_download(arquivo):
+        """Download do arquivo .prof ou .json de um perfil"""
+        if not arquivo.endswith(('.prof', '.json')):
+            abort(404)
+        return send_from_directory(PERFIS_DIR, arquivo, as_attachment=True)
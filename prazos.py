@@ -0,0 +1,65 @@
+"""
+Prazo das requisições para o trabalho no banco
+
+Com workers gthread o timeout do gunicorn não derruba mais uma requisição demorada
+(o laço principal do worker continua avisando o mestre): ele só pega worker travado.
+O limite de cada requisição fica aqui. Ela ganha um prazo — PRAZO_REQUISICAO
+(padrão 30s) ou, nas rotas de upload, PRAZO_UPLOAD (padrão 300s) — e o SQLite
+interrompe a consulta que passar dele (progress handler); a resposta é 503. O
+/eventos e as rotas do admin que fazem trabalhos longos na própria requisição
+(sincronização, manutenção, arquivamento) ficam sem prazo.
+
+O prazo vale para o SQL: a leitura do CSV pelo pandas não é interrompida no meio,
+mas a gravação que vem depois sim. Threads disparadas pela requisição (manutenção,
+backup) não herdam o prazo.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app, request
+
+PRAZO_REQUISICAO = float(os.environ.get('PRAZO_REQUISICAO', '30'))
+PRAZO_UPLOAD = float(os.environ.get('PRAZO_UPLOAD', '300'))
+
+# Instruções da VM do SQLite entre duas consultas ao relógio
+PASSOS = 10000
+
+# threading.local e não ContextVar: contextvars.copy_context() das tarefas em
+# segundo plano levaria o prazo junto
+_local = threading.local()
+
+
+def _esgotado():
+    limite = getattr(_local, 'limite', None)
+    return limite is not None and time.monotonic() > limite
+
+
+def instalar(conn):
+    """Faz a conexão respeitar o prazo da requisição da thread (chamado ao abrir)"""
+    conn.set_progress_handler(_esgotado, PASSOS)
+
+
+def _iniciar_requisicao():
+    prazos = current_app.extensions['prazos']
+    prazo = prazos.get(request.endpoint, PRAZO_REQUISICAO)
+    _local.limite = None if prazo is None else time.monotonic() + prazo
+
+
+def _encerrar_requisicao(erro=None):
+    _local.limite = None
+
+
+def init_app(app, por_rota=None):
+    """Liga os prazos; `por_rota` troca o padrão de alguns endpoints (None = sem prazo)"""
+    app.extensions['prazos'] = dict(por_rota or {})
+    app.before_request(_iniciar_requisicao)
+    app.teardown_request(_encerrar_requisicao)
+
+    @app.errorhandler(sqlite3.OperationalError)
+    def prazo_esgotado(erro):
+        if str(erro) != 'interrupted':
+            raise erro
+        return 'Tempo limite da requisição esgotado', 503
@@ -0,0 +1,198 @@
+"""
+Prévia da importação (dry run)
+
+O arquivo é lido e transformado uma vez (importacao.analisar) e os itens ficam na
+tabela de preparo importacao_itens, com as mesmas colunas de pedidos_completos.
+Um único SELECT percorre os itens preparados, consultando pelos índices únicos
+pedidos_completos, pedidos e pedidos_arquivo, e classifica cada um:
+
+    novo        entra na importação
+    duplicado   já existe com os mesmos dados
+    alterado    já existe com dados diferentes; a importação mantém o que está
+                gravado (conta como duplicado) e a prévia mostra as diferenças
+    arquivado   pedido de um grupo arquivado (conta como duplicado)
+
+Confirmar grava os itens preparados pela mesma etapa gravar da importação direta,
+sem ler o arquivo de novo, e apaga o preparo na mesma transação. As tabelas ficam
+no banco, e não em TEMP, porque a confirmação chega em outra requisição, talvez em
+outro worker; prévias abandonadas expiram depois de PREVIA_VALIDADE segundos
+(padrão 1 hora) e são apagadas quando a próxima é criada.
+"""
+
+import json
+import logging
+import os
+import time
+import uuid
+
+import importacao
+
+logger = logging.getLogger('pedidos.previa')
+
+VALIDADE = int(os.environ.get('PREVIA_VALIDADE', '3600'))
+
+# Itens mostrados em cada amostra da página da prévia
+AMOSTRA = 20
+
+COMPARADAS = importacao.COLUNAS_PEDIDOS_COMPLETOS[1:]
+COLUNAS = importacao.COLUNAS_PEDIDOS_COMPLETOS + ['tamanho', 'tipo_frete']
+_NUMERICAS = {c for c, _ in importacao.CAMPOS_NUMERO} | {'valor_produto'}
+
+SITUACOES = ('novo', 'duplicado', 'alterado', 'arquivado')
+
+
+def esquema(tipo_real='REAL'):
+    """Comandos que criam as tabelas de preparo (o PostgreSQL passa DOUBLE PRECISION)"""
+    colunas = ', '.join(f"{c} {tipo_real if c in _NUMERICAS else 'TEXT'}" for c in COLUNAS)
+    return [
+        '''CREATE TABLE IF NOT EXISTS importacao_previas (
+            token TEXT PRIMARY KEY,
+            arquivo TEXT,
+            resumo TEXT NOT NULL,
+            criada_em REAL NOT NULL
+        )''',
+        f'''CREATE TABLE IF NOT EXISTS importacao_itens (
+            token TEXT NOT NULL,
+            posicao INTEGER NOT NULL,
+            pedido TEXT NOT NULL,
+            {colunas},
+            PRIMARY KEY (token, posicao)
+        )''',
+    ]
+
+
+def criar_tabelas(cursor):
+    """Cria as tabelas de preparo (chamado pelo init_db)"""
+    for comando in esquema():
+        cursor.execute(comando)
+
+
+def _expirar(conn):
+    limite = time.time() - VALIDADE
+    conn.execute('DELETE FROM importacao_itens WHERE token IN '
+                 '(SELECT token FROM importacao_previas WHERE criada_em < ?)', (limite,))
+    conn.execute('DELETE FROM importacao_previas WHERE criada_em < ?', (limite,))
+
+
+def preparar(conn, pedidos, resumo):
+    """Guarda os itens de `pedidos` (saída de importacao.analisar) e retorna o token
+
+    Itens com erro são contados no resumo e ficam de fora; de um id repetido no
+    arquivo vale o primeiro, como na gravação, e os demais contam como duplicados.
+    """
+    marca = time.perf_counter()
+    _expirar(conn)
+    token = uuid.uuid4().hex
+    vistos = set()
+    linhas = []
+    for numero_pedido, itens in pedidos:
+        for id_produto, completo, pedido in itens:
+            if isinstance(completo, Exception):
+                resumo['erros'] += 1
+                logger.warning('Erro ao processar produto %s do pedido %s: %s', id_produto, numero_pedido, completo)
+                continue
+            if id_produto in vistos:
+                resumo['duplicados'] += 1
+                continue
+            vistos.add(id_produto)
+            linhas.append((token, len(linhas), numero_pedido, *completo, pedido[3], pedido[4]))
+
+    conn.executemany(f"INSERT INTO importacao_itens (token, posicao, pedido, {', '.join(COLUNAS)}) "
+                     f"VALUES ({', '.join('?' * (len(COLUNAS) + 3))})", linhas)
+    resumo['tempos']['preparar'] = time.perf_counter() - marca
+    conn.execute('INSERT INTO importacao_previas (token, arquivo, resumo, criada_em) VALUES (?, ?, ?, ?)',
+                 (token, resumo['arquivo'], json.dumps(resumo), time.time()))
+    return token
+
+
+def _situacao(diferente):
+    alterado = ' OR '.join(f'i.{c} {diferente} c.{c}' for c in COMPARADAS)
+    return f'''CASE WHEN a.id_pedido IS NOT NULL THEN 'arquivado'
+                    WHEN c.numero_pedido IS NULL AND p.id_pedido IS NULL THEN 'novo'
+                    WHEN c.numero_pedido IS NOT NULL AND ({alterado}) THEN 'alterado'
+                    ELSE 'duplicado' END'''
+
+
+def resumir(conn, token, diferente='IS NOT'):
+    """Contagens por situação e amostras de novos e alterados; None se a prévia não existe
+
+    `diferente` é o operador de comparação que trata NULL como valor (IS NOT no
+    SQLite, IS DISTINCT FROM no PostgreSQL).
+    """
+    previa = conn.execute('SELECT arquivo, resumo, criada_em FROM importacao_previas WHERE token = ?',
+                          (token,)).fetchone()
+    if previa is None or previa['criada_em'] < time.time() - VALIDADE:
+        return None
+
+    contagens = dict.fromkeys(SITUACOES, 0)
+    for linha in conn.execute(f'''
+        SELECT situacao, COUNT(*) AS quantidade FROM (
+            SELECT {_situacao(diferente)} AS situacao
+            FROM importacao_itens i
+            LEFT JOIN pedidos_completos c ON c.numero_pedido = i.numero_pedido
+            LEFT JOIN pedidos p ON p.id_pedido = i.numero_pedido
+            LEFT JOIN pedidos_arquivo a ON a.id_pedido = i.numero_pedido
+            WHERE i.token = ?
+        ) AS itens GROUP BY situacao
+    ''', (token,)):
+        contagens[linha['situacao']] = linha['quantidade']
+
+    novos = conn.execute(f'''
+        SELECT i.numero_pedido, i.nome_comprador, i.nome_produto, i.tamanho, i.tipo_frete
+        FROM importacao_itens i
+        WHERE i.token = ?
+          AND NOT EXISTS (SELECT 1 FROM pedidos_completos c WHERE c.numero_pedido = i.numero_pedido)
+          AND NOT EXISTS (SELECT 1 FROM pedidos p WHERE p.id_pedido = i.numero_pedido)
+          AND NOT EXISTS (SELECT 1 FROM pedidos_arquivo a WHERE a.id_pedido = i.numero_pedido)
+        ORDER BY i.posicao LIMIT {AMOSTRA}
+    ''', (token,)).fetchall()
+
+    selecao = ', '.join(f'i.{c} AS novo_{c}, c.{c} AS atual_{c}' for c in COMPARADAS)
+    alterados = []
+    for linha in conn.execute(f'''
+        SELECT i.numero_pedido, {selecao}
+        FROM importacao_itens i
+        JOIN pedidos_completos c ON c.numero_pedido = i.numero_pedido
+        WHERE i.token = ? AND ({' OR '.join(f'i.{c} {diferente} c.{c}' for c in COMPARADAS)})
+        ORDER BY i.posicao LIMIT {AMOSTRA}
+    ''', (token,)):
+        alterados.append({
+            'numero_pedido': linha['numero_pedido'],
+            'diferencas': [(c, linha[f'atual_{c}'], linha[f'novo_{c}'])
+                           for c in COMPARADAS if linha[f'atual_{c}'] != linha[f'novo_{c}']],
+        })
+
+    return {
+        'token': token,
+        'arquivo': previa['arquivo'],
+        'resumo': json.loads(previa['resumo']),
+        'contagens': contagens,
+        'novos': novos,
+        'alterados': alterados,
+        'expira_em': previa['criada_em'] + VALIDADE,
+    }
+
+
+def retirar(conn, token):
+    """Lê e apaga os itens da prévia; retorna (pedidos, resumo) como importacao.analisar ou None"""
+    previa = conn.execute('SELECT resumo, criada_em FROM importacao_previas WHERE token = ?', (token,)).fetchone()
+    if previa is None or previa['criada_em'] < time.time() - VALIDADE:
+        return None
+
+    pedidos = []
+    for linha in conn.execute(f"SELECT pedido, {', '.join(COLUNAS)} FROM importacao_itens "
+                              'WHERE token = ? ORDER BY posicao', (token,)):
+        id_produto = linha['numero_pedido']
+        item = (id_produto, tuple(linha[c] for c in importacao.COLUNAS_PEDIDOS_COMPLETOS),
+                (id_produto, linha['nome_comprador'], linha['nome_produto'], linha['tamanho'], linha['tipo_frete']))
+        if pedidos and pedidos[-1][0] == linha['pedido']:
+            pedidos[-1][1].append(item)
+        else:
+            pedidos.append((linha['pedido'], [item]))
+    descartar(conn, token)
+    return pedidos, json.loads(previa['resumo'])
+
+
+def descartar(conn, token):
+    conn.execute('DELETE FROM importacao_itens WHERE token = ?', (token,))
+    conn.execute('DELETE FROM importacao_previas WHERE token = ?', (token,))
@@ -0,0 +1,437 @@
+"""
+Acompanhamento da entrega dos grupos enviados
+
+Depois que um grupo recebe o código de rastreio, um ciclo periódico consulta a API
+da transportadora para todos os grupos ainda em trânsito e guarda o histórico de
+status de cada um.
+
+    seleção     grupos enviados, com código, ainda não entregues e cuja próxima
+                verificação já venceu (tabela rastreio_situacao)
+    consulta    cliente HTTP asyncio, com no máximo RASTREIO_CONCORRENCIA requisições
+                simultâneas e conexões reaproveitadas; 429, 5xx e erros de rede são
+                repetidos com backoff exponencial
+    cache       a situação de cada código guarda uma assinatura dos eventos já vistos:
+                resposta igual à anterior só reagenda a próxima verificação
+    gravação    eventos novos vão para rastreio_eventos numa transação por ciclo;
+                códigos entregues deixam de ser consultados e os que falham esperam
+                cada vez mais até a próxima tentativa
+
+Os ciclos rodam fora dos workers web: pelo comando abaixo (cron ou processo
+worker) ou por POST /admin/rastreamento, que dispara um ciclo numa thread.
+
+    python rastreamento.py --banco pedidos.db
+    python rastreamento.py --banco pedidos.db --continuo 900
+
+A API padrão segue o formato do Link & Track (?codigo=...&user=...&token=...,
+resposta com a lista "eventos"); RASTREIO_API_URL aponta para outra, como a
+transportadora falsa de benchmarks/transportadora_falsa.py.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import ssl
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from flask import jsonify, render_template, request
+
+import sincronizacao
+from admin import requer_admin
+
+logger = logging.getLogger('pedidos.rastreamento')
+
+API_URL = os.environ.get('RASTREIO_API_URL', 'https://api.linketrack.com/track/json')
+API_USUARIO = os.environ.get('RASTREIO_API_USUARIO', '')
+API_TOKEN = os.environ.get('RASTREIO_API_TOKEN', '')
+CONCORRENCIA = int(os.environ.get('RASTREIO_CONCORRENCIA', '20'))
+
+# Intervalo entre consultas de um código em trânsito
+INTERVALO = int(os.environ.get('RASTREIO_INTERVALO', str(4 * 3600)))
+MAX_TENTATIVAS = 4
+ESPERA_MAXIMA = 30.0
+TIMEOUT = 20.0
+# Backoff entre ciclos para códigos que falham seguidamente
+ESPERA_FALHA = 300
+
+CHAVE_CICLO = 'rastreamento_ultimo_ciclo'
+PALAVRAS_ENTREGUE = ('entregue', 'delivered')
+
+
+def criar_tabelas(cursor):
+    """Cria a situação por código e o histórico por grupo (chamado pelo init_db)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rastreio_situacao (
+            codigo TEXT PRIMARY KEY,
+            status TEXT,
+            assinatura TEXT,
+            entregue INTEGER NOT NULL DEFAULT 0,
+            falhas INTEGER NOT NULL DEFAULT 0,
+            erro TEXT,
+            verificado_em REAL,
+            proxima_verificacao REAL NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rastreio_eventos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            grupo_id INTEGER NOT NULL,
+            codigo TEXT NOT NULL,
+            momento TEXT NOT NULL,
+            status TEXT NOT NULL,
+            local TEXT,
+            registrado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (grupo_id, codigo, momento, status)
+        )
+    ''')
+
+
+class ErroHTTP(Exception):
+    """Falha ao consultar um código (depois das repetições)"""
+
+    def __init__(self, mensagem, status=None):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class ClienteHTTP:
+    """GET HTTP/1.1 mínimo sobre asyncio, com conexões reaproveitadas por servidor"""
+
+    def __init__(self, limite):
+        self.limite = asyncio.Semaphore(limite)
+        self._ociosas = {}
+        self._ssl = ssl.create_default_context()
+
+    async def _conectar(self, destino):
+        ociosas = self._ociosas.get(destino)
+        if ociosas:
+            return ociosas.pop(), True
+        host, porta, seguro = destino
+        conexao = await asyncio.open_connection(host, porta, ssl=self._ssl if seguro else None)
+        return conexao, False
+
+    async def _ler_resposta(self, leitor):
+        linha = await leitor.readline()
+        if not linha:
+            raise ConnectionResetError('Conexão encerrada pelo servidor')
+        status = int(linha.split()[1])
+        cabecalhos = {}
+        while True:
+            linha = await leitor.readline()
+            if linha in (b'\r\n', b'\n', b''):
+                break
+            nome, _, valor = linha.decode('iso-8859-1').partition(':')
+            cabecalhos[nome.strip().lower()] = valor.strip()
+
+        if cabecalhos.get('transfer-encoding', '').lower() == 'chunked':
+            partes = []
+            while True:
+                tamanho = int((await leitor.readline()).split(b';')[0], 16)
+                if tamanho == 0:
+                    await leitor.readline()
+                    break
+                partes.append(await leitor.readexactly(tamanho))
+                await leitor.readexactly(2)
+            corpo = b''.join(partes)
+        elif 'content-length' in cabecalhos:
+            corpo = await leitor.readexactly(int(cabecalhos['content-length']))
+        else:
+            corpo = await leitor.read()
+            cabecalhos['connection'] = 'close'
+        return status, cabecalhos, corpo
+
+    async def get(self, url):
+        partes = urlsplit(url)
+        seguro = partes.scheme == 'https'
+        destino = (partes.hostname, partes.port or (443 if seguro else 80), seguro)
+        caminho = (partes.path or '/') + (f'?{partes.query}' if partes.query else '')
+        requisicao = (f'GET {caminho} HTTP/1.1\r\nHost: {partes.netloc}\r\n'
+                      f'User-Agent: {sincronizacao.USER_AGENT}\r\nAccept: application/json\r\n'
+                      f'Connection: keep-alive\r\n\r\n').encode('ascii')
+
+        async with self.limite:
+            for _ in range(2):
+                (leitor, escritor), reaproveitada = await asyncio.wait_for(self._conectar(destino), TIMEOUT)
+                try:
+                    escritor.write(requisicao)
+                    await escritor.drain()
+                    status, cabecalhos, corpo = await asyncio.wait_for(self._ler_resposta(leitor), TIMEOUT)
+                except (ConnectionError, asyncio.IncompleteReadError) as e:
+                    escritor.close()
+                    # Conexão ociosa que o servidor já fechou: tenta uma vez numa nova
+                    if reaproveitada:
+                        continue
+                    raise ErroHTTP(f'Falha de conexão: {e!r}') from e
+                except BaseException:
+                    escritor.close()
+                    raise
+                if cabecalhos.get('connection', '').lower() == 'close':
+                    escritor.close()
+                else:
+                    self._ociosas.setdefault(destino, []).append((leitor, escritor))
+                return status, cabecalhos, corpo
+            raise ErroHTTP('Falha de conexão')
+
+    def fechar(self):
+        for conexoes in self._ociosas.values():
+            for _, escritor in conexoes:
+                escritor.close()
+        self._ociosas.clear()
+
+
+def url_consulta(codigo):
+    parametros = {'codigo': codigo}
+    if API_USUARIO:
+        parametros['user'] = API_USUARIO
+    if API_TOKEN:
+        parametros['token'] = API_TOKEN
+    return f'{API_URL}?{urlencode(parametros)}'
+
+
+def normalizar(dados):
+    """Converte a resposta da API em eventos [(momento, status, local)] do mais antigo ao mais novo"""
+    eventos = []
+    for evento in dados.get('eventos') or []:
+        momento = f"{evento.get('data', '')} {evento.get('hora', '')}".strip()
+        status = (evento.get('status') or '').strip()
+        if status:
+            eventos.append((momento, status, (evento.get('local') or '').strip()))
+    # A API lista do mais recente para o mais antigo
+    eventos.reverse()
+    return eventos
+
+
+async def consultar(cliente, codigo):
+    """Consulta um código com backoff; retorna a lista de eventos ou lança ErroHTTP"""
+    for tentativa in range(MAX_TENTATIVAS):
+        espera = None
+        try:
+            status, cabecalhos, corpo = await cliente.get(url_consulta(codigo))
+        except asyncio.TimeoutError:
+            # Separado do OSError: só a partir do Python 3.11 um é subclasse do outro
+            erro = ErroHTTP(f'Sem resposta da transportadora em {TIMEOUT}s')
+        except (ErroHTTP, OSError) as e:
+            erro = e if isinstance(e, ErroHTTP) else ErroHTTP(f'{type(e).__name__}: {e}')
+        else:
+            if status == 200:
+                try:
+                    return normalizar(json.loads(corpo))
+                except ValueError as e:
+                    raise ErroHTTP(f'Resposta inválida da transportadora: {e}', status) from e
+            if status == 404:
+                return []
+            if status != 429 and status < 500:
+                raise ErroHTTP(f'Resposta {status} da transportadora', status)
+            erro = ErroHTTP(f'Resposta {status} da transportadora', status)
+            if status == 429:
+                try:
+                    espera = float(cabecalhos.get('retry-after', ''))
+                except ValueError:
+                    pass
+        if tentativa + 1 < MAX_TENTATIVAS:
+            espera = espera or min(ESPERA_MAXIMA, 0.5 * 2 ** tentativa) * random.uniform(0.5, 1.0)
+            await asyncio.sleep(espera)
+    raise erro
+
+
+async def consultar_todos(codigos, concorrencia=None):
+    """Consulta todos os códigos em paralelo (limitado); retorna {código: eventos | ErroHTTP}"""
+    cliente = ClienteHTTP(concorrencia or CONCORRENCIA)
+    try:
+        resultados = await asyncio.gather(*(consultar(cliente, c) for c in codigos), return_exceptions=True)
+    finally:
+        cliente.fechar()
+    return dict(zip(codigos, resultados))
+
+
+def assinatura(eventos):
+    return hashlib.sha1(json.dumps(eventos, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def pendentes(conn, agora=None, limite=None):
+    """Grupos a consultar neste ciclo: [(grupo_id, código, assinatura anterior, falhas)]"""
+    agora = agora or time.time()
+    sql = '''
+        SELECT g.id, UPPER(TRIM(g.codigo_rastreio)) AS codigo, s.assinatura, COALESCE(s.falhas, 0) AS falhas
+        FROM grupos g
+        LEFT JOIN rastreio_situacao s ON s.codigo = UPPER(TRIM(g.codigo_rastreio))
+        WHERE g.enviado = 1 AND TRIM(COALESCE(g.codigo_rastreio, '')) != ''
+          AND COALESCE(s.entregue, 0) = 0 AND COALESCE(s.proxima_verificacao, 0) <= ?
+        ORDER BY COALESCE(s.proxima_verificacao, 0)
+    '''
+    parametros = [agora]
+    if limite:
+        sql += ' LIMIT ?'
+        parametros.append(limite)
+    return conn.execute(sql, parametros).fetchall()
+
+
+def executar_ciclo(conn, concorrencia=None, limite=None):
+    """Consulta os códigos vencidos e grava as mudanças; retorna o resumo do ciclo"""
+    inicio = time.perf_counter()
+    grupos = pendentes(conn, limite=limite)
+    por_codigo = {}
+    for grupo_id, codigo, anterior, falhas in grupos:
+        por_codigo.setdefault(codigo, {'grupos': [], 'anterior': anterior, 'falhas': falhas})['grupos'].append(grupo_id)
+
+    resultados = asyncio.run(consultar_todos(list(por_codigo), concorrencia)) if por_codigo else {}
+    tempo_consulta = time.perf_counter() - inicio
+
+    agora = time.time()
+    resumo = {'codigos': len(por_codigo), 'sem_mudanca': 0, 'atualizados': 0, 'entregues': 0,
+              'falhas': 0, 'eventos_novos': 0}
+    situacoes = []
+    eventos = []
+    for codigo, info in por_codigo.items():
+        resultado = resultados[codigo]
+        if isinstance(resultado, Exception):
+            resumo['falhas'] += 1
+            falhas = info['falhas'] + 1
+            espera = min(INTERVALO, ESPERA_FALHA * 2 ** (falhas - 1))
+            situacoes.append((codigo, None, info['anterior'], 0, falhas, str(resultado), agora, agora + espera))
+            continue
+
+        nova = assinatura(resultado)
+        ultimo = resultado[-1][1] if resultado else None
+        entregue = int(bool(ultimo) and any(p in ultimo.lower() for p in PALAVRAS_ENTREGUE))
+        if nova == info['anterior']:
+            resumo['sem_mudanca'] += 1
+        else:
+            resumo['atualizados'] += 1
+            for grupo_id in info['grupos']:
+                eventos.extend((grupo_id, codigo, momento, status, local) for momento, status, local in resultado)
+        resumo['entregues'] += entregue
+        situacoes.append((codigo, ultimo, nova, entregue, 0, None, agora, agora + INTERVALO))
+
+    marca = time.perf_counter()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.executemany('''
+            INSERT INTO rastreio_situacao (codigo, status, assinatura, entregue, falhas, erro,
+                                           verificado_em, proxima_verificacao)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (codigo) DO UPDATE SET
+                status = COALESCE(excluded.status, status), assinatura = excluded.assinatura,
+                entregue = excluded.entregue, falhas = excluded.falhas, erro = excluded.erro,
+                verificado_em = excluded.verificado_em, proxima_verificacao = excluded.proxima_verificacao
+        ''', situacoes)
+        antes = conn.total_changes
+        conn.executemany('INSERT OR IGNORE INTO rastreio_eventos (grupo_id, codigo, momento, status, local) '
+                         'VALUES (?, ?, ?, ?, ?)', eventos)
+        resumo['eventos_novos'] = conn.total_changes - antes
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+    resumo['tempos'] = {'consulta': tempo_consulta, 'gravar': time.perf_counter() - marca,
+                        'total': time.perf_counter() - inicio}
+    sincronizacao.gravar_estado(conn, CHAVE_CICLO, json.dumps(resumo))
+    conn.commit()
+    logger.info('Ciclo de rastreamento: %d códigos, %d atualizados, %d entregues, %d falhas em %.2fs',
+                resumo['codigos'], resumo['atualizados'], resumo['entregues'], resumo['falhas'],
+                resumo['tempos']['total'], extra={'evento': 'rastreamento', 'resumo': resumo})
+    return resumo
+
+
+def historico(conn, grupo_id):
+    """Eventos do grupo, do mais recente ao mais antigo"""
+    return conn.execute('''
+        SELECT codigo, momento, status, local FROM rastreio_eventos
+        WHERE grupo_id = ? ORDER BY id DESC
+    ''', (grupo_id,)).fetchall()
+
+
+# Um ciclo por vez em cada processo
+_em_andamento = threading.Lock()
+
+
+def init_app(app, obter_conexao):
+    """Registra o histórico por grupo e /admin/rastreamento"""
+
+    def ciclo_em_segundo_plano():
+        conn = obter_conexao()
+        try:
+            executar_ciclo(conn)
+        except Exception:
+            logger.exception('Erro no ciclo de rastreamento')
+        finally:
+            conn.close()
+            _em_andamento.release()
+
+    @app.route('/grupo/<int:grupo_id>/rastreamento')
+    def rastreamento_grupo(grupo_id):
+        """Histórico de entrega do grupo"""
+        conn = obter_conexao()
+        try:
+            grupo = conn.execute('SELECT * FROM grupos_todos WHERE id = ?', (grupo_id,)).fetchone()
+            if not grupo:
+                return 'Grupo não encontrado', 404
+            situacao = None
+            if grupo['codigo_rastreio']:
+                situacao = conn.execute('SELECT * FROM rastreio_situacao WHERE codigo = ?',
+                                        (grupo['codigo_rastreio'].strip().upper(),)).fetchone()
+            eventos = historico(conn, grupo_id)
+        finally:
+            conn.close()
+        return render_template('rastreamento_grupo.html', grupo=grupo, situacao=situacao, eventos=eventos)
+
+    @app.route('/admin/rastreamento', methods=['GET', 'POST'])
+    @requer_admin
+    def rastreamento_admin():
+        """Situação dos códigos; POST dispara um ciclo em segundo plano"""
+        if request.method == 'POST':
+            if not _em_andamento.acquire(blocking=False):
+                return jsonify({'erro': 'Ciclo já em andamento'}), 409
+            threading.Thread(target=ciclo_em_segundo_plano, name='rastreamento', daemon=True).start()
+            return jsonify({'iniciado': True}), 202
+
+        conn = obter_conexao()
+        try:
+            linha = conn.execute('''
+                SELECT COUNT(*) AS codigos, SUM(entregue) AS entregues, SUM(falhas > 0) AS com_falha
+                FROM rastreio_situacao
+            ''').fetchone()
+            ciclo = sincronizacao.ler_estado(conn, CHAVE_CICLO)
+            return jsonify({'codigos': linha['codigos'], 'entregues': linha['entregues'] or 0,
+                            'com_falha': linha['com_falha'] or 0, 'em_andamento': _em_andamento.locked(),
+                            'ultimo_ciclo': json.loads(ciclo) if ciclo else None})
+        finally:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Consulta a entrega dos grupos enviados')
+    parser.add_argument('--banco', default='pedidos.db', help='Banco do app (já inicializado)')
+    parser.add_argument('--continuo', type=int, metavar='SEGUNDOS',
+                        help='Repete o ciclo a cada SEGUNDOS em vez de rodar uma vez')
+    parser.add_argument('--concorrencia', type=int, help='Consultas simultâneas')
+    parser.add_argument('--limite', type=int, help='Máximo de grupos por ciclo')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    conn = sqlite3.connect(args.banco, timeout=30)
+    conn.row_factory = sqlite3.Row
+    criar_tabelas(conn.cursor())
+    sincronizacao.criar_estado(conn.cursor())
+    try:
+        while True:
+            resumo = executar_ciclo(conn, args.concorrencia, args.limite)
+            print(json.dumps(resumo, ensure_ascii=False))
+            if not args.continuo:
+                break
+            time.sleep(args.continuo)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
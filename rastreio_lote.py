@@ -0,0 +1,129 @@
+"""
+Cadastro de códigos de rastreio em lote
+
+Recebe um CSV ou uma lista colada com uma linha por grupo:
+
+    Grupo 12;AB123456789BR
+    37,AB987654321BR
+    Grupo 13    AB555555555BR      (sem separador: o código é a última palavra)
+
+O grupo pode ser o id ou o nome exato. Todas as linhas são validadas contra uma
+única leitura da tabela grupos e as válidas são gravadas com um executemany numa
+só transação, marcando os grupos como enviados. O resultado traz o status de cada
+linha para exibir ao usuário.
+"""
+
+import csv
+import io
+import re
+
+SEPARADORES = (';', '\t', ',')
+FORMATO_CODIGO = re.compile(r'^[A-Za-z0-9-]{5,40}$')
+MAX_LINHAS = 20000
+
+
+class ErroRastreioLote(Exception):
+    """Entrada que não pode ser processada (vazia, grande demais...)"""
+
+
+def decodificar(dados):
+    """Texto do arquivo enviado (UTF-8, com ou sem BOM, ou ISO-8859-1 das planilhas)"""
+    try:
+        return dados.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return dados.decode('iso-8859-1')
+
+
+def ler_linhas(texto):
+    """Converte o texto em [(número da linha, grupo, código)]"""
+    linhas = [(numero, linha.strip()) for numero, linha in enumerate(texto.splitlines(), 1) if linha.strip()]
+    if not linhas:
+        raise ErroRastreioLote('Nenhuma linha informada')
+    if len(linhas) > MAX_LINHAS:
+        raise ErroRastreioLote(f'No máximo {MAX_LINHAS} linhas por envio')
+
+    registros = []
+    for numero, linha in linhas:
+        separador = next((s for s in SEPARADORES if s in linha), None)
+        if separador:
+            campos = next(csv.reader(io.StringIO(linha), delimiter=separador))
+        else:
+            campos = linha.rsplit(None, 1)
+        campos = [c.strip() for c in campos]
+        registros.append((numero, campos[0] if campos else '', campos[1] if len(campos) > 1 else ''))
+
+    # Cabeçalho opcional ("grupo;codigo_rastreio")
+    if registros and re.search(r'rastreio|c[oó]digo', registros[0][2], re.IGNORECASE):
+        registros.pop(0)
+    return registros
+
+
+def aplicar(conn, registros, parcial=False):
+    """Valida os registros e marca os grupos como enviados
+
+    Roda dentro de repo.transacao(exclusiva=True), para que ninguém altere os
+    códigos entre a leitura e a gravação. Com parcial=False basta uma linha
+    inválida para nada ser gravado. Retorna (resultados por linha, quantidade de
+    grupos atualizados).
+    """
+    por_id = {}
+    por_nome = {}
+    dono_codigo = {}
+    for grupo in conn.execute('SELECT id, nome, codigo_rastreio FROM grupos').fetchall():
+        por_id[grupo['id']] = grupo
+        por_nome.setdefault(grupo['nome'].strip().casefold(), []).append(grupo)
+        if grupo['codigo_rastreio']:
+            dono_codigo[grupo['codigo_rastreio'].upper()] = grupo['id']
+
+    resultados = []
+    atualizacoes = {}
+    for numero, referencia, codigo in registros:
+        resultado = {'linha': numero, 'grupo': referencia, 'codigo': codigo, 'status': 'erro'}
+        resultados.append(resultado)
+
+        if referencia.isdigit() and int(referencia) in por_id:
+            grupo = por_id[int(referencia)]
+        else:
+            candidatos = por_nome.get(referencia.casefold(), [])
+            if len(candidatos) != 1:
+                resultado['mensagem'] = ('Grupo não encontrado' if not candidatos
+                                         else f'{len(candidatos)} grupos com esse nome; use o id')
+                continue
+            grupo = candidatos[0]
+        resultado['grupo_id'] = grupo['id']
+        resultado['nome'] = grupo['nome']
+
+        if not FORMATO_CODIGO.match(codigo):
+            resultado['mensagem'] = 'Código de rastreio ausente ou inválido'
+            continue
+        codigo = codigo.upper()
+        resultado['codigo'] = codigo
+
+        anterior = atualizacoes.get(grupo['id'])
+        if anterior is not None:
+            if anterior == codigo:
+                resultado.update(status='ignorado', mensagem='Linha repetida')
+            else:
+                resultado['mensagem'] = f'Grupo já recebeu o código {anterior} neste envio'
+            continue
+        dono = dono_codigo.get(codigo)
+        if dono is not None and dono != grupo['id']:
+            resultado['mensagem'] = f'Código já usado no grupo {por_id[dono]["nome"]} (id {dono})'
+            continue
+
+        atualizacoes[grupo['id']] = codigo
+        dono_codigo[codigo] = grupo['id']
+        resultado['status'] = 'ok'
+        if grupo['codigo_rastreio'] and grupo['codigo_rastreio'].upper() != codigo:
+            resultado['mensagem'] = f'Substitui o código {grupo["codigo_rastreio"]}'
+
+    tem_erro = any(r['status'] == 'erro' for r in resultados)
+    if tem_erro and not parcial:
+        for resultado in resultados:
+            if resultado['status'] == 'ok':
+                resultado.update(status='pendente', mensagem='Não gravado: há linhas com erro')
+        return resultados, 0
+
+    conn.executemany('UPDATE grupos SET enviado = 1, codigo_rastreio = ? WHERE id = ?',
+                     [(codigo, grupo_id) for grupo_id, codigo in atualizacoes.items()])
+    return resultados, len(atualizacoes)
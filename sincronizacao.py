@@ -0,0 +1,454 @@
+"""
+Sincronização incremental de pedidos pela API da Nuvemshop
+
+Em vez de exportar e importar CSV, busca na API (GET /v1/<loja>/orders) só os
+pedidos alterados desde a última sincronização e grava nas mesmas tabelas da
+importação (pedidos_completos e pedidos), com o mesmo mapeamento de colunas.
+
+    marca d'água   updated_at da última sincronização concluída, guardado na tabela
+                   sincronizacao_estado; a janela seguinte começa SOBREPOSICAO
+                   segundos antes dela, para tolerar diferença de relógio
+    páginas        a primeira é lida sozinha (traz X-Total-Count) e as demais em
+                   paralelo num pool de threads (NUVEMSHOP_CONCORRENCIA, padrão 4)
+    limite         os cabeçalhos X-Rate-Limit-* mantêm as threads abaixo do balde
+                   da API; 429 e erros 5xx/rede são repetidos com backoff exponencial
+    gravação       cada página é gravada assim que chega (importacao.gravar_atualizando);
+                   pedidos alterados atualizam a linha existente e mantêm o grupo
+
+A marca d'água só avança quando todos os pedidos informados pela API foram
+recebidos: se a paginação "andar" durante a leitura, a próxima execução relê a
+mesma janela (gravar de novo é inofensivo).
+
+Configuração: NUVEMSHOP_LOJA_ID, NUVEMSHOP_TOKEN e, para testes, NUVEMSHOP_API_URL
+(ver benchmarks/nuvemshop_falsa.py, que serve páginas de fixture localmente).
+
+Exemplo:
+    python sincronizacao.py --banco pedidos.db
+    python sincronizacao.py --banco pedidos.db --completa
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+from flask import jsonify, request
+
+import importacao
+from admin import requer_admin
+
+logger = logging.getLogger('pedidos.sincronizacao')
+
+API_URL = os.environ.get('NUVEMSHOP_API_URL', 'https://api.nuvemshop.com.br/v1')
+LOJA_ID = os.environ.get('NUVEMSHOP_LOJA_ID', '')
+TOKEN = os.environ.get('NUVEMSHOP_TOKEN', '')
+CONCORRENCIA = int(os.environ.get('NUVEMSHOP_CONCORRENCIA', '4'))
+USER_AGENT = os.environ.get('NUVEMSHOP_USER_AGENT', 'Gerenciador de Pedidos (suporte@exemplo.com.br)')
+
+POR_PAGINA = 200
+MAX_TENTATIVAS = 6
+ESPERA_MAXIMA = 30.0
+TIMEOUT = 30
+SOBREPOSICAO = 300
+
+CHAVE_MARCA = 'nuvemshop_updated_at'
+CHAVE_RESUMO = 'nuvemshop_ultimo_resumo'
+
+STATUS_PEDIDO = {'open': 'Aberto', 'closed': 'Fechado', 'cancelled': 'Cancelado'}
+STATUS_PAGAMENTO = {'paid': 'Confirmado', 'pending': 'Pendente', 'authorized': 'Autorizado',
+                    'refunded': 'Reembolsado', 'voided': 'Cancelado', 'abandoned': 'Abandonado'}
+STATUS_ENVIO = {'unpacked': 'Não está embalado', 'unfulfilled': 'Não está embalado',
+                'packed': 'Pronto para enviar', 'fulfilled': 'Enviado', 'shipped': 'Enviado',
+                'delivered': 'Entregue'}
+
+
+class ErroSincronizacao(Exception):
+    """Falha que impede a sincronização (configuração, autenticação, API fora do ar)"""
+
+
+def criar_estado(cursor):
+    """Cria a tabela de estado da sincronização (chamado pelo init_db)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sincronizacao_estado (
+            chave TEXT PRIMARY KEY,
+            valor TEXT,
+            atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def ler_estado(conn, chave):
+    linha = conn.execute('SELECT valor FROM sincronizacao_estado WHERE chave = ?', (chave,)).fetchone()
+    return linha[0] if linha else None
+
+
+def gravar_estado(conn, chave, valor):
+    conn.execute('INSERT INTO sincronizacao_estado (chave, valor) VALUES (?, ?) '
+                 'ON CONFLICT (chave) DO UPDATE SET valor = excluded.valor, '
+                 'atualizado_em = CURRENT_TIMESTAMP', (chave, valor))
+
+
+class LimiteTaxa:
+    """Compartilhado pelas threads: pausa todas quando o balde da API está quase cheio"""
+
+    def __init__(self, reserva):
+        self.reserva = reserva
+        self._liberado_em = 0.0
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        with self._lock:
+            espera = self._liberado_em - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+
+    def pausar(self, segundos):
+        with self._lock:
+            self._liberado_em = max(self._liberado_em, time.monotonic() + segundos)
+
+    def atualizar(self, cabecalhos):
+        """Lê X-Rate-Limit-Limit/Remaining/Reset (ms até o balde esvaziar)"""
+        try:
+            limite = int(cabecalhos['X-Rate-Limit-Limit'])
+            restantes = int(cabecalhos['X-Rate-Limit-Remaining'])
+            reset = int(cabecalhos['X-Rate-Limit-Reset']) / 1000
+        except (KeyError, TypeError, ValueError):
+            return
+        if restantes >= self.reserva or reset <= 0:
+            return
+        # O balde esvazia a uma taxa constante: espera o suficiente para abrir `reserva` vagas
+        taxa = (limite - restantes) / reset
+        self.pausar((self.reserva - restantes) / taxa)
+
+
+class ClienteNuvemshop:
+    """Cliente mínimo da API de pedidos, seguro para uso em várias threads"""
+
+    def __init__(self, loja_id=None, token=None, url_base=None, concorrencia=None):
+        self.loja_id = loja_id or LOJA_ID
+        self.token = token or TOKEN
+        self.url_base = (url_base or API_URL).rstrip('/')
+        self.concorrencia = max(1, concorrencia or CONCORRENCIA)
+        self.limite = LimiteTaxa(self.concorrencia)
+        self.requisicoes = 0
+        self.repeticoes = 0
+        if not self.loja_id or not self.token:
+            raise ErroSincronizacao('Defina NUVEMSHOP_LOJA_ID e NUVEMSHOP_TOKEN')
+
+    def _espera(self, tentativa):
+        return min(ESPERA_MAXIMA, 0.5 * 2 ** tentativa) * random.uniform(0.5, 1.0)
+
+    def requisitar(self, caminho, parametros):
+        """GET com repetição; retorna (dados, cabeçalhos) ou (None, cabeçalhos) no 404"""
+        url = f'{self.url_base}/{self.loja_id}/{caminho}'
+        if parametros:
+            url += '?' + urllib.parse.urlencode(parametros)
+        requisicao = urllib.request.Request(url, headers={
+            'Authentication': f'bearer {self.token}',
+            'User-Agent': USER_AGENT,
+            'Accept': 'application/json',
+        })
+        for tentativa in range(MAX_TENTATIVAS):
+            self.limite.aguardar()
+            self.requisicoes += 1
+            try:
+                with urllib.request.urlopen(requisicao, timeout=TIMEOUT) as resposta:
+                    self.limite.atualizar(resposta.headers)
+                    return json.load(resposta), resposta.headers
+            except urllib.error.HTTPError as e:
+                self.limite.atualizar(e.headers)
+                if e.code == 404:
+                    # A API responde 404 ao pedir uma página além da última
+                    return None, e.headers
+                if e.code in (401, 403):
+                    raise ErroSincronizacao(f'Acesso negado pela API da Nuvemshop ({e.code})') from e
+                if e.code != 429 and e.code < 500:
+                    raise ErroSincronizacao(f'Erro {e.code} da API da Nuvemshop: {e.read()[:200]!r}') from e
+                espera = self._espera(tentativa)
+                if e.code == 429:
+                    try:
+                        espera = max(espera, float(e.headers.get('Retry-After', 0)))
+                    except ValueError:
+                        pass
+                    self.limite.pausar(espera)
+                erro = e
+            except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+                espera = self._espera(tentativa)
+                erro = e
+            self.repeticoes += 1
+            logger.debug('Tentativa %d de %s falhou (%s); nova tentativa em %.1fs',
+                         tentativa + 1, url, erro, espera)
+            time.sleep(espera)
+        raise ErroSincronizacao(f'API da Nuvemshop indisponível após {MAX_TENTATIVAS} tentativas: {erro}')
+
+    def buscar_pedidos(self, ids):
+        """Busca vários pedidos pelo id da API em paralelo
+
+        Retorna {id: pedido}, com None para os que não existem mais e a exceção
+        para os que falharam.
+        """
+        resultado = {}
+        with ThreadPoolExecutor(self.concorrencia, thread_name_prefix='nuvemshop') as executor:
+            futuros = {executor.submit(self.requisitar, f'orders/{i}', {}): i for i in ids}
+            for futuro in as_completed(futuros):
+                try:
+                    resultado[futuros[futuro]] = futuro.result()[0]
+                except ErroSincronizacao as e:
+                    resultado[futuros[futuro]] = e
+        return resultado
+
+    def paginas_pedidos(self, desde=None, ate=None):
+        """Gera (número da página, pedidos) de todos os pedidos alterados na janela
+
+        As páginas a partir da segunda chegam fora de ordem, conforme terminam.
+        Antes de tudo gera (0, total informado pela API).
+        """
+        parametros = {'per_page': POR_PAGINA}
+        if desde:
+            parametros['updated_at_min'] = desde
+        if ate:
+            parametros['updated_at_max'] = ate
+
+        primeira, cabecalhos = self.requisitar('orders', dict(parametros, page=1))
+        primeira = primeira or []
+        try:
+            total = int(cabecalhos.get('X-Total-Count'))
+        except (TypeError, ValueError):
+            total = None
+        yield 0, total
+        yield 1, primeira
+        if total is None or total <= len(primeira):
+            # Sem contagem: segue página a página até uma vazia
+            if total is None and len(primeira) == POR_PAGINA:
+                pagina = 2
+                while True:
+                    pedidos, _ = self.requisitar('orders', dict(parametros, page=pagina))
+                    if not pedidos:
+                        return
+                    yield pagina, pedidos
+                    pagina += 1
+            return
+
+        ultima = -(-total // POR_PAGINA)
+        with ThreadPoolExecutor(self.concorrencia, thread_name_prefix='nuvemshop') as executor:
+            futuros = {executor.submit(self.requisitar, 'orders', dict(parametros, page=pagina)): pagina
+                       for pagina in range(2, ultima + 1)}
+            try:
+                for futuro in as_completed(futuros):
+                    pedidos, _ = futuro.result()
+                    yield futuros[futuro], pedidos or []
+            finally:
+                for futuro in futuros:
+                    futuro.cancel()
+
+
+def _valor(dados, *caminho):
+    for chave in caminho:
+        if not isinstance(dados, dict):
+            return ''
+        dados = dados.get(chave)
+    return '' if dados is None else dados
+
+
+def _numero(valor):
+    try:
+        return float(valor or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _data(valor, formato='%d/%m/%Y %H:%M:%S'):
+    """Converte o ISO 8601 da API para o formato da exportação em CSV"""
+    if not valor:
+        return ''
+    try:
+        return datetime.fromisoformat(valor).strftime(formato)
+    except ValueError:
+        return str(valor)
+
+
+def converter(pedido):
+    """Converte um pedido da API em (numero_pedido, itens), como importacao.transformar"""
+    numero_pedido = str(pedido['number'])
+    entrega = pedido.get('shipping_address') or {}
+    forma_entrega = pedido.get('shipping_option') or ''
+    if isinstance(forma_entrega, dict):
+        forma_entrega = forma_entrega.get('name') or ''
+
+    dados = {
+        'email': _valor(pedido, 'contact_email') or _valor(pedido, 'customer', 'email'),
+        'data_pedido': _data(pedido.get('created_at')),
+        'status_pedido': STATUS_PEDIDO.get(pedido.get('status'), pedido.get('status') or ''),
+        'status_pagamento': STATUS_PAGAMENTO.get(pedido.get('payment_status'), pedido.get('payment_status') or ''),
+        'status_envio': STATUS_ENVIO.get(pedido.get('shipping_status'), pedido.get('shipping_status') or ''),
+        'moeda': pedido.get('currency') or '',
+        'subtotal': _numero(pedido.get('subtotal')),
+        'desconto': _numero(pedido.get('discount')),
+        'valor_frete': _numero(pedido.get('shipping_cost_customer')),
+        'total': _numero(pedido.get('total')),
+        'nome_comprador': _valor(pedido, 'customer', 'name') or _valor(pedido, 'contact_name'),
+        'cpf_cnpj': _valor(pedido, 'contact_identification') or _valor(pedido, 'customer', 'identification'),
+        'telefone': _valor(pedido, 'contact_phone') or _valor(pedido, 'customer', 'phone'),
+        'nome_entrega': entrega.get('name') or '',
+        'telefone_entrega': entrega.get('phone') or '',
+        'endereco': entrega.get('address') or '',
+        'numero': entrega.get('number') or '',
+        'complemento': entrega.get('floor') or '',
+        'bairro': entrega.get('locality') or '',
+        'cidade': entrega.get('city') or '',
+        'codigo_postal': entrega.get('zipcode') or '',
+        'estado': entrega.get('province') or '',
+        'pais': entrega.get('country') or '',
+        'forma_entrega': forma_entrega,
+        'forma_pagamento': _valor(pedido, 'payment_details', 'method') or pedido.get('gateway_name') or '',
+        'cupom_desconto': ', '.join(c.get('code', '') for c in pedido.get('coupon') or []),
+        'anotacoes_comprador': pedido.get('note') or '',
+        'anotacoes_vendedor': pedido.get('owner_note') or '',
+        'data_pagamento': _data(pedido.get('paid_at'), '%d/%m/%Y'),
+        'data_envio': _data(pedido.get('shipped_at'), '%d/%m/%Y'),
+    }
+    tipo_frete = importacao.classificar_frete(forma_entrega)
+
+    itens = []
+    for i, produto in enumerate(pedido.get('products') or []):
+        id_produto = f"{numero_pedido}_{i+1}" if i > 0 else numero_pedido
+        nome_produto = str(produto.get('name') or '').strip()
+        completo = dict(dados, numero_pedido=id_produto, nome_produto=nome_produto,
+                        valor_produto=_numero(produto.get('price')))
+        itens.append((
+            id_produto,
+            tuple(completo[c] for c in importacao.COLUNAS_PEDIDOS_COMPLETOS),
+            (id_produto, dados['nome_comprador'], nome_produto,
+             importacao.extrair_tamanho(nome_produto) if nome_produto else 'M', tipo_frete),
+        ))
+    return numero_pedido, itens
+
+
+def _iso(momento):
+    return momento.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+
+def sincronizar(conn, cliente, completa=False):
+    """Busca os pedidos alterados desde a última execução e grava; retorna o resumo
+
+    Com completa=True ignora a marca d'água e relê todos os pedidos da loja.
+    """
+    marca = None if completa else ler_estado(conn, CHAVE_MARCA)
+    fim = datetime.now(timezone.utc).replace(microsecond=0)
+    desde = None
+    if marca:
+        desde = _iso(datetime.fromisoformat(marca) - timedelta(seconds=SOBREPOSICAO))
+
+    resumo = {'desde': desde, 'ate': _iso(fim), 'total_api': None, 'paginas': 0, 'pedidos': 0,
+              'importados': 0, 'atualizados': 0, 'inalterados': 0, 'erros': 0, 'tempos': {}}
+    inicio = time.perf_counter()
+    tempo_gravar = 0.0
+    vistos = set()
+    ignorados = 0
+
+    for pagina, pedidos in cliente.paginas_pedidos(desde, resumo['ate']):
+        if pagina == 0:
+            resumo['total_api'] = pedidos
+            continue
+        resumo['paginas'] += 1
+        convertidos = []
+        for pedido in pedidos:
+            try:
+                convertidos.append(converter(pedido))
+            except (KeyError, TypeError, AttributeError) as e:
+                ignorados += 1
+                resumo['erros'] += 1
+                logger.warning('Pedido %s da API ignorado: %s', pedido.get('id'), e)
+                continue
+            vistos.add(pedido.get('id', pedido['number']))
+
+        marca_gravar = time.perf_counter()
+        importacao.gravar_atualizando(conn, convertidos, resumo)
+        conn.commit()
+        tempo_gravar += time.perf_counter() - marca_gravar
+    resumo['pedidos'] = len(vistos)
+
+    completo = resumo['total_api'] is None or len(vistos) + ignorados >= resumo['total_api']
+    resumo['marca_avancou'] = completo
+    if completo:
+        gravar_estado(conn, CHAVE_MARCA, resumo['ate'])
+    else:
+        logger.warning('Recebidos %d de %d pedidos informados pela API; a janela será relida',
+                       len(vistos), resumo['total_api'])
+
+    resumo['requisicoes'] = cliente.requisicoes
+    resumo['repeticoes'] = cliente.repeticoes
+    resumo['tempos'] = {'gravar': tempo_gravar, 'total': time.perf_counter() - inicio}
+    gravar_estado(conn, CHAVE_RESUMO, json.dumps(resumo))
+    conn.commit()
+
+    logger.info('Sincronização concluída: %d pedidos (%d itens novos, %d atualizados) em %.2fs',
+                resumo['pedidos'], resumo['importados'], resumo['atualizados'], resumo['tempos']['total'],
+                extra={'evento': 'sincronizacao', 'resumo': resumo})
+    return resumo
+
+
+# Impede duas sincronizações simultâneas no mesmo processo
+_em_andamento = threading.Lock()
+
+
+def init_app(app, obter_conexao):
+    """Registra /admin/sincronizacao (GET mostra o estado, POST sincroniza)"""
+
+    @app.route('/admin/sincronizacao', methods=['GET', 'POST'])
+    @requer_admin
+    def sincronizacao():
+        """Estado da sincronização com a Nuvemshop; POST executa uma agora"""
+        conn = obter_conexao()
+        try:
+            if request.method == 'GET':
+                resumo = ler_estado(conn, CHAVE_RESUMO)
+                return jsonify({'marca': ler_estado(conn, CHAVE_MARCA),
+                                'ultimo_resumo': json.loads(resumo) if resumo else None})
+
+            if not _em_andamento.acquire(blocking=False):
+                return jsonify({'erro': 'Sincronização já em andamento'}), 409
+            try:
+                cliente = ClienteNuvemshop()
+                resumo = sincronizar(conn, cliente, completa=request.args.get('completa') == '1')
+            except ErroSincronizacao as e:
+                return jsonify({'erro': str(e)}), 502
+            finally:
+                _em_andamento.release()
+            return jsonify(resumo)
+        finally:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sincroniza os pedidos da Nuvemshop com o banco local')
+    parser.add_argument('--banco', default='pedidos.db', help='Arquivo SQLite (já inicializado pelo app)')
+    parser.add_argument('--completa', action='store_true', help="Ignora a marca d'água e relê tudo")
+    parser.add_argument('--api', help='URL base da API (padrão: NUVEMSHOP_API_URL)')
+    parser.add_argument('--concorrencia', type=int, help='Páginas buscadas em paralelo')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    conn = sqlite3.connect(args.banco)
+    criar_estado(conn.cursor())
+    try:
+        cliente = ClienteNuvemshop(url_base=args.api, concorrencia=args.concorrencia)
+        resumo = sincronizar(conn, cliente, completa=args.completa)
+    except ErroSincronizacao as e:
+        parser.exit(1, f'Erro: {e}\n')
+    finally:
+        conn.close()
+    print(json.dumps(resumo, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
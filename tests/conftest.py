@@ -0,0 +1,90 @@
+"""
+Fixtures dos testes: cada teste recebe um app novo sobre um banco próprio
+
+    python -m pytest -q
+
+Com TEST_DATABASE_URL=postgresql://... os testes rodam também com o PostgreSQL
+(RepositorioPostgres). O schema public desse banco é apagado antes de cada teste:
+use um banco só para isso. Sem a variável a versão PostgreSQL de cada teste é
+pulada. Testes marcados com @pytest.mark.sqlite cobrem módulos que só existem no
+SQLite (API, eventos, arquivamento, instantâneo) e rodam só com ele.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Lidos na importação dos módulos: métricas, perfis e a fila de webhooks ficam fora do projeto
+_TEMPORARIO = tempfile.mkdtemp(prefix='pedidos_testes_')
+os.environ.setdefault('METRICAS_DIR', os.path.join(_TEMPORARIO, 'metricas'))
+os.environ.setdefault('PERFIS_DIR', os.path.join(_TEMPORARIO, 'perfis'))
+os.environ.setdefault('WEBHOOKS_FILA', os.path.join(_TEMPORARIO, 'webhooks.db'))
+
+import cache_fragmentos  # noqa: E402
+import repositorio  # noqa: E402
+import gerenciador  # noqa: E402
+from benchmarks import gerador  # noqa: E402
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'sqlite: usa módulos que só existem no SQLite')
+
+
+def _recriar_schema(url):
+    """Apaga as tabelas deixadas pelo teste anterior no PostgreSQL de teste"""
+    repo = repositorio.RepositorioPostgres(url, minimo=1, maximo=1)
+    try:
+        with repo.transacao() as conn:
+            conn.execute('DROP SCHEMA IF EXISTS public CASCADE')
+            conn.execute('CREATE SCHEMA public')
+    finally:
+        repo.fechar()
+
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def app(request, tmp_path, monkeypatch):
+    url = None
+    if request.param == 'postgresql':
+        if request.node.get_closest_marker('sqlite'):
+            pytest.skip('só no SQLite')
+        if not TEST_DATABASE_URL:
+            pytest.skip('TEST_DATABASE_URL não definida')
+        url = TEST_DATABASE_URL
+        _recriar_schema(url)
+
+    # Sem ADMIN_TOKEN o modo de teste libera as rotas admin e a API
+    monkeypatch.delenv('ADMIN_TOKEN', raising=False)
+    # Cartões de grupo guardados por outro teste teriam os mesmos ids e versões
+    cache_fragmentos.memoria.limpar()
+    app = gerenciador.create_app({'TESTING': True, 'DATABASE': str(tmp_path / 'pedidos.db'),
+                                  'DATABASE_URL': url})
+    yield app
+    if url:
+        app.extensions['repo'].fechar()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def repo(app):
+    return app.extensions['repo']
+
+
+@pytest.fixture
+def csv_nuvemshop(tmp_path):
+    """Escreve um CSV da exportação da Nuvemshop e retorna os bytes (ver benchmarks/gerador.py)"""
+    def escrever(total, semente=42, proporcao_expresso=0.2):
+        caminho = tmp_path / f'pedidos_{total}_{semente}.csv'
+        gerador.escrever_csv(caminho, total, semente, proporcao_expresso)
+        return caminho.read_bytes()
+    return escrever
@@ -0,0 +1,176 @@
+"""Validação das rotas em lote da API /api/v1 (api.py)"""
+
+import pytest
+
+import api
+from repositorio import LIMITE_GRUPO
+
+pytestmark = pytest.mark.sqlite
+
+
+def _pedido(id_pedido, tipo_frete='FRETE PADRÃO', **extra):
+    return dict({'id_pedido': id_pedido, 'nome_cliente': 'Ana Souza', 'produto': 'Camisa (M)',
+                 'tamanho': 'M', 'tipo_frete': tipo_frete}, **extra)
+
+
+def _criar(client, *pedidos):
+    resposta = client.post('/api/v1/pedidos/lote', json={'pedidos': list(pedidos)})
+    assert resposta.status_code == 201, resposta.get_json()
+
+
+def _ids_gravados(repo):
+    return {pedido['id_pedido'] for pedido in repo.listar_pedidos()}
+
+
+def test_criar_lote_grava_todos(client, repo):
+    resposta = client.post('/api/v1/pedidos/lote', json={'pedidos': [_pedido('1'), _pedido(2)]})
+    assert resposta.status_code == 201
+    assert resposta.get_json() == {'criados': 2}
+    assert _ids_gravados(repo) == {'1', '2'}
+
+
+@pytest.mark.parametrize('invalido, mensagem', [
+    (_pedido('9', tipo_frete='SEDEX'), 'tipo_frete deve ser um de'),
+    (_pedido('9', nome_cliente=''), 'nome_cliente é obrigatório'),
+    (_pedido('9', cor='azul'), 'campos não suportados: cor'),
+    (_pedido(True), 'id_pedido deve ser texto'),
+    (_pedido('9', produto={'nome': 'Camisa'}), 'produto deve ser texto'),
+    ('9', 'item deve ser um objeto'),
+])
+def test_criar_lote_com_item_invalido_nao_grava_nada(client, repo, invalido, mensagem):
+    resposta = client.post('/api/v1/pedidos/lote', json={'pedidos': [_pedido('1'), invalido]})
+    assert resposta.status_code == 422
+    corpo = resposta.get_json()
+    assert [item['indice'] for item in corpo['itens']] == [1]
+    assert any(mensagem in erro for erro in corpo['itens'][0]['erros'])
+    assert _ids_gravados(repo) == set()
+
+
+def test_criar_lote_rejeita_id_repetido_e_existente(client, repo):
+    _criar(client, _pedido('1'))
+    resposta = client.post('/api/v1/pedidos/lote', json={'pedidos': [_pedido('2'), _pedido('2'), _pedido('1')]})
+    assert resposta.status_code == 422
+    assert _ids_gravados(repo) == {'1'}
+
+    resposta = client.post('/api/v1/pedidos/lote', json={'pedidos': [_pedido('2'), _pedido('1')]})
+    assert resposta.status_code == 422
+    assert resposta.get_json()['itens'] == [{'indice': 1, 'erros': ['id_pedido já existe']}]
+    assert _ids_gravados(repo) == {'1'}
+
+
+@pytest.mark.parametrize('corpo, status', [
+    ({}, 400),
+    ({'pedidos': {}}, 400),
+    ({'pedidos': []}, 400),
+    ([_pedido('1')], 400),
+])
+def test_corpo_do_lote_invalido(client, corpo, status):
+    assert client.post('/api/v1/pedidos/lote', json=corpo).status_code == status
+
+
+def test_lote_acima_do_maximo(client, monkeypatch):
+    monkeypatch.setattr(api, 'MAX_ITENS_LOTE', 2)
+    resposta = client.post('/api/v1/pedidos/lote', json={'pedidos': [_pedido(str(i)) for i in range(3)]})
+    assert resposta.status_code == 413
+
+
+@pytest.mark.parametrize('grupo_id', [True, False, '1', 1.0, None])
+def test_atribuir_lote_exige_grupo_id_inteiro(client, repo, grupo_id):
+    grupo = repo.criar_grupo('Grupo 1')
+    assert grupo == 1
+    _criar(client, _pedido('1'))
+    resposta = client.post('/api/v1/grupos/lote/atribuir',
+                           json={'atribuicoes': [{'id_pedido': '1', 'grupo_id': grupo_id}]})
+    assert resposta.status_code == 422
+    assert repo.listar_pedidos()[0]['grupo_id'] is None
+
+
+def test_atribuir_lote_valida_frete_e_capacidade(client, repo):
+    grupo = repo.criar_grupo('Grupo 1')
+    _criar(client, *[_pedido(str(i)) for i in range(LIMITE_GRUPO + 1)], _pedido('X', tipo_frete='EXPRESSO'))
+
+    resposta = client.post('/api/v1/grupos/lote/atribuir',
+                           json={'atribuicoes': [{'id_pedido': 'X', 'grupo_id': grupo}]})
+    assert resposta.status_code == 422
+    assert 'FRETE PADRÃO' in resposta.get_json()['itens'][0]['erros'][0]
+
+    todos = [{'id_pedido': str(i), 'grupo_id': grupo} for i in range(LIMITE_GRUPO + 1)]
+    resposta = client.post('/api/v1/grupos/lote/atribuir', json={'atribuicoes': todos})
+    assert resposta.status_code == 422
+    assert resposta.get_json()['itens'] == [
+        {'grupo_id': grupo, 'erros': [f'grupo ficaria com {LIMITE_GRUPO + 1} pedidos (máximo {LIMITE_GRUPO})']}]
+    assert repo.contar_pedidos_grupo(grupo) == 0
+
+    resposta = client.post('/api/v1/grupos/lote/atribuir', json={'atribuicoes': todos[:LIMITE_GRUPO]})
+    assert resposta.get_json() == {'atribuidos': LIMITE_GRUPO}
+    assert repo.contar_pedidos_grupo(grupo) == LIMITE_GRUPO
+
+
+@pytest.mark.parametrize('envio', [
+    {'grupo_id': True, 'codigo_rastreio': 'AB123456789BR'},
+    {'grupo_id': 1, 'codigo_rastreio': ''},
+    {'grupo_id': 99, 'codigo_rastreio': 'AB123456789BR'},
+])
+def test_enviar_lote_invalido_nao_marca_nenhum(client, repo, envio):
+    repo.criar_grupo('Grupo 1')
+    repo.criar_grupo('Grupo 2')
+    resposta = client.post('/api/v1/grupos/lote/enviar',
+                           json={'envios': [{'grupo_id': 2, 'codigo_rastreio': 'AB000000000BR'}, envio]})
+    assert resposta.status_code == 422
+    assert not any(grupo['enviado'] for grupo in repo.listar_grupos())
+
+
+def test_enviar_lote(client, repo):
+    grupo = repo.criar_grupo('Grupo 1')
+    resposta = client.post('/api/v1/grupos/lote/enviar',
+                           json={'envios': [{'grupo_id': grupo, 'codigo_rastreio': ' AB123456789BR '}]})
+    assert resposta.get_json() == {'enviados': 1}
+    assert repo.obter_grupo(grupo)['codigo_rastreio'] == 'AB123456789BR'
+
+
+def test_excluir_lote_rejeita_ids_que_nao_sao_texto(client, repo):
+    _criar(client, _pedido('1'), _pedido('2'))
+    resposta = client.post('/api/v1/pedidos/lote/excluir', json={'ids': ['1', True]})
+    assert resposta.status_code == 422
+    assert _ids_gravados(repo) == {'1', '2'}
+
+    resposta = client.post('/api/v1/pedidos/lote/excluir', json={'ids': ['1', 2, 'inexistente']})
+    assert resposta.get_json() == {'excluidos': 2}
+
+
+@pytest.mark.parametrize('valor', ['abc', '1.5', 'true'])
+def test_listar_com_grupo_id_invalido(client, valor):
+    _criar(client, _pedido('1'))
+    resposta = client.get(f'/api/v1/pedidos?grupo_id={valor}')
+    assert resposta.status_code == 400
+    assert 'grupo_id' in resposta.get_json()['erro']
+
+
+def test_listar_por_grupo(client, repo):
+    grupo = repo.criar_grupo('Grupo 1')
+    _criar(client, _pedido('1'), _pedido('2'))
+    repo.atribuir_grupo('1', grupo)
+    resposta = client.get(f'/api/v1/pedidos?grupo_id={grupo}&campos=id_pedido')
+    assert resposta.get_json()['dados'] == [{'id_pedido': '1'}]
+
+
+def test_editar_nao_deixa_pedido_em_grupo_virar_expresso(client, repo):
+    grupo = repo.criar_grupo('Grupo 1')
+    _criar(client, _pedido('1'), _pedido('2'))
+    repo.atribuir_grupo('1', grupo)
+
+    resposta = client.patch('/api/v1/pedidos/1', json={'tipo_frete': 'EXPRESSO', 'tamanho': 'G'})
+    assert resposta.status_code == 422
+    pedido = repo.obter_pedido('1')
+    assert (pedido['tipo_frete'], pedido['tamanho'], pedido['grupo_id']) == ('FRETE PADRÃO', 'M', grupo)
+
+    # Fora de grupo a troca vale; os outros campos de um pedido em grupo também
+    assert client.patch('/api/v1/pedidos/2', json={'tipo_frete': 'EXPRESSO'}).get_json()['tipo_frete'] == 'EXPRESSO'
+    assert client.patch('/api/v1/pedidos/1', json={'tipo_frete': 'FRETE PADRÃO', 'tamanho': 'G'}).status_code == 200
+    assert client.patch('/api/v1/pedidos/inexistente', json={'tipo_frete': 'EXPRESSO'}).status_code == 404
+
+
+def test_api_exige_token(client, monkeypatch):
+    monkeypatch.setenv('ADMIN_TOKEN', 'segredo')
+    assert client.get('/api/v1/pedidos').status_code == 403
+    assert client.get('/api/v1/pedidos', headers={'X-Admin-Token': 'segredo'}).status_code == 200
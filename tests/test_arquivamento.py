@@ -0,0 +1,75 @@
+"""Arquivamento dos grupos enviados antigos (arquivamento.py)"""
+
+import pytest
+
+import cache_http
+
+pytestmark = pytest.mark.sqlite
+
+
+@pytest.fixture
+def grupo_enviado(client, repo, csv_nuvemshop):
+    """Importa 20 pedidos e monta um grupo enviado há 90 dias com dois pedidos padrão"""
+    repo.importar(csv_nuvemshop(20, proporcao_expresso=0), 'pedidos.csv')
+    ids = [pedido['id_pedido'] for pedido in repo.listar_pedidos()][:2]
+    grupo_id = repo.criar_grupo('Grupo Antigo')
+    for id_pedido in ids:
+        repo.atribuir_grupo(id_pedido, grupo_id)
+    repo.marcar_enviado(grupo_id, 'AB123456789BR')
+    with repo.transacao() as conn:
+        conn.execute("UPDATE grupos SET enviado_em = datetime('now', '-90 days') WHERE id = ?", (grupo_id,))
+    # Cartão do grupo renderizado e guardado no cache de fragmentos
+    assert 'Grupo Antigo' in client.get('/').get_data(as_text=True)
+    return grupo_id, ids
+
+
+def _versoes(repo, grupo_id):
+    with repo.transacao() as conn:
+        linha = conn.execute('SELECT versao FROM versao_grupos WHERE grupo_id = ?', (grupo_id,)).fetchone()
+        return cache_http.versao_dados(conn), linha['versao'] if linha else None
+
+
+def _arquivar(client, dias=60):
+    resposta = client.post(f'/admin/arquivamento?dias={dias}')
+    assert resposta.status_code == 200
+    return resposta.get_json()
+
+
+def test_arquivar_move_grupo_e_pedidos(client, repo, grupo_enviado):
+    grupo_id, ids = grupo_enviado
+    resumo = _arquivar(client)
+    assert (resumo['grupos'], resumo['pedidos'], resumo['pedidos_completos']) == (1, 2, 2)
+
+    assert repo.obter_grupo(grupo_id) is None
+    assert not set(ids) & {pedido['id_pedido'] for pedido in repo.listar_pedidos()}
+    arquivo = client.get('/admin/arquivamento').get_json()['arquivo']
+    assert arquivo == {'grupos': 1, 'pedidos': 2, 'pedidos_completos': 2}
+
+
+def test_grupo_recente_fica(client, repo, grupo_enviado):
+    assert _arquivar(client, dias=120)['grupos'] == 0
+    assert repo.obter_grupo(grupo_enviado[0]) is not None
+
+
+def test_arquivar_avanca_as_versoes(client, repo, grupo_enviado):
+    grupo_id, _ = grupo_enviado
+    etag = client.get('/').headers['ETag']
+    dados_antes, grupo_antes = _versoes(repo, grupo_id)
+
+    _arquivar(client)
+    dados_depois, grupo_depois = _versoes(repo, grupo_id)
+    assert dados_depois > dados_antes
+    # A linha do grupo arquivado continua, com versão maior: o cartão em cache nunca volta
+    assert grupo_depois > grupo_antes
+
+    resposta = client.get('/', headers={'If-None-Match': etag})
+    assert resposta.status_code == 200
+    assert 'Grupo Antigo' not in resposta.get_data(as_text=True)
+
+
+def test_reimportacao_nao_traz_pedidos_arquivados(client, repo, grupo_enviado, csv_nuvemshop):
+    _, ids = grupo_enviado
+    _arquivar(client)
+    resumo = repo.importar(csv_nuvemshop(20, proporcao_expresso=0), 'pedidos.csv')
+    assert resumo['importados'] == 0
+    assert not set(ids) & {pedido['id_pedido'] for pedido in repo.listar_pedidos()}
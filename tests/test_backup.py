@@ -0,0 +1,29 @@
+"""Backup a quente (backup.py): criar e verificar não deixam arquivos para trás"""
+
+import os
+
+import pytest
+
+import backup
+
+pytestmark = pytest.mark.sqlite
+
+
+def test_backup_nao_deixa_wal_nem_shm(repo, csv_nuvemshop, tmp_path, monkeypatch):
+    repo.importar(csv_nuvemshop(20), 'pedidos.csv')
+    diretorio = tmp_path / 'backups'
+    conn = repo.conectar()
+    try:
+        resumo = backup.criar(conn, str(diretorio), pausa=0)
+    finally:
+        conn.close()
+    assert os.listdir(diretorio) == [resumo['arquivo']]
+
+    # verificar restaura no diretório temporário do sistema
+    temporario = tmp_path / 'tmp'
+    temporario.mkdir()
+    monkeypatch.setattr(backup.tempfile, 'tempdir', str(temporario))
+    verificado = backup.verificar(str(diretorio / resumo['arquivo']))
+    assert verificado['integridade'] == 'ok'
+    assert verificado['contagens']['pedidos'] == len(repo.listar_pedidos())
+    assert os.listdir(temporario) == []
@@ -0,0 +1,46 @@
+"""ETags derivadas do contador de versão (cache_http.py)"""
+
+
+def test_resposta_traz_etag_sem_cache(client):
+    resposta = client.get('/')
+    assert resposta.status_code == 200
+    assert resposta.headers['ETag']
+    assert resposta.headers['Cache-Control'] == 'no-cache'
+
+
+def test_mesma_versao_responde_304_sem_corpo(client):
+    etag = client.get('/todos_pedidos').headers['ETag']
+    resposta = client.get('/todos_pedidos', headers={'If-None-Match': etag})
+    assert resposta.status_code == 304
+    assert resposta.data == b''
+    assert resposta.headers['ETag'] == etag
+
+
+def test_alteracao_nos_dados_troca_a_etag(client, repo):
+    etag = client.get('/').headers['ETag']
+    repo.criar_grupo('Grupo novo')
+    resposta = client.get('/', headers={'If-None-Match': etag})
+    assert resposta.status_code == 200
+    assert 'Grupo novo' in resposta.get_data(as_text=True)
+    assert resposta.headers['ETag'] != etag
+
+
+def test_etag_depende_da_url(client):
+    assert client.get('/').headers['ETag'] != client.get('/todos_pedidos').headers['ETag']
+    assert (client.get('/pedidos_disponiveis').headers['ETag']
+            != client.get('/pedidos_disponiveis?tipo=EXPRESSO').headers['ETag'])
+
+
+def test_mensagem_flash_pendente_sempre_renderiza(client):
+    etag = client.get('/').headers['ETag']
+    with client.session_transaction() as sessao:
+        sessao['_flashes'] = [('success', 'Mensagem pendente')]
+    resposta = client.get('/', headers={'If-None-Match': etag})
+    assert resposta.status_code == 200
+    assert 'Mensagem pendente' in resposta.get_data(as_text=True)
+
+
+def test_post_nao_usa_etag(client):
+    etag = client.get('/').headers['ETag']
+    resposta = client.post('/grupo/novo', data={'nome': 'Outro'}, headers={'If-None-Match': etag})
+    assert resposta.status_code == 302
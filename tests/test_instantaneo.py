@@ -0,0 +1,94 @@
+"""Instantâneo em colunas das listagens (instantaneo.py) contra as consultas diretas"""
+
+import pytest
+
+import instantaneo
+from repositorio import Repositorio
+
+pytestmark = pytest.mark.sqlite
+
+
+def _normalizar(linhas):
+    """Linhas como dicionários (só as colunas do instantâneo), na ordem do id"""
+    return sorted(({c: linha[c] for c in instantaneo.Instantaneo.COLUNAS} for linha in linhas),
+                  key=lambda linha: linha['id'])
+
+
+def _conferir(repo):
+    listados = repo.listar_pedidos()
+    diretos = Repositorio.listar_pedidos(repo)
+    assert _normalizar(listados) == _normalizar(diretos)
+    grupos = {linha['id_pedido']: (linha['nome_grupo'], linha['grupo_enviado']) for linha in diretos}
+    assert {linha['id_pedido']: (linha['nome_grupo'], linha['grupo_enviado']) for linha in listados} == grupos
+    datas = [linha['data_criacao'] for linha in listados]
+    assert datas == sorted(datas, reverse=True)
+
+    for tipo_frete in (None, instantaneo.PADRAO, 'EXPRESSO', 'INEXISTENTE'):
+        assert (_normalizar(repo.pedidos_sem_grupo(tipo_frete))
+                == _normalizar(Repositorio.pedidos_sem_grupo(repo, tipo_frete)))
+    livres = repo.pedidos_padrao_livres()
+    assert _normalizar(livres) == _normalizar(Repositorio.pedidos_padrao_livres(repo))
+    assert [linha['data_criacao'] for linha in livres] == sorted(linha['data_criacao'] for linha in livres)
+    assert repo.estatisticas_pedidos() == Repositorio.estatisticas_pedidos(repo)
+
+
+@pytest.fixture
+def contadores(monkeypatch):
+    monkeypatch.setattr(instantaneo, 'contadores', {'completos': 0, 'incrementais': 0})
+    return instantaneo.contadores
+
+
+def test_atualizacoes_incrementais_batem_com_o_sql(repo, csv_nuvemshop, contadores):
+    repo.importar(csv_nuvemshop(40), 'pedidos.csv')
+    _conferir(repo)
+    assert contadores == {'completos': 1, 'incrementais': 0}
+
+    livres = [linha['id_pedido'] for linha in repo.pedidos_padrao_livres()]
+    grupo_a = repo.criar_grupo('Grupo A')
+    grupo_b = repo.criar_grupo('Grupo B')
+    assert repo.mover_para_grupo(grupo_a, livres[:3])
+    repo.atribuir_grupo(livres[3], grupo_b)
+    _conferir(repo)
+
+    repo.marcar_enviado(grupo_a, 'AB123456789BR')
+    repo.remover_dos_grupos([livres[0]])
+    repo.atualizar_pedido(livres[1], 'Nome Trocado', 'Camisa Nova (GG)', 'GG', 'EXPRESSO')
+    _conferir(repo)
+
+    repo.excluir_pedidos([livres[2], livres[5]])
+    repo.criar_pedido('MANUAL-1', 'Cliente Manual', 'Camisa (P)', 'P', 'FRETE PADRÃO')
+    repo.criar_pedido('MANUAL-2', 'Cliente Novo', 'Camisa (XG)', 'XG', 'EXPRESSO')
+    _conferir(repo)
+
+    repo.excluir_grupo(grupo_b)
+    repo.marcar_pendente(grupo_a)
+    repo.importar(csv_nuvemshop(60), 'mais.csv')
+    _conferir(repo)
+
+    # Excluído e criado de novo com o mesmo id
+    repo.excluir_pedidos(['MANUAL-1'])
+    repo.criar_pedido('MANUAL-1', 'Outro Cliente', 'Camisa (M)', 'M', 'EXPRESSO')
+    _conferir(repo)
+
+    assert contadores['completos'] == 1
+    assert contadores['incrementais'] == 5
+
+
+def test_muitas_alteracoes_leem_tudo(repo, csv_nuvemshop, contadores, monkeypatch):
+    repo.importar(csv_nuvemshop(20), 'pedidos.csv')
+    _conferir(repo)
+    monkeypatch.setattr(instantaneo, 'MAX_ALTERADOS', 5)
+    repo.importar(csv_nuvemshop(40), 'mais.csv')
+    _conferir(repo)
+    assert contadores == {'completos': 2, 'incrementais': 0}
+
+
+def test_limpeza_le_tudo_de_novo(repo, csv_nuvemshop, contadores):
+    repo.importar(csv_nuvemshop(20), 'pedidos.csv')
+    _conferir(repo)
+    repo.limpar()
+    _conferir(repo)
+    assert repo.listar_pedidos() == []
+    repo.criar_pedido('1', 'Cliente', 'Camisa (M)', 'M', 'FRETE PADRÃO')
+    _conferir(repo)
+    assert contadores == {'completos': 2, 'incrementais': 1}
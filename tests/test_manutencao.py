@@ -0,0 +1,72 @@
+"""Limpeza do banco (manutencao.resetar) e manutenção"""
+
+import pytest
+
+import cache_http
+import eventos
+
+
+def _versoes(repo):
+    with repo.transacao() as conn:
+        # O log de alterações (/eventos) só existe no SQLite
+        return (cache_http.versao_dados(conn),
+                dict(conn.execute('SELECT grupo_id, versao FROM versao_grupos').fetchall()),
+                eventos.ultimo_evento(conn) if repo.sqlite else None)
+
+
+def _popular(client, repo, csv_nuvemshop):
+    repo.importar(csv_nuvemshop(10, proporcao_expresso=0), 'pedidos.csv')
+    grupo_id = repo.criar_grupo('Grupo Velho')
+    for pedido in repo.listar_pedidos()[:3]:
+        repo.atribuir_grupo(pedido['id_pedido'], grupo_id)
+    assert 'Grupo Velho' in client.get('/').get_data(as_text=True)
+    return grupo_id
+
+
+def test_limpar_apaga_os_dados(client, repo, csv_nuvemshop):
+    _popular(client, repo, csv_nuvemshop)
+    assert client.get('/limpar_todos_dados').status_code == 302
+    assert repo.listar_pedidos() == []
+    assert repo.listar_grupos() == []
+    # A importação volta a gravar tudo num banco limpo
+    assert repo.importar(csv_nuvemshop(10, proporcao_expresso=0), 'pedidos.csv')['importados'] > 0
+
+
+def test_limpar_mantem_os_contadores_de_versao(client, repo, csv_nuvemshop):
+    grupo_id = _popular(client, repo, csv_nuvemshop)
+    dados_antes, grupos_antes, evento_antes = _versoes(repo)
+    etag = client.get('/').headers['ETag']
+
+    repo.limpar()
+    dados_depois, grupos_depois, evento_depois = _versoes(repo)
+    assert dados_depois > dados_antes
+    assert grupos_depois == {grupo: versao + 1 for grupo, versao in grupos_antes.items()}
+    if repo.sqlite:
+        assert evento_depois > evento_antes
+    assert client.get('/', headers={'If-None-Match': etag}).status_code == 200
+
+    # O id do grupo recomeça do 1, mas a versão segue adiante: o cartão antigo não é reaproveitado
+    assert repo.criar_grupo('Grupo Novo') == grupo_id
+    assert _versoes(repo)[1][grupo_id] > grupos_antes[grupo_id]
+    pagina = client.get('/').get_data(as_text=True)
+    assert 'Grupo Novo' in pagina
+    assert 'Grupo Velho' not in pagina
+
+
+@pytest.mark.sqlite
+def test_limpar_faz_o_dashboard_ao_vivo_recarregar(repo, csv_nuvemshop, client):
+    _popular(client, repo, csv_nuvemshop)
+    evento_antes = _versoes(repo)[2]
+    repo.limpar()
+    with repo.transacao() as conn:
+        assert eventos.ler_alteracoes(conn, evento_antes) is None
+
+
+@pytest.mark.sqlite
+def test_manutencao_registra_a_execucao(client, repo, csv_nuvemshop):
+    _popular(client, repo, csv_nuvemshop)
+    resumo = client.post('/admin/manutencao?analisar=1&vacuum=1').get_json()
+    assert resumo['analisado']
+    estado = client.get('/admin/manutencao').get_json()
+    assert estado['alteracoes_pendentes'] == 0
+    assert estado['ultima'] == resumo
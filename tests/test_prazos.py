@@ -0,0 +1,28 @@
+"""Prazo das requisições (prazos.py)"""
+
+import pytest
+
+import prazos
+
+pytestmark = pytest.mark.sqlite
+
+
+@pytest.fixture
+def prazo_esgotado(monkeypatch):
+    """Prazo padrão já vencido e conferido a cada passo: qualquer SQL de uma rota com prazo é interrompido"""
+    monkeypatch.setattr(prazos, 'PRAZO_REQUISICAO', -1)
+    monkeypatch.setattr(prazos, 'PASSOS', 1)
+
+
+def test_rota_comum_respeita_o_prazo(client, prazo_esgotado):
+    assert client.get('/todos_pedidos').status_code == 503
+
+
+@pytest.mark.parametrize('rota', ['/admin/manutencao?vacuum=1', '/admin/arquivamento'])
+def test_trabalhos_do_admin_nao_tem_prazo(client, repo, csv_nuvemshop, prazo_esgotado, rota):
+    repo.importar(csv_nuvemshop(50), 'pedidos.csv')
+    assert client.post(rota).status_code == 200
+
+
+def test_sincronizacao_nao_tem_prazo(client, prazo_esgotado):
+    assert client.get('/admin/sincronizacao').status_code == 200
@@ -0,0 +1,85 @@
+"""Prévia da importação e confirmação (previa.py)"""
+
+import io
+import threading
+
+import previa
+
+
+def _enviar_previa(client, dados):
+    resposta = client.post('/importar_csv', data={'arquivo': (io.BytesIO(dados), 'pedidos.csv'),
+                                                  'acao': 'previa'})
+    assert resposta.status_code == 302
+    return resposta.headers['Location'].rsplit('/', 1)[1]
+
+
+def _total_pedidos(repo):
+    return len(repo.listar_pedidos())
+
+
+def test_previa_nao_grava_e_classifica(client, repo, csv_nuvemshop):
+    repo.importar(csv_nuvemshop(5), 'parte.csv')
+    antes = _total_pedidos(repo)
+    token = _enviar_previa(client, csv_nuvemshop(10))
+    assert _total_pedidos(repo) == antes
+
+    dados = repo.previa_importacao(token)
+    assert dados['contagens']['duplicado'] == antes
+    assert dados['contagens']['novo'] > 0
+    assert dados['contagens']['alterado'] == dados['contagens']['arquivado'] == 0
+    assert client.get(f'/importar_csv/previa/{token}').status_code == 200
+
+
+def test_confirmar_duas_vezes_grava_uma_vez(client, repo, csv_nuvemshop):
+    token = _enviar_previa(client, csv_nuvemshop(10))
+    novos = repo.previa_importacao(token)['contagens']['novo']
+
+    resposta = client.post(f'/importar_csv/previa/{token}/confirmar', follow_redirects=True)
+    assert f'{novos} pedidos importados' in resposta.get_data(as_text=True)
+    assert _total_pedidos(repo) == novos
+
+    resposta = client.post(f'/importar_csv/previa/{token}/confirmar')
+    assert resposta.status_code == 302
+    assert resposta.headers['Location'].endswith('/importar_csv')
+    with client.session_transaction() as sessao:
+        assert 'Prévia não encontrada' in sessao['_flashes'][0][1]
+    assert _total_pedidos(repo) == novos
+    assert repo.previa_importacao(token) is None
+
+
+def test_confirmacoes_simultaneas_gravam_uma_vez(repo, csv_nuvemshop):
+    token = repo.preparar_importacao(csv_nuvemshop(50), 'pedidos.csv')
+    novos = repo.previa_importacao(token)['contagens']['novo']
+    resultados = []
+    barreira = threading.Barrier(4)
+
+    def confirmar():
+        barreira.wait()
+        resultados.append(repo.confirmar_importacao(token))
+
+    threads = [threading.Thread(target=confirmar) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    concluidas = [resumo for resumo in resultados if resumo is not None]
+    assert len(resultados) == 4
+    assert len(concluidas) == 1
+    assert concluidas[0]['importados'] == novos
+    assert _total_pedidos(repo) == novos
+
+
+def test_descartada_nao_confirma(client, repo, csv_nuvemshop):
+    token = _enviar_previa(client, csv_nuvemshop(10))
+    assert client.post(f'/importar_csv/previa/{token}/descartar').status_code == 302
+    assert repo.confirmar_importacao(token) is None
+    assert _total_pedidos(repo) == 0
+
+
+def test_previa_expirada(repo, csv_nuvemshop, monkeypatch):
+    token = repo.preparar_importacao(csv_nuvemshop(10), 'pedidos.csv')
+    monkeypatch.setattr(previa, 'VALIDADE', -1)
+    assert repo.previa_importacao(token) is None
+    assert repo.confirmar_importacao(token) is None
+    assert _total_pedidos(repo) == 0
@@ -0,0 +1,99 @@
+"""Leitura e aplicação dos códigos de rastreio em lote (rastreio_lote.py)"""
+
+import io
+
+import pytest
+
+import rastreio_lote
+
+
+@pytest.mark.parametrize('linha, esperado', [
+    ('Grupo 12;AB123456789BR', ('Grupo 12', 'AB123456789BR')),
+    ('37,AB987654321BR', ('37', 'AB987654321BR')),
+    ('Grupo 13\tAB555555555BR', ('Grupo 13', 'AB555555555BR')),
+    ('Grupo 13    AB555555555BR', ('Grupo 13', 'AB555555555BR')),
+    ('"Grupo; com ponto e vírgula";AB1', ('Grupo; com ponto e vírgula', 'AB1')),
+    ('  Grupo 1 ;  ab123456789br  ', ('Grupo 1', 'ab123456789br')),
+    ('Grupo14', ('Grupo14', '')),
+])
+def test_ler_linhas_separadores(linha, esperado):
+    assert rastreio_lote.ler_linhas(linha) == [(1,) + esperado]
+
+
+def test_ler_linhas_pula_cabecalho_e_linhas_vazias():
+    texto = 'grupo;codigo_rastreio\n\n1;AB123456789BR\r\n   \n2;AB987654321BR\n'
+    assert rastreio_lote.ler_linhas(texto) == [(3, '1', 'AB123456789BR'), (5, '2', 'AB987654321BR')]
+
+
+@pytest.mark.parametrize('texto', ['', '  \n\n '])
+def test_ler_linhas_vazio(texto):
+    with pytest.raises(rastreio_lote.ErroRastreioLote):
+        rastreio_lote.ler_linhas(texto)
+
+
+def test_ler_linhas_limite(monkeypatch):
+    monkeypatch.setattr(rastreio_lote, 'MAX_LINHAS', 2)
+    with pytest.raises(rastreio_lote.ErroRastreioLote):
+        rastreio_lote.ler_linhas('1;A1234\n2;B1234\n3;C1234')
+
+
+@pytest.mark.parametrize('dados', ['Grupo São João;AB123456789BR'.encode('utf-8'),
+                                   '﻿Grupo São João;AB123456789BR'.encode('utf-8'),
+                                   'Grupo São João;AB123456789BR'.encode('iso-8859-1')])
+def test_decodificar(dados):
+    assert rastreio_lote.decodificar(dados) == 'Grupo São João;AB123456789BR'
+
+
+def _aplicar(repo, texto, parcial=False):
+    with repo.transacao(exclusiva=True) as conn:
+        return rastreio_lote.aplicar(conn, rastreio_lote.ler_linhas(texto), parcial)
+
+
+def test_aplicar_resolve_id_e_nome(repo):
+    repo.criar_grupo('Grupo A')
+    repo.criar_grupo('Grupo B')
+    resultados, atualizados = _aplicar(repo, '1;ab123456789br\ngrupo b;CD123456789BR')
+    assert atualizados == 2
+    assert [r['status'] for r in resultados] == ['ok', 'ok']
+    grupos = {grupo['nome']: grupo for grupo in repo.listar_grupos()}
+    assert grupos['Grupo A']['codigo_rastreio'] == 'AB123456789BR'
+    assert grupos['Grupo B']['codigo_rastreio'] == 'CD123456789BR'
+    assert grupos['Grupo A']['enviado'] and grupos['Grupo B']['enviado']
+
+
+def test_aplicar_com_erro_nao_grava_nada(repo):
+    repo.criar_grupo('Grupo A')
+    repo.criar_grupo('Repetido')
+    repo.criar_grupo('Repetido')
+    texto = '\n'.join(['1;AB123456789BR', 'Inexistente;CD123456789BR', 'Repetido;EF123456789BR',
+                       '1;XY!', '1;AB123456789BR'])
+    resultados, atualizados = _aplicar(repo, texto)
+    assert atualizados == 0
+    assert [r['status'] for r in resultados] == ['pendente', 'erro', 'erro', 'erro', 'ignorado']
+    assert resultados[2]['mensagem'] == '2 grupos com esse nome; use o id'
+    assert not any(grupo['enviado'] for grupo in repo.listar_grupos())
+
+    _, atualizados = _aplicar(repo, texto, parcial=True)
+    assert atualizados == 1
+    assert repo.obter_grupo(1)['codigo_rastreio'] == 'AB123456789BR'
+
+
+def test_aplicar_codigo_de_outro_grupo(repo):
+    repo.criar_grupo('Grupo A')
+    repo.criar_grupo('Grupo B')
+    repo.marcar_enviado(1, 'AB123456789BR')
+    resultados, atualizados = _aplicar(repo, '2;ab123456789br')
+    assert atualizados == 0
+    assert resultados[0]['mensagem'] == 'Código já usado no grupo Grupo A (id 1)'
+
+    resultados, _ = _aplicar(repo, '1;CD123456789BR\n1;EF123456789BR')
+    assert resultados[1]['mensagem'] == 'Grupo já recebeu o código CD123456789BR neste envio'
+
+
+def test_rota_com_arquivo(client, repo):
+    repo.criar_grupo('Grupo São João')
+    resposta = client.post('/grupos/rastreio_lote', data={
+        'arquivo': (io.BytesIO('grupo;codigo\nGrupo São João;AB123456789BR'.encode('iso-8859-1')),
+                    'codigos.csv')})
+    assert resposta.status_code == 200
+    assert repo.obter_grupo(1)['codigo_rastreio'] == 'AB123456789BR'
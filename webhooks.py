@@ -0,0 +1,372 @@
+"""
+Recebimento de webhooks de pedidos da Nuvemshop
+
+A Nuvemshop avisa por POST quando um pedido é criado, pago, embalado, enviado,
+cancelado... O corpo traz só {"store_id", "event", "id"}; os dados do pedido são
+buscados na API depois.
+
+    receber     POST /webhooks/nuvemshop confere a assinatura HMAC-SHA256 do corpo
+                (cabeçalho X-Linkedstore-Hmac-Sha256, com o segredo do app), grava o
+                evento na fila e responde 200 na hora
+    fila        tabela webhook_fila num arquivo SQLite próprio (WEBHOOKS_FILA, padrão
+                webhooks.db, em WAL): rajadas de webhooks nunca disputam o lock de
+                escrita do banco principal com quem está operando o sistema
+    gravador    uma thread em segundo plano (só uma entre todos os workers, por
+                arrendamento na própria fila) junta os eventos pendentes, busca cada
+                pedido uma única vez, por mais eventos que ele tenha, e grava o lote
+                numa só transação curta em pedidos_completos/pedidos
+
+Um evento só sai da fila depois de gravado; se o processo cair no meio, o lote é
+refeito (gravar de novo é inofensivo). Falhas da API são repetidas com backoff.
+O arrendamento é renovado a cada BUSCA_POR_VEZ pedidos buscados, e os eventos só
+são dados como processados se ele ainda for deste gravador: um gravador que
+demorou além do prazo desiste do lote em vez de marcar eventos que outro já pegou.
+
+Configuração: NUVEMSHOP_APP_SECRET (assinatura), NUVEMSHOP_LOJA_ID e
+NUVEMSHOP_TOKEN (busca dos pedidos, ver sincronizacao.py). WEBHOOKS_GRAVADOR=0
+desliga a thread nos workers web; nesse caso rode o gravador à parte:
+
+    python webhooks.py --banco pedidos.db
+
+Para testar localmente, benchmarks/replay_webhooks.py envia eventos assinados.
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from flask import current_app, jsonify, request
+
+import importacao
+import sincronizacao
+from admin import requer_admin
+
+logger = logging.getLogger('pedidos.webhooks')
+
+ATIVO = os.environ.get('WEBHOOKS', '1') != '0'
+SEGREDO = os.environ.get('NUVEMSHOP_APP_SECRET', '')
+FILA_DB = os.environ.get('WEBHOOKS_FILA', 'webhooks.db')
+GRAVADOR = os.environ.get('WEBHOOKS_GRAVADOR', '1') != '0'
+
+# Espera entre lotes: é a janela em que eventos do mesmo pedido se juntam
+INTERVALO = float(os.environ.get('WEBHOOKS_INTERVALO', '1.0'))
+MAX_LOTE = 2000
+MAX_TENTATIVAS = 8
+DURACAO_ARRENDAMENTO = 30
+# Pedidos buscados na API entre uma renovação do arrendamento e outra
+BUSCA_POR_VEZ = 200
+# Eventos processados ficam na fila por alguns dias para consulta
+RETENCAO_DIAS = 7
+
+CABECALHO_ASSINATURA = 'X-Linkedstore-Hmac-Sha256'
+EVENTO_EXCLUSAO = 'order/deleted'
+
+
+_abrindo = threading.Lock()
+
+
+def abrir_fila(caminho=None):
+    """Conexão com o banco da fila, criando as tabelas na primeira vez"""
+    # Várias threads criando o arquivo ao mesmo tempo disputariam a troca para WAL
+    with _abrindo:
+        conn = sqlite3.connect(caminho or FILA_DB, timeout=10)
+        conn.row_factory = sqlite3.Row
+        if conn.execute('PRAGMA journal_mode').fetchone()[0] != 'wal':
+            conn.execute('PRAGMA journal_mode = WAL')
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS webhook_fila (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                evento TEXT NOT NULL,
+                loja_id TEXT,
+                recurso_id INTEGER NOT NULL,
+                recebido_em REAL NOT NULL,
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                proxima_tentativa REAL NOT NULL DEFAULT 0,
+                processado_em REAL,
+                resultado TEXT,
+                erro TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_webhook_fila_pendentes
+                ON webhook_fila (proxima_tentativa) WHERE processado_em IS NULL;
+            CREATE TABLE IF NOT EXISTS webhook_arrendamento (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                dono TEXT NOT NULL,
+                expira_em REAL NOT NULL
+            );
+        ''')
+    return conn
+
+
+def assinatura_valida(corpo, assinatura, segredo=None):
+    segredo = segredo or SEGREDO
+    esperado = hmac.new(segredo.encode('utf-8'), corpo, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(esperado, (assinatura or '').lower())
+
+
+def enfileirar(conn, evento, recurso_id, loja_id=None):
+    conn.execute('INSERT INTO webhook_fila (evento, loja_id, recurso_id, recebido_em) VALUES (?, ?, ?, ?)',
+                 (evento, loja_id, recurso_id, time.time()))
+    conn.commit()
+
+
+def situacao(conn):
+    """Contagens da fila para a rota de status"""
+    linha = conn.execute('''
+        SELECT SUM(processado_em IS NULL) AS pendentes,
+               SUM(resultado = 'gravado') AS gravados,
+               SUM(resultado = 'ignorado') AS ignorados,
+               SUM(resultado = 'falhou') AS falhas,
+               MIN(CASE WHEN processado_em IS NULL THEN recebido_em END) AS mais_antigo
+        FROM webhook_fila
+    ''').fetchone()
+    dados = {k: linha[k] or 0 for k in ('pendentes', 'gravados', 'ignorados', 'falhas')}
+    dados['atraso_segundos'] = round(time.time() - linha['mais_antigo'], 1) if linha['mais_antigo'] else 0
+    return dados
+
+
+class Gravador:
+    """Aplica os eventos da fila em lotes no banco principal"""
+
+    def __init__(self, obter_conexao, caminho_fila=None, criar_cliente=None):
+        self.obter_conexao = obter_conexao
+        self.caminho_fila = caminho_fila
+        self.criar_cliente = criar_cliente or sincronizacao.ClienteNuvemshop
+        self.dono = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self.ultimo_lote = None
+        self._parar = threading.Event()
+        self._thread = None
+
+    def arrendar(self, fila):
+        """Tenta ser (ou continuar) o único gravador ativo; retorna True se conseguiu"""
+        agora = time.time()
+        cursor = fila.execute('''
+            INSERT INTO webhook_arrendamento (id, dono, expira_em) VALUES (1, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET dono = excluded.dono, expira_em = excluded.expira_em
+            WHERE webhook_arrendamento.dono = excluded.dono OR webhook_arrendamento.expira_em < ?
+        ''', (self.dono, agora + DURACAO_ARRENDAMENTO, agora))
+        fila.commit()
+        return cursor.rowcount == 1
+
+    def _renovar_na_transacao(self, fila):
+        """Estende o arrendamento na transação aberta; False se ele venceu ou passou a outro"""
+        agora = time.time()
+        cursor = fila.execute('UPDATE webhook_arrendamento SET expira_em = ? '
+                              'WHERE id = 1 AND dono = ? AND expira_em >= ?',
+                              (agora + DURACAO_ARRENDAMENTO, self.dono, agora))
+        return cursor.rowcount == 1
+
+    def processar_lote(self, fila, cliente):
+        """Processa até MAX_LOTE eventos pendentes; retorna o resumo (None sem eventos ou sem o arrendamento)"""
+        agora = time.time()
+        eventos = fila.execute('''
+            SELECT id, evento, recurso_id, tentativas FROM webhook_fila
+            WHERE processado_em IS NULL AND proxima_tentativa <= ?
+            ORDER BY id LIMIT ?
+        ''', (agora, MAX_LOTE)).fetchall()
+        if not eventos:
+            return None
+
+        inicio = time.perf_counter()
+        # Coalescência: um pedido com vários eventos é buscado e gravado uma vez só
+        por_pedido = {}
+        for evento in eventos:
+            por_pedido.setdefault(evento['recurso_id'], []).append(evento)
+        excluidos = {i for i, lista in por_pedido.items() if lista[-1]['evento'] == EVENTO_EXCLUSAO}
+        buscar = [i for i in por_pedido if i not in excluidos]
+        pedidos = {}
+        for posicao in range(0, len(buscar), BUSCA_POR_VEZ):
+            pedidos.update(cliente.buscar_pedidos(buscar[posicao:posicao + BUSCA_POR_VEZ]))
+            # Uma API lenta não pode deixar o arrendamento vencer no meio do lote
+            if not self.arrendar(fila):
+                logger.warning('Arrendamento dos webhooks perdido durante a busca; lote abandonado')
+                return None
+        tempo_api = time.perf_counter() - inicio
+
+        resumo = {'eventos': len(eventos), 'pedidos': len(por_pedido), 'importados': 0,
+                  'atualizados': 0, 'inalterados': 0, 'erros': 0}
+        convertidos = []
+        resultados = {}
+        for recurso_id in por_pedido:
+            pedido = pedidos.get(recurso_id)
+            if recurso_id in excluidos or pedido is None:
+                # Pedido excluído na loja: os dados locais ficam como estão
+                resultados[recurso_id] = ('ignorado', None)
+            elif isinstance(pedido, Exception):
+                resultados[recurso_id] = ('erro', str(pedido))
+            else:
+                try:
+                    convertidos.append(sincronizacao.converter(pedido))
+                    resultados[recurso_id] = ('gravado', None)
+                except (KeyError, TypeError, AttributeError) as e:
+                    resultados[recurso_id] = ('falhou', f'Pedido inválido: {e}')
+
+        marca = time.perf_counter()
+        if convertidos:
+            conn = self.obter_conexao()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                importacao.gravar_atualizando(conn, convertidos, resumo)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+        tempo_gravar = time.perf_counter() - marca
+
+        concluidos = []
+        repetir = []
+        agora = time.time()
+        for recurso_id, lista in por_pedido.items():
+            resultado, erro = resultados[recurso_id]
+            for evento in lista:
+                if resultado != 'erro':
+                    concluidos.append((agora, resultado, erro, evento['id']))
+                elif evento['tentativas'] + 1 >= MAX_TENTATIVAS:
+                    concluidos.append((agora, 'falhou', erro, evento['id']))
+                else:
+                    espera = min(3600, 5 * 2 ** evento['tentativas'])
+                    repetir.append((agora + espera, erro, evento['id']))
+        fila.execute('BEGIN IMMEDIATE')
+        if not self._renovar_na_transacao(fila):
+            # Outro gravador já pode ter pegado estes eventos; ele os refaz
+            fila.rollback()
+            logger.warning('Arrendamento dos webhooks perdido antes de concluir o lote; eventos ficam na fila')
+            return None
+        fila.executemany('UPDATE webhook_fila SET processado_em = ?, resultado = ?, erro = ?, '
+                         'tentativas = tentativas + 1 WHERE id = ?', concluidos)
+        fila.executemany('UPDATE webhook_fila SET proxima_tentativa = ?, erro = ?, '
+                         'tentativas = tentativas + 1 WHERE id = ?', repetir)
+        fila.commit()
+
+        resumo.update(repetir=len(repetir), tempos={'api': tempo_api, 'gravar': tempo_gravar,
+                                                    'total': time.perf_counter() - inicio})
+        self.ultimo_lote = resumo
+        logger.info('Lote de webhooks: %d eventos, %d pedidos, gravação em %.3fs',
+                    resumo['eventos'], resumo['pedidos'], tempo_gravar,
+                    extra={'evento': 'webhooks', 'resumo': resumo})
+        return resumo
+
+    def limpar_processados(self, fila):
+        fila.execute('DELETE FROM webhook_fila WHERE processado_em < ?',
+                     (time.time() - RETENCAO_DIAS * 86400,))
+        fila.commit()
+
+    def executar(self):
+        """Laço do gravador; termina com parar()"""
+        fila = abrir_fila(self.caminho_fila)
+        cliente = None
+        ciclos = 0
+        try:
+            while not self._parar.is_set():
+                try:
+                    if self.arrendar(fila):
+                        cliente = cliente or self.criar_cliente()
+                        # Só emenda um lote no outro quando o anterior veio cheio; fora isso
+                        # espera o intervalo, que é quando os eventos repetidos se acumulam
+                        resumo = self.processar_lote(fila, cliente)
+                        while resumo and resumo['eventos'] >= MAX_LOTE and not self._parar.is_set():
+                            resumo = self.processar_lote(fila, cliente)
+                        ciclos += 1
+                        if ciclos % 3600 == 0:
+                            self.limpar_processados(fila)
+                except sincronizacao.ErroSincronizacao as e:
+                    logger.error('Gravador de webhooks sem acesso à API: %s', e)
+                    self._parar.wait(DURACAO_ARRENDAMENTO)
+                except Exception:
+                    # O gravador não pode morrer: o lote fica na fila e é refeito
+                    logger.exception('Erro ao gravar lote de webhooks')
+                self._parar.wait(INTERVALO)
+        finally:
+            fila.close()
+
+    def iniciar(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._parar.clear()
+            self._thread = threading.Thread(target=self.executar, name='gravador-webhooks', daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def init_app(app, obter_conexao):
+    """Registra /webhooks/nuvemshop e /admin/webhooks"""
+    if not ATIVO:
+        return
+    gravador = Gravador(obter_conexao)
+    app.extensions['webhooks'] = gravador
+    local = threading.local()
+
+    def fila():
+        # Uma conexão por thread: abrir a cada webhook custaria o PRAGMA e o DDL
+        if getattr(local, 'fila', None) is None:
+            local.fila = abrir_fila()
+        return local.fila
+
+    @app.route('/webhooks/nuvemshop', methods=['POST'])
+    def webhook_nuvemshop():
+        """Confere a assinatura, grava o evento na fila e responde imediatamente"""
+        corpo = request.get_data(cache=False)
+        if SEGREDO:
+            if not assinatura_valida(corpo, request.headers.get(CABECALHO_ASSINATURA)):
+                return jsonify(ok=False, mensagem='Assinatura inválida'), 401
+        elif not (current_app.debug or current_app.testing):
+            return jsonify(ok=False, mensagem='NUVEMSHOP_APP_SECRET não configurado'), 503
+
+        try:
+            dados = json.loads(corpo)
+            evento = str(dados['event'])
+            recurso_id = int(dados['id'])
+        except (ValueError, KeyError, TypeError):
+            return jsonify(ok=False, mensagem='Corpo do webhook inválido'), 400
+        loja_id = str(dados.get('store_id', ''))
+        if not evento.startswith('order/') or (sincronizacao.LOJA_ID and loja_id != sincronizacao.LOJA_ID):
+            # Responde 200 para a Nuvemshop não reenviar um evento que não interessa
+            return jsonify(ok=True, ignorado=True)
+
+        enfileirar(fila(), evento, recurso_id, loja_id)
+        if GRAVADOR:
+            gravador.iniciar()
+        return jsonify(ok=True)
+
+    @app.route('/admin/webhooks')
+    @requer_admin
+    def webhooks_situacao():
+        """Tamanho da fila, atraso e último lote gravado por este worker"""
+        dados = situacao(fila())
+        dados['ultimo_lote'] = gravador.ultimo_lote
+        return jsonify(dados)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gravador dos webhooks da Nuvemshop (processo à parte)')
+    parser.add_argument('--banco', default='pedidos.db', help='Banco principal do app')
+    parser.add_argument('--fila', help='Banco da fila (padrão: WEBHOOKS_FILA)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    def obter_conexao():
+        conn = sqlite3.connect(args.banco, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    gravador = Gravador(obter_conexao, args.fila)
+    try:
+        gravador.executar()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()